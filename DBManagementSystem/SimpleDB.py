@@ -1,23 +1,72 @@
+import bisect
+import heapq
+import itertools
 import json
+import operator
 import os
+import threading
+import time
 import pandas as pd
 import xml.etree.ElementTree as ET
-import csv
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from xml.sax.saxutils import quoteattr
+from aggregate import (GroupBy, aggregate_records, finalize_groups, merge_groups, normalize_aggregates,
+                       parallel_aggregate)
+from cache import QueryCache
+from columnar import ColumnarData
+from export import open_output, output_path, parse_txt_line, write_csv, write_excel, write_txt, write_xml_table
+from indexes import INDEX_TYPES
+from join import JOIN_STRATEGIES, JOIN_TYPES, combiner, hash_join, key_function, merge_join, normalize_on, null_check
+from locks import ReadWriteLock
+from metrics import SLOW_QUERY_MS, Metrics, QueryTrace, describe_condition, timed
+from partition import PARALLEL_MIN_ROWS, PARTITION_ROW_BITS, PARTITION_WORKERS, make_partitioning
+from planner import (DEFAULT_RANGE, Plan, TableStats, index_cost, join_costs, ordered_walk_cost, scan_cost,
+                     sort_cost)
+from query import And, Between, Col, Comparison, In, Or, as_expr
+from report import REPORT_FORMATS, write_report
+from schema import compile_schema, json_default
+from storage import BATCH_SIZE, SegmentData, SegmentReader, SegmentWriter, rows_from_columns
+from wal import SEALED_SUFFIX, WAL_FILE, WriteAheadLog, read_log
+
+CATALOG_FILE = "catalog.json"  # Описание базы данных в каталоге сегментного формата
+IMPORT_BATCH_SIZE = 10000  # Записей в одном пакете при импорте из файлов
 
 class Database:
     def __init__(self, name):
         self.name = name
         self.tables = {}
+        self.path = None  # Каталог сегментов, к которому привязан журнал
+        self.wal = None  # Журнал упреждающей записи (см. enable_wal)
+        self.lsn = 0  # Номер последней записи журнала
+        self.checkpoint_bytes = None
+        self.lock = threading.RLock()  # Защищает список таблиц и нумерацию записей журнала
+        self.checkpoint_lock = threading.Lock()  # Одновременно выполняется одна контрольная точка
+        self.checkpoint_thread = None
+        self.metrics = None  # Сбор метрик операций (см. enable_metrics)
 
-    def create_table(self, table_name, schema):
+    def create_table(self, table_name, schema, storage="rows", primary_key=None, partition_by=None):
         """
         Создание новой таблицы в базе данных.
         :param table_name: Название таблицы.
         :param schema: Схема таблицы (словарь с названиями столбцов и их типами).
+        :param storage: Способ хранения записей: "rows" или "columnar".
+        :param primary_key: Столбец первичного ключа (по умолчанию нет).
+        :param partition_by: Секционирование (см. PartitionedTable): ("hash", столбец, число секций)
+                             или ("range", столбец, [границы]); по умолчанию таблица не секционирована.
         """
-        if table_name in self.tables:
-            raise ValueError(f"Таблица с именем '{table_name}' уже существует.")
-        self.tables[table_name] = Table(table_name, schema)
+        with self.lock:
+            if table_name in self.tables:
+                raise ValueError(f"Таблица с именем '{table_name}' уже существует.")
+            table = _new_table(table_name, schema, storage, primary_key, partition_by)
+            table.metrics = self.metrics
+            self.tables[table_name] = table
+            if self.wal is not None:
+                table.log = self._log_change
+                entry = ["create_table", table_name, schema, storage, primary_key]
+                if partition_by is not None:
+                    entry.append(table.partitioning.describe())
+                self._log_change(entry)
 
     def get_table(self, table_name):
         """Возвращает таблицу по имени."""
@@ -32,105 +81,566 @@ class Database:
             structure["Tables"][table_name] = table.schema
         return structure
 
-    def save_to_file(self, filename):
-        """Сохраняет базу данных в файл JSON."""
-        data = {
-            "name": self.name,
-            "tables": {name: table.to_dict() for name, table in self.tables.items()},
+    def enable_metrics(self, slow_query_ms=SLOW_QUERY_MS, metrics=None):
+        """
+        Включает сбор метрик: число вызовов, задержки, обработанные и просмотренные записи
+        по каждой операции каждой таблицы, журнал медленных запросов (см. модуль metrics).
+        :param slow_query_ms: Порог медленного запроса в мс (None — не вести журнал).
+        :param metrics: Уже собранные метрики (например, базы, вместо которой загружена эта).
+        :return: Объект metrics.Metrics.
+        """
+        with self.lock:
+            if metrics is None:
+                metrics = Metrics(slow_query_ms)
+            self.metrics = metrics
+            for table in self.tables.values():
+                table.metrics = metrics
+        return metrics
+
+    def disable_metrics(self):
+        """Выключает сбор метрик; операции снова выполняются без замеров."""
+        with self.lock:
+            self.metrics = None
+            for table in self.tables.values():
+                table.metrics = None
+
+    def stats(self):
+        """
+        Снимок состояния базы: записи, индексы и кеш каждой таблицы и, если сбор метрик включен,
+        счетчики и задержки операций и медленные запросы (ключ "metrics", см. metrics.Metrics.snapshot).
+        """
+        with self.lock:
+            tables = list(self.tables.items())
+            metrics = self.metrics
+        result = {"name": self.name, "tables": {}, "metrics": None if metrics is None else metrics.snapshot()}
+        for name, table in tables:
+            result["tables"][name] = {"rows": table.count(), "storage": table.storage,
+                                      "indexes": table._index_definitions(), "cache": table.cache_stats()}
+            if isinstance(table, PartitionedTable):
+                result["tables"][name]["partitions"] = table.describe_partitions()
+        return result
+
+    def join(self, left, right, on, how="inner", strategy="auto"):
+        """
+        Соединяет две таблицы по равенству столбцов.
+        :param left: Название левой таблицы.
+        :param right: Название правой таблицы.
+        :param on: Столбец с одинаковым именем в обеих таблицах ("id"), пара ("left_col", "right_col")
+                   или список таких элементов для составного ключа.
+        :param how: "inner" — только записи, у которых есть пара; "left" — все записи левой таблицы
+                    (при отсутствии пары столбцы правой таблицы равны None).
+        :param strategy: "hash" — хеш-соединение (таблица сборки строится по меньшей таблице,
+                         для "left" — по правой); "merge" — слиянием потоков, упорядоченных по ключу
+                         (упорядоченный индекс или сортировка; обе стороны держатся в памяти);
+                         "auto" — стратегия с меньшей оценкой стоимости (см. planner.join_costs).
+        :return: Генератор записей-словарей: столбцы левой таблицы, затем правой. Столбцы правой
+                 таблицы с теми же именами, что в левой, получают префикс "right_name."; общий ключ
+                 с одинаковым именем не повторяется.
+        """
+        prepared, _ = self._prepare_join(left, right, on, how, strategy)
+        return self._join(*prepared)
+
+    def explain_join(self, left, right, on, how="inner", strategy="auto"):
+        """
+        Выполняет соединение (параметры как у join) и возвращает выбранный план:
+        стратегию, сторону сборки хеш-соединения, оценки стоимости стратегий,
+        оценку и фактическое число записей результата и время.
+        :return: Словарь с описанием плана.
+        """
+        prepared, plan = self._prepare_join(left, right, on, how, strategy)
+        start = time.perf_counter()
+        plan["actual_rows"] = sum(1 for _ in self._join(*prepared))
+        plan["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        return plan
+
+    def _prepare_join(self, left, right, on, how, strategy):
+        """
+        Проверяет параметры соединения и выбирает стратегию и порядок соединения.
+        :return: (аргументы для _join, описание плана).
+        """
+        if how not in JOIN_TYPES:
+            raise ValueError(f"Неизвестный тип соединения '{how}'.")
+        if strategy not in JOIN_STRATEGIES:
+            raise ValueError(f"Неизвестная стратегия соединения '{strategy}'.")
+        left_table = self.get_table(left)
+        right_table = self.get_table(right)
+        left_columns, right_columns = normalize_on(on, left_table.schema, right_table.schema)
+        left_rows, right_rows = left_table.count(), right_table.count()
+        left_sorted = len(left_columns) == 1 and left_table.index_kind(left_columns[0]) == "sorted"
+        right_sorted = len(right_columns) == 1 and right_table.index_kind(right_columns[0]) == "sorted"
+        costs, build = join_costs(left_rows, right_rows, left_sorted, right_sorted, how)
+        if strategy == "auto":
+            strategy = min(costs, key=costs.get)
+        skip = {right_col for left_col, right_col in zip(left_columns, right_columns) if left_col == right_col}
+        combine, _ = combiner(left_table.schema, right_table.schema, right, skip)
+        plan = {
+            "left": left,
+            "right": right,
+            "how": how,
+            "strategy": strategy,
+            "build": build if strategy == "hash" else None,
+            "left_rows": left_rows,
+            "right_rows": right_rows,
+            "estimated_rows": self._join_estimate(left_table, right_table, left_columns, right_columns, how),
+            "cost": round(costs[strategy], 1),
+            "alternatives": {name: round(cost, 1) for name, cost in costs.items()},
         }
+        prepared = (left_table, right_table, left_columns, right_columns, combine, how, strategy, build == "left")
+        return prepared, plan
+
+    @staticmethod
+    def _join_estimate(left_table, right_table, left_columns, right_columns, how):
+        """
+        Оценка числа записей соединения: |L| * |R| / max(d(L), d(R)), где d — число
+        различных значений ключа (по статистике столбцов); для "left" — не меньше |L|.
+        """
+        left_stats, right_stats = left_table.statistics(), right_table.statistics()
+        if left_stats is None or right_stats is None:
+            return None
+        distinct = []
+        for stats, columns in ((left_stats, left_columns), (right_stats, right_columns)):
+            values = 1
+            for col in columns:
+                values *= stats["columns"][col]["distinct"]
+            distinct.append(max(1, min(values, stats["rows"])))
+        estimate = left_stats["rows"] * right_stats["rows"] / max(distinct)
+        if how == "left":
+            estimate = max(estimate, left_stats["rows"])
+        return round(estimate)
+
+    @staticmethod
+    def _join(left_table, right_table, left_columns, right_columns, combine, how, strategy, build_left):
+        """Генератор соединения; записи читаются только при обходе результата."""
+        left_key, right_key = key_function(left_columns), key_function(right_columns)
+        if strategy == "hash":
+            left_null, right_null = null_check(left_columns), null_check(right_columns)
+            if build_left:
+                # Таблица сборки — меньшая сторона: в памяти держится только она
+                yield from hash_join(right_table.iter_select(), left_table.iter_select(), right_key, left_key,
+                                     right_null, left_null, combine, how, build_left=True)
+            else:
+                yield from hash_join(left_table.iter_select(), right_table.iter_select(), left_key, right_key,
+                                     left_null, right_null, combine, how)
+            return
+        nulls = []  # Записи левой таблицы с None в ключе: пары у них нет
+        yield from merge_join(left_table.ordered_by(left_columns, nulls if how == "left" else None),
+                              right_table.ordered_by(right_columns, None),
+                              left_key, right_key, combine, how)
+        if how == "left":
+            for record in nulls:
+                yield combine(record, None)
+
+    @timed("save", table=False)
+    def save_to_file(self, path, format=None, progress=None):
+        """
+        Сохраняет базу данных.
+        По умолчанию используется бинарный сегментный формат: каталог с catalog.json
+        и файлом .seg для каждой таблицы, записываемым пакетами.
+        JSON используется, если path оканчивается на .json или указывает на существующий файл.
+        :param path: Путь к каталогу (сегменты) или файлу (JSON).
+        :param format: "segments" или "json" (по умолчанию определяется по path).
+        :param progress: Функция progress(rows), вызываемая по мере сохранения записей (см. Table.count).
+        """
+        if format is None:
+            format = "json" if path.lower().endswith(".json") or os.path.isfile(path) else "segments"
+        if format == "json":
+            self.save_to_json(path, progress=progress)
+        elif format == "segments":
+            self.save_to_segments(path, progress=progress)
+        else:
+            raise ValueError(f"Неизвестный формат базы данных '{format}'.")
+
+    def save_to_segments(self, directory_path, progress=None):
+        """
+        Сохраняет базу данных в сегментном формате (каждая таблица — отдельный файл .seg,
+        секционированная — файл на каждую секцию, см. PartitionedTable).
+        :param progress: Функция progress(rows), вызываемая после каждого записанного пакета.
+        """
+        os.makedirs(directory_path, exist_ok=True)
+        with self.lock:
+            tables = list(self.tables.items())
+            catalog = {"name": self.name, "format": "segments", "version": 1, "lsn": self.lsn, "tables": {}}
+        # Каждая таблица сохраняется под своей блокировкой, без блокировки всей базы
+        for table_name, table in tables:
+            catalog["tables"][table_name] = table._save_segments(directory_path, progress)
+        catalog_path = os.path.join(directory_path, CATALOG_FILE)
+        with open(catalog_path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(catalog, file, indent=4, ensure_ascii=False, default=json_default)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(catalog_path + ".tmp", catalog_path)
+
+    def save_to_json(self, filename, progress=None):
+        """
+        Сохраняет базу данных в файл JSON.
+        :param progress: Функция progress(rows), вызываемая после подготовки каждой таблицы.
+        """
+        with self.lock:
+            items = list(self.tables.items())
+        tables = {}
+        for name, table in items:
+            tables[name] = table.to_dict()
+            if progress is not None:
+                progress(len(tables[name]["data"]))
+        data = {"name": self.name, "tables": tables}
         with open(filename, "w") as file:
-            json.dump(data, file, indent=4)
+            json.dump(data, file, indent=4, default=json_default)
+
+    @staticmethod
+    def load_from_file(path, wal=False, lazy=False, progress=None, metrics=None):
+        """
+        Загружает базу данных из каталога сегментов или из файла JSON.
+        :param path: Путь к каталогу (сегменты) или файлу (JSON).
+        :param wal: Продолжить журналирование изменений (только для каталога сегментов).
+        :param lazy: Не загружать записи при открытии (только для каталога сегментов).
+        :param progress: Функция progress(rows), вызываемая после загрузки каждой таблицы.
+        :param metrics: metrics.Metrics, в которые записывается загрузка; сбор метрик
+                        у загруженной базы остается включенным (см. enable_metrics).
+        """
+        start = time.perf_counter()
+        if os.path.isdir(path):
+            db = Database.load_from_segments(path, wal=wal, lazy=lazy, progress=progress)
+        else:
+            db = Database.load_from_json(path, progress=progress)
+        if metrics is not None:
+            db.enable_metrics(metrics=metrics)
+            metrics.record(None, "load", time.perf_counter() - start, sum(table.count() for table in db.tables.values()))
+        return db
+
+    @staticmethod
+    def load_from_segments(directory_path, wal=False, lazy=False, progress=None):
+        """
+        Загружает базу данных из каталога в сегментном формате.
+        Если в каталоге есть журнал, изменения после контрольной точки применяются повторно.
+        :param wal: Продолжить журналирование изменений после загрузки.
+        :param lazy: Отобразить сегменты в память и читать только заголовки и футеры:
+                     пакеты строк декодируются при первом обращении к ним, таблица
+                     полностью загружается в память только перед первым изменением.
+        :param progress: Функция progress(rows), вызываемая после загрузки каждой таблицы.
+        """
+        with open(os.path.join(directory_path, CATALOG_FILE), "r", encoding="utf-8") as file:
+            catalog = json.load(file)
+        db = Database(catalog["name"])
+        db.lsn = catalog.get("lsn", 0)
+        for table_name, entry in catalog["tables"].items():
+            if isinstance(entry, dict):
+                # Секционированная таблица: описание секционирования и файлы секций
+                db.tables[table_name] = PartitionedTable.from_segments(directory_path, entry, lazy=lazy)
+            else:
+                db.tables[table_name] = Table.from_segment(os.path.join(directory_path, entry), lazy=lazy)
+            if progress is not None:
+                progress(db.tables[table_name].count())
+        db._recover(directory_path)
+        db.path = directory_path
+        if wal:
+            db.enable_wal(directory_path)
+        return db
+
+    def _recover(self, directory_path):
+        """Повторно применяет записи журнала, которых нет в сохраненных сегментах."""
+        wal_path = os.path.join(directory_path, WAL_FILE)
+        # Сначала журнал, закрытый незавершенной контрольной точкой, затем текущий
+        entries = read_log(wal_path + SEALED_SUFFIX) + read_log(wal_path)
+        for entry in entries:
+            lsn, op, table_name, *args = entry
+            self.lsn = max(self.lsn, lsn)
+            if op == "create_table":
+                if table_name not in self.tables:
+                    # Необязательные аргументы: первичный ключ и секционирование
+                    schema, storage, *options = args
+                    options += [None] * (2 - len(options))
+                    self.tables[table_name] = _new_table(table_name, schema, storage, *options)
+                    self.tables[table_name].lsn = lsn
+                continue
+            self.tables[table_name]._replay(lsn, op, args)
+
+    def enable_wal(self, directory_path=None, group_commit_size=64, group_commit_interval=0.01,
+                   checkpoint_bytes=64 * 1024 * 1024):
+        """
+        Включает журнал упреждающей записи: изменения таблиц дописываются в журнал
+        вместо полной перезаписи базы, а журнал периодически сворачивается в сегменты.
+        :param directory_path: Каталог сегментов (по умолчанию — текущий self.path).
+        :param group_commit_size: Число записей журнала, после которого выполняется fsync.
+        :param group_commit_interval: Максимальная задержка fsync в секундах.
+        :param checkpoint_bytes: Размер журнала, при котором создается контрольная точка.
+        """
+        directory_path = directory_path or self.path
+        if directory_path is None:
+            raise ValueError("Не указан каталог базы данных для журнала.")
+        if self.wal is not None:
+            self.disable_wal()
+        if directory_path != self.path:
+            # Журнал ведется относительно снимка в этом каталоге — создаем его
+            self.save_to_segments(directory_path)
+        self.path = directory_path
+        self.checkpoint_bytes = checkpoint_bytes
+        self.wal = WriteAheadLog(os.path.join(directory_path, WAL_FILE),
+                                 group_commit_size=group_commit_size,
+                                 group_commit_interval=group_commit_interval)
+        for table in self.tables.values():
+            table.log = self._log_change
+
+    def disable_wal(self):
+        """Фиксирует журнал и отключает журналирование."""
+        if self.wal is None:
+            return
+        if self.checkpoint_thread is not None:
+            self.checkpoint_thread.join()
+        self.wal.close()
+        self.wal = None
+        for table in self.tables.values():
+            table.log = None
+
+    def _log_change(self, entry):
+        """
+        Записывает изменение таблицы в журнал: entry = [операция, таблица, аргументы...].
+        Вызывается под блокировкой записи таблицы, поэтому номер записи и состояние таблицы согласованы.
+        """
+        with self.lock:
+            self.lsn += 1
+            self.tables[entry[1]].lsn = self.lsn
+            self.wal.append([self.lsn] + entry)
+            if (self.checkpoint_bytes is not None and self.wal.size() >= self.checkpoint_bytes
+                    and (self.checkpoint_thread is None or not self.checkpoint_thread.is_alive())):
+                # Контрольная точка выполняется в фоне и не задерживает текущее изменение
+                self.checkpoint_thread = threading.Thread(target=self.checkpoint, daemon=True)
+                self.checkpoint_thread.start()
+
+    def commit(self):
+        """Гарантирует, что все изменения записаны в журнал на диске."""
+        if self.wal is not None:
+            self.wal.commit()
+
+    def checkpoint(self):
+        """
+        Сворачивает журнал: текущий журнал закрывается, сегменты сохраняются,
+        после чего закрытый журнал удаляется. Изменения, сделанные во время
+        контрольной точки, попадают в новый журнал.
+        """
+        if self.wal is None:
+            raise ValueError("Журнал не включен.")
+        with self.checkpoint_lock:
+            sealed = self.wal.rotate()
+            self.save_to_segments(self.path)
+            os.remove(sealed)
 
     @staticmethod
-    def load_from_file(filename):
+    def load_from_json(filename, progress=None):
         """Загружает базу данных из файла JSON."""
         with open(filename, "r") as file:
             data = json.load(file)
         db = Database(data["name"])
         for table_name, table_data in data["tables"].items():
-            table = Table.from_dict(table_data)
+            table = (PartitionedTable if table_data.get("partition_by") else Table).from_dict(table_data)
             db.tables[table_name] = table
+            if progress is not None:
+                progress(table.count())
         return db
 
-    def save_database_to_csv(self, directory_path):
-        """Сохраняет базу данных в CSV-файлы (каждая таблица — отдельный файл)"""
+    def _export_tables(self, directory_path, extension, write, compression, workers, progress):
+        """
+        Выгружает каждую таблицу в отдельный файл каталога; таблицы пишутся параллельно в пуле потоков.
+        :param write: Функция write(table, file, progress) из модуля export.
+        """
         os.makedirs(directory_path, exist_ok=True)
-        for table_name, table in self.tables.items():
-            file_path = os.path.join(directory_path, f"{table_name}.csv")
-            data = pd.DataFrame(table.fetch_all())
-            data.to_csv(file_path, index=False)
+        with self.lock:
+            tables = list(self.tables.items())
 
-    def save_database_to_txt(self, directory_path):
-        """Сохраняет базу данных в текстовые файлы (каждая таблица — отдельный файл)"""
-        os.makedirs(directory_path, exist_ok=True)
-        for table_name, table in self.tables.items():
-            file_path = os.path.join(directory_path, f"{table_name}.txt")
-            with open(file_path, "w", encoding="utf-8") as file:
-                for record in table.fetch_all():
-                    file.write(", ".join(f"{k}: {v}" for k, v in record.items()) + "\n")
-
-    def save_database_to_xml(self, file_path):
-        """Сохраняет базу данных в XML-файл"""
-        root = ET.Element("database", name=self.name)
-        for table_name, table in self.tables.items():
-            table_elem = ET.SubElement(root, "table", name=table_name)
-            for record in table.fetch_all():
-                row_elem = ET.SubElement(table_elem, "row")
-                for k, v in record.items():
-                    field = ET.SubElement(row_elem, k)
-                    field.text = str(v)
-        tree = ET.ElementTree(root)
-        tree.write(file_path, encoding="utf-8", xml_declaration=True)
-
-    def save_database_to_excel(self, file_path):
-        """Сохраняет базу данных в Excel-файл"""
-        with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
-            for table_name, table in self.tables.items():
-                data = pd.DataFrame(table.fetch_all())
-                data.to_excel(writer, sheet_name=table_name, index=False)
-
-    def load_database_from_csv(self, directory_path):
+        def export_table(item):
+            table_name, table = item
+            file_path = output_path(os.path.join(directory_path, f"{table_name}.{extension}"), compression)
+            with open_output(file_path, compression) as file:
+                write(table, file, progress)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # list() дожидается всех таблиц и пробрасывает первую ошибку
+            list(pool.map(export_table, tables))
+
+    @timed("export", table=False)
+    def save_database_to_csv(self, directory_path, compression=None, workers=None, progress=None):
+        """
+        Сохраняет базу данных в CSV-файлы (каждая таблица — отдельный файл).
+        :param compression: Сжатие файлов: None, "gzip" (.csv.gz) или "zstd" (.csv.zst).
+        :param workers: Число потоков для параллельной выгрузки таблиц.
+        :param progress: Функция progress(rows), вызываемая после каждого записанного пакета.
+        """
+        self._export_tables(directory_path, "csv", write_csv, compression, workers, progress)
+
+    @timed("export", table=False)
+    def save_database_to_txt(self, directory_path, compression=None, workers=None, progress=None):
+        """
+        Сохраняет базу данных в текстовые файлы (каждая таблица — отдельный файл).
+        :param compression: Сжатие файлов: None, "gzip" (.txt.gz) или "zstd" (.txt.zst).
+        :param workers: Число потоков для параллельной выгрузки таблиц.
+        :param progress: Функция progress(rows), вызываемая после каждого записанного пакета.
+        """
+        self._export_tables(directory_path, "txt", write_txt, compression, workers, progress)
+
+    @timed("export", table=False)
+    def save_database_to_xml(self, file_path, compression=None, progress=None):
+        """
+        Сохраняет базу данных в XML-файл.
+        Документ пишется потоково, по пакетам записей, без построения дерева в памяти.
+        :param compression: Сжатие файла: None, "gzip" или "zstd" (к имени добавляется .gz/.zst).
+        :param progress: Функция progress(rows), вызываемая после каждого записанного пакета.
+        """
+        with self.lock:
+            tables = list(self.tables.values())
+        with open_output(output_path(file_path, compression), compression) as file:
+            file.write("<?xml version='1.0' encoding='utf-8'?>\n")
+            file.write(f"<database name={quoteattr(self.name)}>")
+            for table in tables:
+                write_xml_table(table, file, progress)
+            file.write("</database>")
+
+    @timed("export", table=False)
+    def save_database_to_excel(self, file_path, progress=None):
+        """
+        Сохраняет базу данных в Excel-файл (openpyxl в режиме write-only).
+        :param progress: Функция progress(rows), вызываемая после каждого записанного пакета.
+        """
+        with self.lock:
+            tables = list(self.tables.values())
+        write_excel(tables, file_path, progress)
+
+    def bulk_load(self, table_name, records):
+        """
+        Пакетно загружает записи в таблицу.
+        :param table_name: Название таблицы.
+        :param records: Итерируемый набор записей (словарей).
+        :return: Количество добавленных записей.
+        """
+        return self.get_table(table_name).insert_many(records)
+
+    def _import_records(self, table_name, schema, records, progress=None):
+        """
+        Создает таблицу и загружает в нее записи пакетами по IMPORT_BATCH_SIZE,
+        не собирая весь файл в памяти.
+        :param progress: Функция progress(rows), вызываемая после каждого пакета.
+        :return: Количество загруженных записей.
+        """
+        self.create_table(table_name, schema)
+        records = iter(records)
+        total = 0
+        while True:
+            batch = list(itertools.islice(records, IMPORT_BATCH_SIZE))
+            if not batch:
+                return total
+            total += self.bulk_load(table_name, batch)
+            if progress is not None:
+                progress(len(batch))
+
+    def load_from_csv(self, table_name, file_path, progress=None):
+        """
+        Загружает таблицу из CSV-файла (первая строка — названия столбцов, все значения — строки).
+        Файл читается частями по IMPORT_BATCH_SIZE строк.
+        :return: Количество загруженных записей.
+        """
+        columns = pd.read_csv(file_path, nrows=0).columns
+        schema = {col: "str" for col in columns}
+
+        def records():
+            with pd.read_csv(file_path, dtype=str, keep_default_na=False,
+                             chunksize=IMPORT_BATCH_SIZE) as reader:
+                for chunk in reader:
+                    yield from chunk.to_dict("records")
+
+        return self._import_records(table_name, schema, records(), progress)
+
+    def load_from_txt(self, table_name, file_path, progress=None):
+        """
+        Загружает таблицу из текстового файла в формате save_database_to_txt:
+        одна запись на строку, "столбец: значение, столбец: значение" (с экранированием, см. export.write_txt).
+        :return: Количество загруженных записей.
+        """
+        with open(file_path, "r", encoding="utf-8") as file:
+            lines = (line.rstrip("\n") for line in file)
+            records = (parse_txt_line(line) for line in lines if line)
+            first = next(records, None)
+            schema = {col: "str" for col in first} if first else {}
+            return self._import_records(table_name, schema, itertools.chain([first] if first else [], records), progress)
+
+    @timed("import", table=False)
+    def load_database_from_csv(self, directory_path, progress=None):
         """Загружает базу данных из CSV-файлов"""
         files = [f for f in os.listdir(directory_path) if f.endswith(".csv")]
         for file in files:
             table_name = os.path.splitext(file)[0]
             file_path = os.path.join(directory_path, file)
-            self.load_from_csv(table_name, file_path)
+            self.load_from_csv(table_name, file_path, progress)
 
-    def load_database_from_txt(self, directory_path):
+    @timed("import", table=False)
+    def load_database_from_txt(self, directory_path, progress=None):
         """Загружает базу данных из текстовых файлов"""
         files = [f for f in os.listdir(directory_path) if f.endswith(".txt")]
         for file in files:
             table_name = os.path.splitext(file)[0]
             file_path = os.path.join(directory_path, file)
-            self.load_from_txt(table_name, file_path)
-
-    def load_database_from_xml(self, file_path):
-        """Загружает базу данных из XML-файла"""
-        tree = ET.parse(file_path)
-        root = tree.getroot()
-        for table_elem in root.findall("table"):
-            table_name = table_elem.get("name")
-            schema = {}
-            for row in table_elem.findall("row"):
-                for field in row:
-                    schema[field.tag] = "TEXT"
-                break  # Определяем схему по первой строке
-            self.create_table(table_name, schema)
-            for row in table_elem.findall("row"):
-                record = {field.tag: field.text for field in row}
-                self.insert_into_table(table_name, record)
-
-    def load_database_from_excel(self, file_path):
-        """Загружает базу данных из Excel-файла"""
-        data = pd.ExcelFile(file_path, engine='openpyxl')
-        for sheet_name in data.sheet_names:
-            table_name = sheet_name
-            table_data = data.parse(sheet_name)
-            schema = {col: "TEXT" for col in table_data.columns}
-            self.create_table(table_name, schema)
-            for _, row in table_data.iterrows():
-                self.insert_into_table(table_name, row.to_dict())
+            self.load_from_txt(table_name, file_path, progress)
+
+    @timed("import", table=False)
+    def load_database_from_xml(self, file_path, progress=None):
+        """
+        Загружает базу данных из XML-файла.
+        Файл разбирается потоково (iterparse): обработанные строки удаляются из дерева,
+        записи загружаются пакетами по IMPORT_BATCH_SIZE.
+        """
+        table_name = None
+        table_elem = None
+        batch = []
+        for event, elem in ET.iterparse(file_path, events=("start", "end")):
+            if event == "start":
+                if elem.tag == "table":
+                    table_name = elem.get("name")
+                    table_elem = elem
+                continue
+            if elem.tag == "row" and table_elem is not None:
+                record = {field.tag: field.text or "" for field in elem}
+                if table_name not in self.tables:
+                    # Схема определяется по первой строке
+                    self.create_table(table_name, {col: "str" for col in record})
+                batch.append(record)
+                table_elem.clear()  # Разобранные строки больше не нужны
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    self.bulk_load(table_name, batch)
+                    if progress is not None:
+                        progress(len(batch))
+                    batch = []
+            elif elem.tag == "table":
+                if table_name not in self.tables:
+                    self.create_table(table_name, {})
+                if batch:
+                    self.bulk_load(table_name, batch)
+                    if progress is not None:
+                        progress(len(batch))
+                    batch = []
+                table_elem.clear()
+                table_elem = None
+
+    @timed("import", table=False)
+    def load_database_from_excel(self, file_path, progress=None):
+        """
+        Загружает базу данных из Excel-файла (лист — таблица, первая строка — названия столбцов).
+        Книга открывается openpyxl в режиме только для чтения, строки читаются по одной.
+        """
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            for sheet in workbook.worksheets:
+                rows = sheet.iter_rows(values_only=True)
+                header = [(i, str(col)) for i, col in enumerate(next(rows, ())) if col is not None]
+
+                def records(rows=rows, header=header):
+                    for row in rows:
+                        if all(value is None for value in row):
+                            continue
+                        values = [row[i] if i < len(row) else None for i, _ in header]
+                        yield {col: "" if value is None else str(value) for (_, col), value in zip(header, values)}
+
+                self._import_records(sheet.title, {col: "str" for _, col in header}, records(), progress)
+        finally:
+            workbook.close()
 
     def insert_into_table(self, table_name, record):
         """Добавляет запись в таблицу."""
@@ -138,100 +648,1823 @@ class Database:
             raise ValueError(f"Таблица '{table_name}' не существует.")
         self.tables[table_name].insert(record)
 
+# Способы хранения записей таблицы
+STORAGE_TYPES = ("rows", "columnar")
+# Таблица уплотняется, когда удаленные записи составляют эту долю и их не меньше COMPACT_MIN_ROWS
+COMPACT_RATIO = 0.25
+COMPACT_MIN_ROWS = 1000
+
+
+def _operands(expr):
+    """Значения, с которыми условие сравнивает столбец (для Comparison, In и Between)."""
+    if isinstance(expr, Comparison):
+        return (expr.value,)
+    if isinstance(expr, In):
+        return expr.values
+    if isinstance(expr, Between):
+        return expr.low, expr.high
+    return ()
+
+
+def _skip_deleted(check):
+    """Оборачивает проверку записи так, чтобы удаленные записи (None) не проходили."""
+    if check is None:
+        return lambda record: record is not None
+    return lambda record: record is not None and check(record)
+
+
 class Table:
-    def __init__(self, name, schema):
+    def __init__(self, name, schema, storage="rows", primary_key=None):
+        """
+        :param name: Название таблицы.
+        :param schema: Схема таблицы: {"col_name": "type"}; типы int, float, str, bool, date,
+                       с суффиксом "?" столбец допускает None (см. модуль schema).
+        :param storage: "rows" — список словарей, "columnar" — типизированные столбцы
+                        (int/float в массивах array, str со словарным кодированием).
+        :param primary_key: Столбец первичного ключа: значения уникальны, по ним
+                            работают get, update_by_pk и delete_by_pk (хеш-индекс, O(1)).
+        """
+        if storage not in STORAGE_TYPES:
+            raise ValueError(f"Неизвестный способ хранения '{storage}'.")
+        if primary_key is not None and primary_key not in schema:
+            raise ValueError(f"Столбец '{primary_key}' не существует.")
         self.name = name
         self.schema = schema  # Схема таблицы: {"col_name": "type"}
-        self.data = []  # Список записей
+        self.types = compile_schema(schema)  # Проверка и приведение значений по схеме
+        self.storage = storage
+        # Список записей или колоночное хранилище с тем же интерфейсом последовательности
+        self.data = [] if storage == "rows" else ColumnarData(schema)
+        self.indexes = {}  # Вторичные индексы: {"col_name": HashIndex | SortedIndex}
+        self.log = None  # Функция записи изменений в журнал (устанавливается Database)
+        self.lsn = 0  # Номер последней записи журнала, примененной к таблице
+        self.pending_indexes = {}  # Индексы ленивой таблицы, которые строятся при первом запросе
+        self.lock = ReadWriteLock()  # Чтения выполняются параллельно, изменения — по одному
+        self.version = 0  # Увеличивается при каждом изменении записей
+        self.dead = 0  # Число удаленных записей, еще занимающих позиции (None в data)
+        # Row id записей по позициям (возрастают, см. select_rows); None — таблица не уплотнялась
+        # и row id совпадает с позицией
+        self.ids = None
+        self.next_id = 0  # Row id следующей записи (используется, когда self.ids не None)
+        self.cache = QueryCache()  # Результаты select для текущей версии
+        self.stats = None  # Статистика столбцов для планировщика (собирается при первом запросе)
+        self.metrics = None  # metrics.Metrics базы, если сбор метрик включен
+        self.primary_key = primary_key
+        if primary_key is not None:
+            self.indexes[primary_key] = INDEX_TYPES["hash"](primary_key)
 
+    def create_index(self, column, kind="hash"):
+        """
+        Создает вторичный индекс по столбцу.
+        :param column: Название столбца.
+        :param kind: Тип индекса: "hash" (равенство) или "sorted" (равенство и диапазоны).
+        """
+        if column not in self.schema:
+            raise ValueError(f"Столбец '{column}' не существует.")
+        if kind not in INDEX_TYPES:
+            raise ValueError(f"Неизвестный тип индекса '{kind}'.")
+        with self.lock.write():
+            index = INDEX_TYPES[kind](column)
+            index.build(self.data)
+            self.indexes[column] = index
+            self.pending_indexes.pop(column, None)
+            if self.log is not None:
+                self.log(["create_index", self.name, column, kind])
+
+    def drop_index(self, column):
+        """Удаляет индекс по столбцу."""
+        with self.lock.write():
+            if column not in self.indexes and column not in self.pending_indexes:
+                raise ValueError(f"Индекс по столбцу '{column}' не существует.")
+            if column == self.primary_key:
+                raise ValueError(f"Индекс первичного ключа '{column}' нельзя удалить.")
+            self.indexes.pop(column, None)
+            self.pending_indexes.pop(column, None)
+            if self.log is not None:
+                self.log(["drop_index", self.name, column])
+
+    @timed("insert", rows=1)
     def insert(self, record):
         """
         Вставляет запись в таблицу.
         :param record: Словарь, где ключи — названия столбцов, значения — данные.
         """
-        if not isinstance(record, dict):
-            raise ValueError("Запись должна быть словарем.")
-        if set(record.keys()) != set(self.schema.keys()):
-            raise ValueError("Запись должна содержать все столбцы таблицы.")
-        for col, col_type in self.schema.items():
-            if not isinstance(record[col], eval(col_type)):
-                raise ValueError(f"Столбец '{col}' должен быть типа {col_type}.")
-        self.data.append(record)
+        record = self.types.validate(record)
+        with self.lock.write():
+            self._materialize()
+            if self.primary_key is not None:
+                self._check_primary_key([record[self.primary_key]])
+            self.data.append(record)
+            self._add_row_ids(1)
+            self.version += 1
+            if self.stats is not None:
+                self.stats.add(record)
+            position = len(self.data) - 1
+            for column, index in self.indexes.items():
+                index.add(record[column], position)
+            if self.log is not None:
+                self.log(["insert", self.name, record])
+
+    @timed("insert")
+    def insert_many(self, records):
+        """
+        Пакетно вставляет записи в таблицу.
+        Записи проверяются скомпилированной схемой по столбцам и добавляются
+        разом: при ошибке таблица не меняется.
+        :param records: Итерируемый набор записей (словарей).
+        :return: Количество добавленных записей.
+        """
+        batch = self.types.validate_batch(records)
+        return self._insert_batch(batch)
+
+    def _insert_batch(self, batch):
+        """Вставляет проверенные по схеме записи (см. insert_many)."""
+        with self.lock.write():
+            self._materialize()
+            if self.primary_key is not None:
+                self._check_primary_key([record[self.primary_key] for record in batch])
+            start = len(self.data)
+            self.data.extend(batch)
+            self._add_row_ids(len(batch))
+            self.version += 1
+            if self.stats is not None:
+                self.stats.add_many(batch)
+            for column, index in self.indexes.items():
+                index.add_many([record[column] for record in batch], start)
+            if self.log is not None and batch:
+                self.log(["insert_many", self.name, batch])
+        return len(batch)
+
+    def _add_row_ids(self, count):
+        """Выдает row id записям, добавленным в конец таблицы."""
+        if self.ids is not None:
+            self.ids.extend(range(self.next_id, self.next_id + count))
+            self.next_id += count
+
+    def _check_primary_key(self, values, positions=()):
+        """
+        Проверяет уникальность новых значений первичного ключа.
+        :param values: Значения, которые получат записи.
+        :param positions: Позиции обновляемых записей (им разрешено сохранить свое значение).
+        """
+        index = self.indexes[self.primary_key]
+        seen = set()
+        for value in values:
+            if value in seen or any(position not in positions for position in index.lookup("==", value)):
+                raise ValueError(f"Значение {value!r} первичного ключа '{self.primary_key}' уже существует.")
+            seen.add(value)
 
+    @timed("update", condition=0)
     def update(self, condition, updates):
         """
         Обновляет записи, соответствующие условию.
-        :param condition: Лямбда-функция для фильтрации записей.
+        :param condition: Лямбда-функция, выражение query.Expr, строка условия или (столбец, оператор, значение).
         :param updates: Словарь обновлений.
+        :return: Количество обновленных записей.
         """
-        for record in self.data:
-            if condition(record):
-                for key, value in updates.items():
-                    if key in record:
-                        record[key] = value
+        updates = self.types.validate_updates({key: value for key, value in updates.items() if key in self.schema})
+        with self.lock.write():
+            positions = list(self._find_positions(condition))
+            if not positions or not updates:
+                return 0
+            if self.primary_key in updates:
+                # Одно значение ключа у нескольких записей нарушило бы уникальность
+                self._check_primary_key([updates[self.primary_key]] * len(positions), positions)
+            self._update_positions(positions, updates)
+            if self.log is not None:
+                self.log(["update", self.name, positions, updates])
+            return len(positions)
 
+    def _update_positions(self, positions, updates):
+        """Применяет обновления к записям с указанными позициями."""
+        self._materialize()
+        self.version += 1
+        data = self.data
+        for position in positions:
+            record = data[position]
+            if self.stats is not None:
+                self.stats.update(record, updates)
+            for key, value in updates.items():
+                index = self.indexes.get(key)
+                if index is not None:
+                    index.remove(record[key], position)
+                    index.add(value, position)
+            if isinstance(data, list):
+                # Запись заменяется копией: снимки, взятые читателями, не меняются
+                data[position] = {**record, **updates}
+            else:
+                data.update(position, updates)
+
+    @timed("delete", condition=0)
     def delete(self, condition):
         """
         Удаляет записи, соответствующие условию.
-        :param condition: Лямбда-функция для фильтрации записей.
+        :param condition: Лямбда-функция, выражение query.Expr, строка условия или (столбец, оператор, значение).
+        :return: Количество удаленных записей.
+        """
+        with self.lock.write():
+            positions = list(self._find_positions(condition))
+            if not positions:
+                return 0
+            self._delete_positions(positions)
+            if self.log is not None:
+                self.log(["delete", self.name, positions])
+            return len(positions)
+
+    def _delete_positions(self, positions):
+        """
+        Удаляет записи с указанными позициями.
+        Вместо записи остается отметка удаления (None), позиции остальных записей не меняются,
+        поэтому список записей не перестраивается. Когда отметок становится много, таблица уплотняется.
+        """
+        self._materialize()
+        self.version += 1
+        data = self.data
+        for position in positions:
+            record = data[position]
+            if record is None:
+                continue
+            if self.stats is not None:
+                self.stats.remove(record)
+            for column, index in self.indexes.items():
+                index.remove(record[column], position)
+            if isinstance(data, list):
+                data[position] = None
+            else:
+                data.mark_deleted((position,))
+            self.dead += 1
+        if self.dead >= max(COMPACT_MIN_ROWS, len(data) * COMPACT_RATIO):
+            self._compact()
+
+    def compact(self):
+        """
+        Убирает отметки удаленных записей. Позиции записей после этого меняются (row id — нет),
+        поэтому уплотнение записывается в журнал: позиции в последующих записях журнала
+        относятся к уплотненной таблице. Уплотнение внутри delete не записывается —
+        оно повторяется при восстановлении вместе с удалением.
+        """
+        with self.lock.write():
+            if not self.dead:
+                return
+            self._compact()
+            if self.log is not None:
+                self.log(["compact", self.name])
+
+    def _compact(self):
+        if not self.dead:
+            return
+        self.version += 1
+        if self.ids is None:
+            self.ids = array("q", range(len(self.data)))
+            self.next_id = len(self.data)
+        # Row id оставшихся записей сохраняются: ссылки на записи остаются верными после уплотнения
+        if isinstance(self.data, list):
+            self.ids = array("q", (row_id for row_id, record in zip(self.ids, self.data) if record is not None))
+            # Новый список: снимки, взятые читателями, остаются прежними
+            self.data = [record for record in self.data if record is not None]
+        else:
+            deleted = self.data.deleted
+            self.ids = array("q", (row_id for position, row_id in enumerate(self.ids) if position not in deleted))
+            self.data.compact()
+        self.dead = 0
+        # Позиции записей сместились — перестраиваем индексы
+        for index in self.indexes.values():
+            index.build(self.data)
+
+    def get(self, key):
+        """
+        Возвращает запись по значению первичного ключа или None.
+        :param key: Значение первичного ключа.
+        """
+        if self.pending_indexes:
+            with self.lock.write():
+                self._build_pending_indexes()
+        with self.lock.read():
+            position = self._key_position(key)
+            return None if position is None else self.data[position]
+
+    @timed("update", rows=1)
+    def update_by_pk(self, key, updates):
+        """
+        Обновляет запись по значению первичного ключа.
+        :return: True, если запись найдена.
+        """
+        updates = self.types.validate_updates({col: value for col, value in updates.items() if col in self.schema})
+        with self.lock.write():
+            self._build_pending_indexes()
+            position = self._key_position(key)
+            if position is None:
+                return False
+            if updates:
+                if self.primary_key in updates:
+                    self._check_primary_key([updates[self.primary_key]], (position,))
+                self._update_positions([position], updates)
+                if self.log is not None:
+                    self.log(["update", self.name, [position], updates])
+            return True
+
+    @timed("delete", rows=1)
+    def delete_by_pk(self, key):
         """
-        self.data = [record for record in self.data if not condition(record)]
+        Удаляет запись по значению первичного ключа.
+        :return: True, если запись найдена.
+        """
+        with self.lock.write():
+            self._build_pending_indexes()
+            position = self._key_position(key)
+            if position is None:
+                return False
+            self._delete_positions([position])
+            if self.log is not None:
+                self.log(["delete", self.name, [position]])
+            return True
+
+    def _key_position(self, key):
+        """
+        Позиция записи с указанным значением первичного ключа или None.
+        Вызывается под блокировкой таблицы после построения отложенных индексов.
+        """
+        if self.primary_key is None:
+            raise ValueError(f"У таблицы '{self.name}' нет первичного ключа.")
+        positions = self.indexes[self.primary_key].lookup("==", key)
+        return positions[0] if positions else None
+
+    @timed("select", condition=0)
+    def select_rows(self, condition=None, order_by=None, ascending=True):
+        """
+        Как select, но возвращает пары (row id, запись). Row id — номер записи в порядке вставки:
+        он не меняется при уплотнении таблицы и не переходит к другой записи, пока таблица
+        открыта (после загрузки из файла row id назначаются заново). По нему работают
+        fetch_rows, update_row и delete_row.
+        """
+        self._prepare_row_ids(order_by)
+        with self.lock.read():
+            data = self.data
+            positions = self._positions(condition, order_by, ascending)
+            return list(zip(self._to_row_ids(positions), (data[position] for position in positions)))
+
+    @timed("select", condition=0)
+    def row_ids(self, condition=None, order_by=None, ascending=True):
+        """
+        Возвращает row id записей, удовлетворяющих условию, в порядке order_by.
+        Вместе с fetch_rows позволяет читать большой результат страницами.
+        """
+        self._prepare_row_ids(order_by)
+        with self.lock.read():
+            return self._to_row_ids(self._positions(condition, order_by, ascending))
 
-    def select(self, condition=None, order_by=None, ascending=True):
+    def fetch_rows(self, row_ids):
+        """
+        Возвращает пары (row id, запись) для указанных row id (например, одной страницы результата).
+        Удаленные и несуществующие записи пропускаются.
+        """
+        with self.lock.read():
+            data = self.data
+            rows = []
+            for row_id in row_ids:
+                position = self._row_position(row_id)
+                if position is not None:
+                    rows.append((row_id, data[position]))
+            return rows
+
+    def _prepare_row_ids(self, order_by):
+        if order_by is not None and order_by not in self.schema:
+            raise ValueError(f"Столбец '{order_by}' не существует.")
+        if self.pending_indexes:
+            with self.lock.write():
+                self._build_pending_indexes()
+
+    def _positions(self, condition, order_by, ascending):
+        positions = list(self._find_positions(condition))
+        if order_by is not None:
+            data = self.data
+            key = self._order_key(order_by)
+            positions.sort(key=lambda position: key(data[position]), reverse=not ascending)
+        return positions
+
+    def _to_row_ids(self, positions):
+        """Row id записей на указанных позициях."""
+        ids = self.ids
+        return positions if ids is None else [ids[position] for position in positions]
+
+    def _row_position(self, row_id):
+        """Позиция записи с указанным row id или None, если запись удалена или не существовала."""
+        ids = self.ids
+        if ids is None:
+            position = row_id
+        else:
+            position = bisect.bisect_left(ids, row_id)
+            if position == len(ids) or ids[position] != row_id:
+                return None
+        if not 0 <= position < len(self.data) or self.data[position] is None:
+            return None
+        return position
+
+    @timed("update", rows=1)
+    def update_row(self, row_id, updates):
+        """Обновляет запись по row id (см. select_rows)."""
+        updates = self.types.validate_updates({col: value for col, value in updates.items() if col in self.schema})
+        with self.lock.write():
+            position = self._row_position(row_id)
+            if position is None:
+                raise ValueError(f"Записи с row id {row_id} нет.")
+            if not updates:
+                return
+            if self.primary_key in updates:
+                self._check_primary_key([updates[self.primary_key]], (position,))
+            self._update_positions([position], updates)
+            if self.log is not None:
+                self.log(["update", self.name, [position], updates])
+
+    @timed("delete", rows=1)
+    def delete_row(self, row_id):
+        """Удаляет запись по row id (см. select_rows)."""
+        with self.lock.write():
+            position = self._row_position(row_id)
+            if position is None:
+                raise ValueError(f"Записи с row id {row_id} нет.")
+            self._delete_positions([position])
+            if self.log is not None:
+                self.log(["delete", self.name, [position]])
+
+    def select(self, condition=None, order_by=None, ascending=True, limit=None, offset=0):
         """
         Выбирает записи с фильтрацией и сортировкой.
-        :param condition: Лямбда-функция для фильтрации (по умолчанию None).
+        Условия-выражения (query.Expr, строка или (столбец, оператор, значение))
+        обрабатываются через индекс, если он есть. Полный просмотр построчной таблицы
+        идет по снимку списка записей и не блокирует одновременные изменения.
+        :param condition: Условие фильтрации: лямбда-функция, выражение query.Expr,
+                          строка вида "age > 30 and name like 'A%'" или (столбец, оператор, значение) (по умолчанию None).
         :param order_by: Поле для сортировки (по умолчанию None).
         :param ascending: Сортировка по возрастанию (по умолчанию True).
+        :param limit: Максимальное число записей (по умолчанию все).
+        :param offset: Сколько записей пропустить от начала результата.
         :return: Список записей.
+        Результаты запросов с условиями-выражениями кешируются до следующего изменения таблицы.
+        """
+        metrics = self.metrics
+        if metrics is None:
+            return self._select(condition, order_by, ascending, limit, offset)
+        trace = QueryTrace()
+        start = time.perf_counter()
+        try:
+            rows = self._select(condition, order_by, ascending, limit, offset, trace)
+        except Exception:
+            metrics.record(self.name, "select", time.perf_counter() - start, error=True)
+            raise
+        detail = describe_condition(condition)
+        if order_by is not None:
+            detail = f"{detail or ''} order by {order_by}{'' if ascending else ' desc'}".strip()
+        metrics.record(self.name, "select", time.perf_counter() - start, len(rows), trace.scanned, detail=detail)
+        return rows
+
+    def _select(self, condition, order_by, ascending, limit, offset, trace=None):
+        key = self._cache_key(condition, order_by, ascending, limit, offset)
+        if key is None:
+            return self._collect(condition, order_by, ascending, limit, offset, trace)
+        with self.lock.read():
+            version = self.version
+        rows = self.cache.get(key, version)
+        if rows is None:
+            rows = self._collect(condition, order_by, ascending, limit, offset, trace)
+            self.cache.put(key, version, rows)
+        return list(rows)
+
+    def _collect(self, condition, order_by, ascending, limit, offset, trace=None):
+        """Выполняет запрос select и возвращает список записей."""
+        return list(self._iter_select(condition, order_by, ascending, limit, offset, trace=trace))
+
+    @staticmethod
+    def _cache_key(condition, order_by, ascending, limit, offset):
+        """Ключ кеша: условие в нормализованном виде и параметры сортировки, None для лямбда-функций."""
+        expr = as_expr(condition)
+        if expr is None and condition is not None:
+            return None
+        return (expr.to_string() if expr is not None else "", order_by, ascending, limit, offset)
+
+    def cache_stats(self):
+        """Статистика кеша результатов: {"hits", "misses", "evictions", "entries", "rows"}."""
+        return self.cache.stats()
+
+    def iter_select(self, condition=None, order_by=None, ascending=True, limit=None, offset=0):
+        """
+        Генератор записей с теми же параметрами, что и select.
+        С limit и order_by выбираются первые limit + offset записей через кучу (O(n log k))
+        или обходом упорядоченного индекса по order_by, если он есть и по оценке планировщика
+        дешевле; полная сортировка не выполняется. Без order_by записи выдаются по мере просмотра.
+        """
+        yield from self._iter_select(condition, order_by, ascending, limit, offset)
+
+    def _iter_select(self, condition, order_by, ascending, limit, offset, plan=None, trace=None):
+        """
+        Выполняет запрос; если передан planner.Plan, записывает в него выбранный план.
+        :param trace: metrics.QueryTrace (или Plan), в который записывается число просмотренных записей.
+        """
+        if order_by is not None and order_by not in self.schema:
+            raise ValueError(f"Столбец '{order_by}' не существует.")
+        if self.pending_indexes:
+            with self.lock.write():
+                self._build_pending_indexes()
+        with self.lock.read():
+            expr, check, path = self._choose_path(condition, plan)
+            key = self._order_key(order_by)
+            index = self.indexes.get(order_by) if order_by else None
+            # Упорядоченный индекс не содержит пустых значений, поэтому по столбцу с ними не обходится
+            walk = (index is not None and index.kind == "sorted" and not self.types.by_name[order_by].nullable
+                    and self._prefer_ordered_walk(expr, check, path, limit, offset, plan))
+            candidates = None
+            if walk:
+                if plan is not None:
+                    plan.access, plan.index, plan.candidates = "index order", f"sorted({order_by})", None
+            else:
+                check, candidates = self._candidates(expr, check, path, plan)
+            if plan is not None:
+                plan.order = "index" if walk else None if order_by is None else "sort" if limit is None else "top-k"
+            data = self.data
+            if self.dead and candidates is None and not walk:
+                # При полном просмотре пропускаем удаленные записи
+                check = _skip_deleted(check)
+            snapshot = None
+            if walk:
+                # Порядок задает индекс: проходим его, пока не наберется offset + limit записей
+                # (удаленных записей в индексе нет)
+                needed = None if limit is None else offset + limit
+                rows = []
+                visited = 0
+                for position in index.ordered(ascending):
+                    if needed is not None and len(rows) >= needed:
+                        break
+                    visited += 1
+                    record = data[position]
+                    if check is None or check(record):
+                        rows.append(record)
+                result = iter(rows[offset:])
+                if trace is not None:
+                    trace.scanned = visited
+            elif candidates is not None:
+                if trace is not None:
+                    trace.scanned = len(candidates)
+                records = [data[position] for position in candidates]
+                result = iter(list(self._order_and_limit(records, check, key, ascending, limit, offset)))
+            elif isinstance(data, list):
+                # Снимок: записи не меняются на месте (см. _update_positions), а список
+                # пересоздается при удалении, поэтому копии ссылок достаточно
+                snapshot = data[:]
+            else:
+                result = iter(list(self._order_and_limit(data, check, key, ascending, limit, offset)))
+            if trace is not None and candidates is None and not walk:
+                trace.scanned = len(data) - self.dead
+        if snapshot is not None:
+            result = self._order_and_limit(snapshot, check, key, ascending, limit, offset)
+        yield from result
+
+    def _prefer_ordered_walk(self, expr, check, path, limit, offset, plan=None):
+        """
+        Решает, обходить ли упорядоченный индекс по order_by вместо фильтрации и сортировки.
+        Обход останавливается, набрав offset + limit записей: чем реже записи проходят условие
+        (оценка по статистике столбцов), тем дальше он идет.
+        """
+        rows = len(self.data) - self.dead
+        needed = rows if limit is None else min(rows, offset + limit)
+        selectivity = 1.0
+        if check is not None:
+            stats = self._statistics()
+            selectivity = stats.selectivity(expr) if stats is not None and expr is not None else DEFAULT_RANGE
+        if path is not None:
+            other = path[1]
+        elif check is not None:
+            other = scan_cost(rows, isinstance(self.data, ColumnarData) and self.data.can_filter(expr))
+        else:
+            other = 0.0
+        other += sort_cost(rows * selectivity, limit)
+        walk = ordered_walk_cost(needed, selectivity, rows)
+        if plan is not None:
+            plan.alternatives["index order"] = walk
+            plan.alternatives["filter + " + ("sort" if limit is None else "top-k")] = other
+            if walk < other:
+                plan.cost = walk
+        return walk < other
+
+    @staticmethod
+    def _order_and_limit(records, check, key, ascending, limit, offset):
+        """
+        Фильтрует, упорядочивает и ограничивает записи; возвращает итератор.
+        :param key: Функция ключа сортировки (см. _order_key) или None без сортировки.
+        """
+        matches = records if check is None else (record for record in records if check(record))
+        if key is None:
+            return itertools.islice(matches, offset, None if limit is None else offset + limit)
+        if limit is None:
+            return iter(sorted(matches, key=key, reverse=not ascending)[offset:])
+        # nsmallest/nlargest дают тот же результат, что устойчивая сортировка со срезом
+        pick = heapq.nsmallest if ascending else heapq.nlargest
+        return iter(pick(offset + limit, matches, key=key)[offset:])
+
+    def _order_key(self, order_by):
+        """Ключ сортировки по столбцу; пустые значения идут после остальных (при убывании — перед)."""
+        if order_by is None:
+            return None
+        if self.types.by_name[order_by].nullable:
+            return lambda record: (record[order_by] is None, record[order_by])
+        return operator.itemgetter(order_by)
+
+    def _plan(self, condition, plan=None):
+        """
+        Выбирает способ поиска записей по условию (см. _choose_path) и находит кандидатов.
+        :param plan: planner.Plan, в который записывается выбранный способ (для explain).
+        :return: (check, candidates): check — функция проверки записи или None, если проверка не нужна;
+                 candidates — позиции-кандидаты в порядке хранения или None для полного просмотра.
+        """
+        expr, check, path = self._choose_path(condition, plan)
+        return self._candidates(expr, check, path, plan)
+
+    def _choose_path(self, condition, plan=None):
+        """
+        Разбирает условие и выбирает индекс, если по оценке стоимости (см. planner) он дешевле
+        полного просмотра. Условие приводится к выражению (см. query.as_expr), которое компилируется
+        в одну функцию; число записей-кандидатов индекс сообщает точно, без их выборки.
+        :return: (выражение или None, функция проверки или None, путь по индексу (см. _index_path) или None).
         """
-        result = [record for record in self.data if not condition or condition(record)]
-        if order_by:
-            result.sort(key=lambda x: x[order_by], reverse=not ascending)
+        rows = len(self.data) - self.dead
+        columnar = isinstance(self.data, ColumnarData)
+        if plan is not None:
+            plan.rows = rows
+            self._estimate(condition, plan)
+        if condition is None:
+            return None, None, None
+        expr = as_expr(condition)
+        if expr is None:
+            if plan is not None:
+                plan.cost = scan_cost(rows)
+            return None, condition, None
+
+        unknown = expr.columns() - set(self.schema)
+        if unknown:
+            raise ValueError(f"Столбец '{sorted(unknown)[0]}' не существует.")
+        check = expr.compile()
+        scan = scan_cost(rows, columnar and self.data.can_filter(expr))
+        path = self._index_path(expr, rows)
+        if plan is not None:
+            plan.cost = scan
+            plan.alternatives["scan"] = scan
+            if path is not None:
+                plan.alternatives["index"] = path[1]
+        if path is not None and path[1] >= scan:
+            path = None
+        return expr, check, path
+
+    def _candidates(self, expr, check, path, plan=None):
+        """Находит позиции-кандидатов выбранным способом: (check, candidates), как _plan."""
+        if path is not None:
+            _, cost, fetch, description = path
+            candidates = sorted(fetch())
+            if plan is not None:
+                plan.access, plan.index, plan.cost, plan.candidates = "index", description, cost, len(candidates)
+            return check, candidates
+        if expr is not None and isinstance(self.data, ColumnarData):
+            # Векторная фильтрация по типизированным столбцам без сборки строк
+            result = self.data.candidates(expr)
+            if result is not None:
+                positions, exact = result
+                if plan is not None:
+                    plan.access, plan.candidates = "columnar", len(positions)
+                return (None if exact else check), positions
+        return check, None
+
+    def _estimate(self, condition, plan):
+        """Записывает в план оценку числа записей результата по статистике столбцов."""
+        expr = as_expr(condition)
+        if condition is not None:
+            plan.condition = "<функция>" if expr is None else expr.to_string()
+        stats = self._statistics()
+        if stats is None:
+            return
+        if condition is None:
+            selectivity = 1.0
+        elif expr is None:
+            selectivity = DEFAULT_RANGE  # Лямбда-функцию оценить нельзя
+        else:
+            selectivity = stats.selectivity(expr)
+        plan.estimated_rows = stats.rows * selectivity
+
+    def _find_positions(self, condition):
+        """Возвращает позиции записей, удовлетворяющих условию, в порядке хранения."""
+        self._build_pending_indexes()
+        check, candidates = self._plan(condition)
+        data = self.data
+        if candidates is None:
+            if check is None:
+                if not self.dead:
+                    return range(len(data))
+                return [position for position, record in enumerate(data) if record is not None]
+            if self.dead:
+                check = _skip_deleted(check)
+            return [position for position, record in enumerate(data) if check(record)]
+        if check is None:
+            return candidates
+        return [position for position in candidates if check(data[position])]
+
+    def _index_path(self, expr, rows):
+        """
+        Ищет способ выбрать кандидатов по индексам.
+        :return: (число кандидатов, стоимость, функция выборки множества позиций, описание)
+                 или None, если для выражения нужен полный просмотр таблицы.
+        """
+        if isinstance(expr, And):
+            # Достаточно одного индексируемого условия — берем самое дешевое
+            best = None
+            for item in expr.items:
+                path = self._index_path(item, rows)
+                if path is not None and (best is None or path[1] < best[1]):
+                    best = path
+            return best
+        if isinstance(expr, Or):
+            # Объединение возможно, только если индексируется каждая ветвь
+            paths = []
+            for item in expr.items:
+                path = self._index_path(item, rows)
+                if path is None:
+                    return None
+                paths.append(path)
+
+            def fetch_union():
+                result = set()
+                for path in paths:
+                    result.update(path[2]())
+                return result
+
+            matches = sum(path[0] for path in paths)
+            return (matches, sum(path[1] for path in paths), fetch_union,
+                    " | ".join(path[3] for path in paths))
+
+        index = self.indexes.get(getattr(expr, "column", None))
+        if index is None:
+            return None
+        description = f"{index.kind}({expr.column}): {expr.to_string()}"
+        if index.kind == "sorted" and None in _operands(expr):
+            return None  # Упорядоченный индекс не хранит пустых значений: условие проверяется просмотром
+        if isinstance(expr, Comparison) and not isinstance(expr.value, Col) and index.supports(expr.op):
+            matches = index.count(expr.op, expr.value)
+            fetch = lambda: set(index.lookup(expr.op, expr.value))
+        elif isinstance(expr, In) and index.supports("=="):
+            matches = sum(index.count("==", value) for value in set(expr.values))
+
+            def fetch():
+                result = set()
+                for value in expr.values:
+                    result.update(index.lookup("==", value))
+                return result
+        elif isinstance(expr, Between) and index.supports("<="):
+            matches = index.count_between(expr.low, expr.high)
+            fetch = lambda: set(index.between(expr.low, expr.high))
+        else:
+            return None
+        return matches, index_cost(matches, rows), fetch, description
+
+    def _statistics(self):
+        """
+        Статистика столбцов для планировщика; вызывается под блокировкой таблицы.
+        Собирается при первом обращении и пересобирается, когда устарела.
+        :return: planner.TableStats или None для лениво открытой таблицы (сбор потребовал бы загрузки).
+        """
+        if isinstance(self.data, SegmentData):
+            return None
+        stats = self.stats
+        if stats is None or stats.stale():
+            stats = self.stats = TableStats(self.schema, self.data)
+        return stats
+
+    def statistics(self):
+        """
+        Статистика столбцов: число записей, доля пустых значений, число различных значений,
+        минимум, максимум и гистограммы (см. planner.TableStats.describe).
+        """
+        with self.lock.read():
+            stats = self._statistics()
+            return None if stats is None else stats.describe()
+
+    def explain(self, condition=None, order_by=None, ascending=True, limit=None, offset=0):
+        """
+        Выполняет запрос (параметры как у select, кеш результатов не используется)
+        и возвращает выбранный план: способ доступа ("scan", "index", "columnar",
+        "index order" — обход упорядоченного индекса по order_by), способ упорядочивания,
+        стоимость рассмотренных вариантов, оценку и фактическое число записей результата и время.
+        :return: Словарь с описанием плана.
+        """
+        plan = Plan(self.name)
+        self.statistics()  # Сбор статистики не входит во время запроса
+        start = time.perf_counter()
+        actual = sum(1 for _ in self._iter_select(condition, order_by, ascending, limit, offset, plan, trace=plan))
+        result = plan.describe()
+        if result["estimated_rows"] is not None and limit is not None:
+            result["estimated_rows"] = max(0, min(result["estimated_rows"] - offset, limit))
+        result["actual_rows"] = actual
+        result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 3)
         return result
 
+    def iter_batches(self, batch_size=BATCH_SIZE):
+        """
+        Перебирает записи пакетами: списками кортежей значений в порядке столбцов схемы.
+        Построчная таблица перебирается по снимку; колоночная и ленивая — под блокировкой
+        чтения, которая держится до конца перебора.
+        :param batch_size: Число записей в пакете.
+        """
+        columns = list(self.schema)
+        with self.lock.read():
+            if not isinstance(self.data, list):
+                for start in range(0, len(self.data), batch_size):
+                    values = self._column_values(self.data, start, start + batch_size)
+                    yield list(zip(*(values[col] for col in columns)))
+                return
+            snapshot = self.data[:]
+        for start in range(0, len(snapshot), batch_size):
+            yield [tuple(record[col] for col in columns)
+                   for record in snapshot[start:start + batch_size] if record is not None]
+
+    def count(self):
+        """Число записей в таблице (без удаленных)."""
+        with self.lock.read():
+            return len(self.data) - self.dead
+
     def fetch_all(self):
-        """Возвращает все записи таблицы."""
-        return self.data
+        """
+        Возвращает все записи таблицы: для построчного хранения — снимок списка записей,
+        для колоночного — ленивые представления строк.
+        """
+        with self.lock.read():
+            if self.dead:
+                return [record for record in self.data if record is not None]
+            return self.data[:] if isinstance(self.data, list) else self.data
+
+    @timed("aggregate", condition=2)
+    def aggregate(self, aggregates, group_by=None, condition=None, parallel=False, workers=None):
+        """
+        Вычисляет агрегаты (COUNT/SUM/AVG/MIN/MAX), при необходимости по группам.
+        :param aggregates: {"имя результата": ("функция", "столбец")}, например
+                           {"n": ("count", "*"), "total": ("sum", "price")}.
+        :param group_by: Столбец или список столбцов группировки (по умолчанию None).
+        :param condition: Условие фильтрации, как в select.
+        :param parallel: Считать в пуле процессов по диапазонам строк. Условие должно быть
+                         выражением или строкой: лямбда-функцию нельзя передать в другой процесс,
+                         поэтому с ней агрегация выполняется в текущем процессе.
+        :param workers: Число процессов (по умолчанию — число ядер).
+        :return: Словарь {"имя": значение} без группировки или список словарей по группам.
+        """
+        group_by = [group_by] if isinstance(group_by, str) else list(group_by or [])
+        for col in group_by:
+            if col not in self.schema:
+                raise ValueError(f"Столбец '{col}' не существует.")
+        aggregates = normalize_aggregates(aggregates, self.schema)
+        expr = as_expr(condition)
+        if parallel and (condition is None or expr is not None):
+            unknown = expr.columns() - set(self.schema) if expr is not None else set()
+            if unknown:
+                raise ValueError(f"Столбец '{sorted(unknown)[0]}' не существует.")
+            # Процессы пропускают удаленные записи сами: таблица не уплотняется, чтения не ждут агрегацию
+            with self.lock.read():
+                groups = parallel_aggregate(self.data, self.schema, aggregates, group_by, expr, workers)
+        else:
+            # Записи просматриваются потоком, без копии результата в кеше select
+            groups = aggregate_records(self.iter_select(condition), aggregates, group_by)
+        return finalize_groups(groups, aggregates, group_by)
+
+    def group_by(self, keys, condition=None):
+        """
+        Группирует записи для хеш-агрегации: table.group_by("city").agg(n=("count", "*"), total=("sum", "price")).
+        :param keys: Столбец или список столбцов группировки.
+        :param condition: Условие фильтрации, как в select.
+        :return: Объект aggregate.GroupBy.
+        """
+        keys = [keys] if isinstance(keys, str) else list(keys)
+        for col in keys:
+            if col not in self.schema:
+                raise ValueError(f"Столбец '{col}' не существует.")
+        return GroupBy(self, keys, condition)
+
+    def index_kind(self, column):
+        """Тип индекса по столбцу ("hash" или "sorted") или None, если индекса нет."""
+        if column in self.pending_indexes:
+            return self.pending_indexes[column]
+        index = self.indexes.get(column)
+        return None if index is None else index.kind
+
+    def ordered_by(self, columns, nulls):
+        """
+        Записи, упорядоченные по столбцам columns (для соединения слиянием).
+        По одному столбцу с упорядоченным индексом записи идут в порядке индекса без сортировки.
+        :param nulls: Список, в который откладываются записи с None в ключе (их нельзя упорядочить);
+                      None — такие записи не нужны.
+        """
+        null = null_check(columns)
+        if len(columns) == 1 and self.index_kind(columns[0]) == "sorted":
+            # Упорядоченный индекс не содержит None: такие записи ищутся отдельно
+            if nulls is not None:
+                nulls.extend(self.iter_select(null))
+            if self.pending_indexes:
+                with self.lock.write():
+                    self._build_pending_indexes()
+            with self.lock.read():
+                data = self.data
+                return [data[position] for position in self.indexes[columns[0]].ordered()]
+        live = []
+        for record in self.iter_select():
+            if not null(record):
+                live.append(record)
+            elif nulls is not None:
+                nulls.append(record)
+        live.sort(key=key_function(columns))
+        return live
+
+    def _index_definitions(self):
+        """Описание индексов для сохранения: {"col_name": "kind"}."""
+        definitions = dict(self.pending_indexes)
+        definitions.update({column: index.kind for column, index in self.indexes.items()})
+        return definitions
+
+    def _build_pending_indexes(self):
+        """Строит индексы, отложенные при ленивом открытии таблицы."""
+        for column, kind in list(self.pending_indexes.items()):
+            index = INDEX_TYPES[kind](column)
+            index.build(self.data)
+            self.indexes[column] = index
+            del self.pending_indexes[column]
+
+    def _materialize(self):
+        """Загружает лениво открытую таблицу в память (перед первым изменением)."""
+        if not isinstance(self.data, SegmentData):
+            return
+        reader = self.data.reader
+        data = ColumnarData(self.schema) if self.storage == "columnar" else []
+        for number in range(len(reader.batches)):
+            count, columns = reader.read_columns(number)
+            if self.storage == "columnar":
+                data.extend_columns(columns, count)
+            else:
+                data.extend(rows_from_columns(self.schema, columns))
+        self.data = data
+        reader.close()
+        self._build_pending_indexes()
 
     def to_dict(self):
         """Возвращает таблицу в виде словаря для сохранения."""
-        return {
-            "name": self.name,
-            "schema": self.schema,
-            "data": self.data,
-        }
+        with self.lock.read():
+            return {
+                "name": self.name,
+                "schema": self.schema,
+                "storage": self.storage,
+                "primary_key": self.primary_key,
+                "data": [dict(record) if not isinstance(record, dict) else record
+                         for record in self.data if record is not None],
+                "indexes": self._index_definitions(),
+            }
 
     @staticmethod
     def from_dict(data):
         """Создает таблицу из словаря."""
-        table = Table(data["name"], data["schema"])
-        table.data = data["data"]
+        table = Table(data["name"], data["schema"], storage=data.get("storage", "rows"),
+                      primary_key=data.get("primary_key"))
+        table.types.restore(data["data"])
+        if table.storage == "rows":
+            table.data = data["data"]
+        else:
+            for record in data["data"]:
+                table.data.append(record)
+        for column, kind in data.get("indexes", {}).items():
+            table.create_index(column, kind)
+        return table
+
+    def _column_values(self, data, start, end):
+        """Возвращает значения записей data[start:end] по столбцам."""
+        if isinstance(data, ColumnarData):
+            return data.slice_columns(start, end)
+        batch = data[start:end]
+        return {col: [record[col] for record in batch] for col in self.schema}
+
+    def to_segment(self, path, batch_size=BATCH_SIZE, progress=None):
+        """
+        Записывает таблицу в файл сегмента пакетами по batch_size строк.
+        Построчная таблица пишется по снимку и не блокирует изменения на время записи.
+        Перед записью таблица уплотняется: позиции в сегменте совпадают с позициями
+        в памяти, на которые ссылаются последующие записи журнала.
+        :param path: Путь к файлу сегмента.
+        :param batch_size: Число строк в пакете.
+        :param progress: Функция progress(rows), вызываемая после каждого записанного пакета.
+        """
+        header, snapshot = self._snapshot_segment(path, batch_size, progress)
+        if snapshot is not None:
+            self._write_segment(path, header, snapshot, batch_size, progress)
+
+    def _snapshot_segment(self, path, batch_size=BATCH_SIZE, progress=None):
+        """
+        Уплотняет таблицу и фиксирует ее состояние для записи сегмента (см. to_segment).
+        Колоночная и ленивая таблица записываются сразу, под блокировкой чтения.
+        :return: (заголовок сегмента, снимок списка записей или None, если сегмент уже записан).
+        """
+        while True:
+            if self.dead:
+                self.compact()
+            with self.lock.read():
+                if self.dead:
+                    continue  # Записи удалили между уплотнением и снимком
+                header = {
+                    "name": self.name,
+                    "schema": self.schema,
+                    "storage": self.storage,
+                    "primary_key": self.primary_key,
+                    "indexes": self._index_definitions(),
+                    "lsn": self.lsn,
+                }
+                if not isinstance(self.data, list):
+                    self._write_segment(path, header, self.data, batch_size, progress)
+                    return header, None
+                return header, self.data[:]
+
+    def _save_segments(self, directory_path, progress=None):
+        """
+        Записывает таблицу в каталог сегментов (файл "<таблица>.seg").
+        :return: Описание таблицы для каталога — имя файла.
+        """
+        file_name = f"{self.name}.seg"
+        file_path = os.path.join(directory_path, file_name)
+        # Пишем во временный файл и подменяем, чтобы прерванное сохранение не портило данные
+        self.to_segment(file_path + ".tmp", progress=progress)
+        os.replace(file_path + ".tmp", file_path)
+        return file_name
+
+    def _write_segment(self, path, header, data, batch_size, progress=None):
+        with SegmentWriter(path, header) as writer:
+            for start in range(0, len(data), batch_size):
+                end = min(start + batch_size, len(data))
+                writer.write_columns(self._column_values(data, start, end), end - start)
+                if progress is not None:
+                    progress(end - start)
+
+    @staticmethod
+    def from_segment(path, lazy=False):
+        """
+        Создает таблицу из файла сегмента.
+        :param lazy: Не читать записи сразу: файл отображается в память, пакеты
+                     декодируются при обращении, индексы строятся при первом запросе.
+        """
+        reader = SegmentReader(path, use_mmap=lazy)
+        header = reader.header
+        table = Table(header["name"], header["schema"], storage=header.get("storage", "rows"),
+                      primary_key=header.get("primary_key"))
+        table.data = SegmentData(reader)
+        table.indexes = {}  # Все индексы, включая индекс первичного ключа, строятся по данным сегмента
+        table.pending_indexes = dict(header.get("indexes", {}))
+        table.lsn = header.get("lsn", 0)
+        if not lazy:
+            table._materialize()
         return table
-    
-    def generate_report(self, filename, columns=None, format="csv"):
+
+    def _replay(self, lsn, op, args):
+        """Повторно применяет запись журнала, если ее еще нет в сегменте таблицы (см. Database._recover)."""
+        if lsn <= self.lsn:
+            return
+        if op == "insert":
+            self.insert(args[0])
+        elif op == "insert_many":
+            self.insert_many(args[0])
+        elif op == "update":
+            self._update_positions(args[0], self.types.validate_updates(args[1]))  # Даты в журнале хранятся строками ISO
+        elif op == "delete":
+            self._delete_positions(args[0])
+        elif op == "compact":
+            self._compact()
+        elif op == "create_index":
+            self.create_index(*args)
+        elif op == "drop_index":
+            self.drop_index(*args)
+        else:
+            raise ValueError(f"Неизвестная операция в журнале: '{op}'.")
+        self.lsn = lsn
+
+    @timed("export")
+    def generate_report(self, filename, columns=None, format="csv", condition=None, order_by=None, ascending=True,
+                        limit=None, offset=0, group_by=None, aggregates=None, compression=None, progress=None):
         """
         Генерирует отчет на основе данных таблицы.
+        Строки выбираются потоком (как в iter_select) и пишутся в файл пакетами, поэтому
+        отчет не собирается в памяти целиком. При order_by без limit упорядочиваются ссылки
+        на подходящие записи (копии записей не создаются); с limit — только первые limit + offset.
 
         :param filename: Имя файла для сохранения отчета.
-        :param columns: Список столбцов для включения в отчет (по умолчанию все).
-        :param format: Формат отчета ("csv", "txt" и т.д.).
-        """
-        if columns is None:
-            columns = self.headers  # Использовать все столбцы, если не указано
-        
-        data = [columns] + [
-            [row[col] for col in columns if col in row]
-            for row in self.data
-        ]
-        
-        if format == "csv":
-            with open(filename, "w", newline="") as file:
-                writer = csv.writer(file)
-                writer.writerows(data)
-        elif format == "txt":
-            with open(filename, "w") as file:
-                for row in data:
-                    file.write("\t".join(map(str, row)) + "\n")
+        :param columns: Список столбцов для включения в отчет (по умолчанию все; с aggregates —
+                        столбцы группировки и имена агрегатов).
+        :param format: Формат отчета: "csv", "txt" (значения через табуляцию), "jsonl" (JSON Lines) или "xlsx".
+        :param condition: Условие фильтрации, как в select.
+        :param order_by: Столбец сортировки (с aggregates — столбец группировки или имя агрегата).
+        :param ascending: Сортировка по возрастанию.
+        :param limit: Максимальное число строк отчета.
+        :param offset: Сколько строк пропустить от начала.
+        :param group_by: Столбец или список столбцов группировки (вместе с aggregates).
+        :param aggregates: {"имя": ("функция", "столбец")}, как в aggregate: в отчет попадает
+                           строка на группу, а не на запись.
+        :param compression: Сжатие csv/txt/jsonl: None, "gzip" или "zstd".
+        :param progress: Функция progress(rows), вызываемая после каждого записанного пакета.
+        :return: Число строк отчета.
+        """
+        if format not in REPORT_FORMATS:
+            raise ValueError(f"Неподдерживаемый формат отчета '{format}'.")
+        if aggregates is not None:
+            columns, rows = self._aggregate_report(columns, condition, order_by, ascending, limit, offset,
+                                                   group_by, aggregates)
+        else:
+            if group_by is not None:
+                raise ValueError("Для группировки в отчете нужны агрегаты (aggregates).")
+            columns = list(self.schema) if columns is None else [col.strip() for col in columns]
+            for col in columns:
+                if col not in self.schema:
+                    raise ValueError(f"Столбец '{col}' не существует.")
+            project = operator.itemgetter(*columns) if len(columns) != 1 else (lambda record: (record[columns[0]],))
+            rows = map(project, self.iter_select(condition, order_by, ascending, limit, offset))
+        return write_report(filename, columns, rows, format, compression, sheet=self.name, progress=progress)
+
+    def _aggregate_report(self, columns, condition, order_by, ascending, limit, offset, group_by, aggregates):
+        """
+        Строки отчета с агрегатами: по строке на группу (в памяти — только группы).
+        :return: (столбцы отчета, итератор строк).
+        """
+        group_by = [group_by] if isinstance(group_by, str) else list(group_by or [])
+        result = self.aggregate(aggregates, group_by=group_by, condition=condition)
+        groups = result if group_by else [result]
+        available = group_by + list(aggregates)
+        columns = available if columns is None else [col.strip() for col in columns]
+        for col in columns:
+            if col not in available:
+                raise ValueError(f"Столбец '{col}' отсутствует в результате группировки.")
+        if order_by is not None:
+            if order_by not in available:
+                raise ValueError(f"Столбец '{order_by}' отсутствует в результате группировки.")
+            # Пустые значения агрегатов (например, avg без записей) — в конце
+            groups.sort(key=lambda group: (group[order_by] is None, group[order_by]), reverse=not ascending)
+        groups = groups[offset:] if limit is None else groups[offset:offset + limit]
+        return columns, ([group[col] for col in columns] for group in groups)
+
+
+class PartitionedTable(Table):
+    """
+    Секционированная таблица: записи распределены по секциям — таблицам Table со своими
+    записями, индексами, статистикой и файлом сегмента — по хешу или диапазонам значений
+    одного столбца (см. модуль partition).
+
+    Запрос просматривает только секции, которые могут содержать подходящие записи (отсечение
+    по условию); select просматривает несколько секций параллельно в пуле потоков и сливает
+    их результаты. При сохранении в каталог сегментов перезаписываются только секции,
+    измененные с прошлого сохранения. Первичный ключ, если он есть, должен совпадать
+    со столбцом секционирования: его уникальность проверяется внутри одной секции.
+
+    Изменения выполняются по одному под блокировкой таблицы; чтения не берут ее
+    и видят каждую секцию на момент ее просмотра.
+    Row id записи — номер секции и row id записи в секции (см. partition.PARTITION_ROW_BITS);
+    запись, перенесенная в другую секцию при изменении столбца секционирования, получает новый row id.
+    Изменения и журнал адресуют записи номером секции и позицией в ней (тем же способом).
+    """
+
+    def __init__(self, name, schema, partition_by, storage="rows", primary_key=None):
+        """
+        :param partition_by: ("hash", "столбец", число секций) или ("range", "столбец", [границы]).
+        Остальные параметры — как у Table.
+        """
+        if storage not in STORAGE_TYPES:
+            raise ValueError(f"Неизвестный способ хранения '{storage}'.")
+        if primary_key is not None and primary_key not in schema:
+            raise ValueError(f"Столбец '{primary_key}' не существует.")
+        self.name = name
+        self.schema = schema
+        self.types = compile_schema(schema)
+        self.storage = storage
+        self.primary_key = primary_key
+        self.partitioning = make_partitioning(partition_by, self.types)
+        if primary_key is not None and primary_key != self.partitioning.column:
+            raise ValueError("Первичный ключ секционированной таблицы должен совпадать со столбцом секционирования.")
+        self.partitions = [Table(name, schema, storage=storage, primary_key=primary_key)
+                           for _ in range(self.partitioning.count)]
+        self.saved = [None] * self.partitioning.count  # (каталог, версия секции) при последнем сохранении секции
+        self.log = None
+        self.lsn = 0
+        self.lock = ReadWriteLock()  # Изменения секций выполняются по одному
+        self.cache = QueryCache()
+        self.metrics = None
+        self.executor = None  # Пул потоков для просмотра секций (создается при первом параллельном запросе)
+
+    @property
+    def version(self):
+        """Сумма версий секций: меняется при любом изменении записей."""
+        return sum(partition.version for partition in self.partitions)
+
+    def describe_partitions(self):
+        """Секционирование и число записей в каждой секции."""
+        return {"partition_by": self.partitioning.describe(),
+                "rows": [partition.count() for partition in self.partitions]}
+
+    # --- Распределение записей по секциям ---
+
+    def _group(self, records):
+        """Раскладывает записи по секциям: {номер секции: [записи]}."""
+        column, partition_of = self.partitioning.column, self.partitioning.partition_of
+        groups = {}
+        for record in records:
+            groups.setdefault(partition_of(record[column]), []).append(record)
+        return groups
+
+    @staticmethod
+    def _row_id(number, position):
+        return number << PARTITION_ROW_BITS | position
+
+    def _split_row_ids(self, row_ids):
+        """Раскладывает row id по секциям: {номер секции: [позиции]}; row id несуществующих секций пропускаются."""
+        mask = (1 << PARTITION_ROW_BITS) - 1
+        groups = {}
+        for row_id in row_ids:
+            number = row_id >> PARTITION_ROW_BITS
+            if 0 <= number < len(self.partitions):
+                groups.setdefault(number, []).append(row_id & mask)
+        return groups
+
+    def _key_partition(self, key):
+        """Секция, в которой может быть запись с указанным значением первичного ключа, или None."""
+        if self.primary_key is None:
+            raise ValueError(f"У таблицы '{self.name}' нет первичного ключа.")
+        try:
+            return self.partitions[self.partitioning.partition_of(key)]
+        except TypeError:
+            return None  # Значение несравнимо с границами секций: такой записи нет
+
+    def _prune(self, condition, order_by=None):
+        """Номера секций, которые нужно просмотреть для условия (см. partition.Partitioning.prune)."""
+        if order_by is not None and order_by not in self.schema:
+            raise ValueError(f"Столбец '{order_by}' не существует.")
+        expr = as_expr(condition)
+        if expr is not None:
+            unknown = expr.columns() - set(self.schema)
+            if unknown:
+                raise ValueError(f"Столбец '{sorted(unknown)[0]}' не существует.")
+        return self.partitioning.prune(expr)
+
+    def _map(self, function, numbers):
+        """
+        Вызывает function(номер секции) для каждой секции; несколько секций с числом записей
+        не меньше PARALLEL_MIN_ROWS — параллельно в пуле потоков.
+        """
+        if len(numbers) < 2 or sum(self.partitions[number].count() for number in numbers) < PARALLEL_MIN_ROWS:
+            return [function(number) for number in numbers]
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=PARTITION_WORKERS)
+        return list(self.executor.map(function, numbers))
+
+    def _log(self, entry, numbers):
+        """Записывает изменение в журнал и отмечает его номер в измененных секциях (для восстановления)."""
+        if self.log is None:
+            return
+        self.log(entry)
+        for number in numbers:
+            self.partitions[number].lsn = self.lsn
+
+    # --- Индексы ---
+
+    def create_index(self, column, kind="hash"):
+        """Создает индекс по столбцу в каждой секции (см. Table.create_index)."""
+        with self.lock.write():
+            for partition in self.partitions:
+                partition.create_index(column, kind)
+            self.saved = [None] * len(self.partitions)  # Индексы описаны в заголовке сегмента каждой секции
+            self._log(["create_index", self.name, column, kind], range(len(self.partitions)))
+
+    def drop_index(self, column):
+        """Удаляет индекс по столбцу во всех секциях."""
+        with self.lock.write():
+            for partition in self.partitions:
+                partition.drop_index(column)
+            self.saved = [None] * len(self.partitions)
+            self._log(["drop_index", self.name, column], range(len(self.partitions)))
+
+    def index_kind(self, column):
+        return self.partitions[0].index_kind(column)
+
+    def _index_definitions(self):
+        return self.partitions[0]._index_definitions()
+
+    # --- Изменения ---
+
+    @timed("insert", rows=1)
+    def insert(self, record):
+        """Вставляет запись в ее секцию (см. Table.insert)."""
+        record = self.types.validate(record)
+        number = self.partitioning.partition_of(record[self.partitioning.column])
+        with self.lock.write():
+            self.partitions[number]._insert_batch([record])
+            self._log(["insert", self.name, record], (number,))
+
+    @timed("insert")
+    def insert_many(self, records):
+        """
+        Пакетно вставляет записи, распределяя их по секциям (см. Table.insert_many).
+        :return: Количество добавленных записей.
+        """
+        batch = self.types.validate_batch(records)
+        groups = self._group(batch)
+        with self.lock.write():
+            if self.primary_key is not None and len(groups) > 1:
+                # Ключи проверяются во всех секциях до вставки: при ошибке таблица не меняется
+                for number, group in groups.items():
+                    partition = self.partitions[number]
+                    with partition.lock.write():
+                        partition._materialize()
+                        partition._check_primary_key([record[self.primary_key] for record in group])
+            for number, group in groups.items():
+                self.partitions[number]._insert_batch(group)
+            if batch:
+                self._log(["insert_many", self.name, batch], groups)
+        return len(batch)
+
+    @timed("update", condition=0)
+    def update(self, condition, updates):
+        """
+        Обновляет записи, соответствующие условию, в секциях, оставшихся после отсечения.
+        Записи, у которых меняется значение столбца секционирования, переносятся в новую секцию.
+        :return: Количество обновленных записей.
+        """
+        updates = self.types.validate_updates({key: value for key, value in updates.items() if key in self.schema})
+        numbers = self._prune(condition)
+        with self.lock.write():
+            row_ids = []
+            for number in numbers:
+                partition = self.partitions[number]
+                with partition.lock.write():
+                    row_ids.extend(self._row_id(number, position) for position in partition._find_positions(condition))
+            if not row_ids or not updates:
+                return 0
+            self._apply_updates(row_ids, updates)
+            return len(row_ids)
+
+    def _apply_updates(self, row_ids, updates):
+        """
+        Применяет проверенные обновления к записям с указанными row id и записывает их в журнал.
+        Запись, которая по новому значению столбца секционирования относится к другой секции,
+        удаляется из своей секции и вставляется в новую (в журнале — удаление и вставка,
+        поэтому каждая запись журнала относится к записям на своих позициях).
+        Вызывается под блокировкой записи таблицы.
+        """
+        column = self.partitioning.column
+        groups = self._split_row_ids(row_ids)
+        target = self.partitioning.partition_of(updates[column]) if column in updates else None
+        if self.primary_key in updates:
+            key = updates[self.primary_key]
+            if len(row_ids) > 1:
+                # Одно значение ключа у нескольких записей нарушило бы уникальность
+                raise ValueError(f"Значение {key!r} первичного ключа '{self.primary_key}' уже существует.")
+            (number, positions), = groups.items()
+            partition = self.partitions[target]
+            with partition.lock.write():
+                partition._materialize()
+                partition._check_primary_key([key], positions if number == target else ())
+        kept = {number: positions for number, positions in groups.items() if target in (None, number)}
+        moved = {number: positions for number, positions in groups.items() if number not in kept}
+        for number, positions in kept.items():
+            partition = self.partitions[number]
+            with partition.lock.write():
+                partition._update_positions(positions, updates)
+        if kept:
+            self._log(["update", self.name, [self._row_id(number, position) for number, positions in kept.items()
+                                             for position in positions], updates], kept)
+        if moved:
+            records = []
+            for number, positions in moved.items():
+                partition = self.partitions[number]
+                with partition.lock.write():
+                    partition._materialize()
+                    records.extend({**partition.data[position], **updates} for position in positions)
+                    partition._delete_positions(positions)
+            self._log(["delete", self.name, [self._row_id(number, position) for number, positions in moved.items()
+                                             for position in positions]], moved)
+            self.partitions[target]._insert_batch(records)
+            self._log(["insert_many", self.name, records], (target,))
+
+    def _delete_rows(self, row_ids):
+        """Удаляет записи с указанными row id (без записи в журнал)."""
+        groups = self._split_row_ids(row_ids)
+        for number, positions in groups.items():
+            partition = self.partitions[number]
+            with partition.lock.write():
+                partition._delete_positions(positions)
+        return groups
+
+    @timed("delete", condition=0)
+    def delete(self, condition):
+        """
+        Удаляет записи, соответствующие условию, в секциях, оставшихся после отсечения.
+        :return: Количество удаленных записей.
+        """
+        numbers = self._prune(condition)
+        with self.lock.write():
+            row_ids = []
+            for number in numbers:
+                partition = self.partitions[number]
+                with partition.lock.write():
+                    row_ids.extend(self._row_id(number, position) for position in partition._find_positions(condition))
+            if not row_ids:
+                return 0
+            groups = self._delete_rows(row_ids)
+            self._log(["delete", self.name, row_ids], groups)
+            return len(row_ids)
+
+    def compact(self):
+        """Уплотняет все секции (см. Table.compact)."""
+        with self.lock.write():
+            self._compact_partitions(range(len(self.partitions)))
+
+    def _compact_partitions(self, numbers):
+        """
+        Уплотняет секции с удаленными записями и записывает уплотнение в журнал
+        (у секций нет своего журнала, см. Table.compact). Вызывается под блокировкой таблицы.
+        """
+        compacted = []
+        for number in numbers:
+            partition = self.partitions[number]
+            with partition.lock.write():
+                if partition.dead:
+                    partition._compact()
+                    compacted.append(number)
+        if compacted:
+            self._log(["compact", self.name, compacted], compacted)
+
+    def get(self, key):
+        """Возвращает запись по значению первичного ключа или None (просматривается одна секция)."""
+        partition = self._key_partition(key)
+        return None if partition is None else partition.get(key)
+
+    def _key_row_id(self, key):
+        """Row id записи с указанным значением первичного ключа или None."""
+        partition = self._key_partition(key)
+        if partition is None:
+            return None
+        with partition.lock.write():
+            partition._build_pending_indexes()
+            position = partition._key_position(key)
+        return None if position is None else self._row_id(self.partitions.index(partition), position)
+
+    @timed("update", rows=1)
+    def update_by_pk(self, key, updates):
+        """
+        Обновляет запись по значению первичного ключа.
+        :return: True, если запись найдена.
+        """
+        updates = self.types.validate_updates({col: value for col, value in updates.items() if col in self.schema})
+        with self.lock.write():
+            row_id = self._key_row_id(key)
+            if row_id is None:
+                return False
+            if updates:
+                self._apply_updates([row_id], updates)
+            return True
+
+    @timed("delete", rows=1)
+    def delete_by_pk(self, key):
+        """
+        Удаляет запись по значению первичного ключа.
+        :return: True, если запись найдена.
+        """
+        with self.lock.write():
+            row_id = self._key_row_id(key)
+            if row_id is None:
+                return False
+            self._log(["delete", self.name, [row_id]], self._delete_rows([row_id]))
+            return True
+
+    def _position_id(self, row_id):
+        """Номер секции и позиция записи с указанным row id (упакованные, как row id) или None, если записи нет."""
+        for number, (partition_row_id,) in self._split_row_ids([row_id]).items():
+            partition = self.partitions[number]
+            with partition.lock.read():
+                position = partition._row_position(partition_row_id)
+            if position is not None:
+                return self._row_id(number, position)
+        return None
+
+    @timed("update", rows=1)
+    def update_row(self, row_id, updates):
+        """Обновляет запись по row id (см. select_rows)."""
+        updates = self.types.validate_updates({col: value for col, value in updates.items() if col in self.schema})
+        with self.lock.write():
+            position = self._position_id(row_id)
+            if position is None:
+                raise ValueError(f"Записи с row id {row_id} нет.")
+            if updates:
+                self._apply_updates([position], updates)
+
+    @timed("delete", rows=1)
+    def delete_row(self, row_id):
+        """Удаляет запись по row id (см. select_rows)."""
+        with self.lock.write():
+            position = self._position_id(row_id)
+            if position is None:
+                raise ValueError(f"Записи с row id {row_id} нет.")
+            self._log(["delete", self.name, [position]], self._delete_rows([position]))
+
+    # --- Чтение ---
+
+    def _rows(self, condition, order_by, ascending):
+        """Пары (row id, запись) из секций, оставшихся после отсечения, в порядке order_by."""
+        rows = []
+        for number in self._prune(condition, order_by):
+            rows.extend((self._row_id(number, position), record)
+                        for position, record in self.partitions[number].select_rows(condition))
+        if order_by is not None:
+            key = self._order_key(order_by)
+            rows.sort(key=lambda row: key(row[1]), reverse=not ascending)
+        return rows
+
+    @timed("select", condition=0)
+    def select_rows(self, condition=None, order_by=None, ascending=True):
+        """Как select, но возвращает пары (row id, запись) (см. Table.select_rows)."""
+        return self._rows(condition, order_by, ascending)
+
+    @timed("select", condition=0)
+    def row_ids(self, condition=None, order_by=None, ascending=True):
+        """Row id записей, удовлетворяющих условию, в порядке order_by (см. Table.row_ids)."""
+        return [row_id for row_id, _ in self._rows(condition, order_by, ascending)]
+
+    def fetch_rows(self, row_ids):
+        """Пары (row id, запись) для указанных row id; удаленные и несуществующие записи пропускаются."""
+        found = {}
+        for number, positions in self._split_row_ids(row_ids).items():
+            for position, record in self.partitions[number].fetch_rows(positions):
+                found[self._row_id(number, position)] = record
+        return [(row_id, found[row_id]) for row_id in row_ids if row_id in found]
+
+    def _streams(self, numbers, condition, order_by, ascending, limit, offset, traces, parallel):
+        """
+        Результаты запроса по секциям: каждая выбирает не больше offset + limit записей
+        (с order_by — упорядоченных), поэтому их слияние дает верный результат.
+        :param parallel: Просмотреть секции сразу в пуле потоков (иначе — генераторы, которые
+                         просматривают секцию при чтении результата).
+        """
+        needed = None if limit is None else offset + limit
+
+        def scan(number, trace):
+            return self.partitions[number]._iter_select(condition, order_by, ascending, needed, 0, trace=trace)
+
+        if parallel:
+            by_number = dict(zip(numbers, traces))
+            return self._map(lambda number: list(scan(number, by_number[number])), numbers)
+        return [scan(number, trace) for number, trace in zip(numbers, traces)]
+
+    def _merge(self, streams, order_by, ascending, limit, offset):
+        """Сливает результаты секций: подряд или с сохранением порядка order_by; применяет offset и limit."""
+        if order_by is None:
+            rows = itertools.chain.from_iterable(streams)
+        else:
+            rows = heapq.merge(*streams, key=self._order_key(order_by), reverse=not ascending)
+        return itertools.islice(rows, offset, None if limit is None else offset + limit)
+
+    def _iter_select(self, condition, order_by, ascending, limit, offset, plan=None, trace=None):
+        """Выполняет запрос по секциям, оставшимся после отсечения; секции просматриваются по мере чтения."""
+        numbers = self._prune(condition, order_by)
+        traces = [QueryTrace() for _ in numbers]
+        yield from self._merge(self._streams(numbers, condition, order_by, ascending, limit, offset, traces, False),
+                               order_by, ascending, limit, offset)
+        if trace is not None:
+            trace.scanned = sum(item.scanned for item in traces)
+
+    def _collect(self, condition, order_by, ascending, limit, offset, trace=None):
+        """Выполняет запрос select: секции просматриваются параллельно, результаты сливаются."""
+        numbers = self._prune(condition, order_by)
+        traces = [QueryTrace() for _ in numbers]
+        streams = self._streams(numbers, condition, order_by, ascending, limit, offset, traces, True)
+        rows = list(self._merge(streams, order_by, ascending, limit, offset))
+        if trace is not None:
+            trace.scanned = sum(item.scanned for item in traces)
+        return rows
+
+    def explain(self, condition=None, order_by=None, ascending=True, limit=None, offset=0):
+        """
+        Выполняет запрос (параметры как у select) в каждой секции, оставшейся после отсечения,
+        и возвращает план: секционирование, просмотренные секции и план запроса в каждой из них
+        ("partition_plans", см. Table.explain).
+        :return: Словарь с описанием плана.
+        """
+        numbers = self._prune(condition, order_by)
+        needed = None if limit is None else offset + limit
+        start = time.perf_counter()
+        plans = {number: self.partitions[number].explain(condition, order_by, ascending, needed, 0)
+                 for number in numbers}
+        elapsed = time.perf_counter() - start
+        estimates = [plan["estimated_rows"] for plan in plans.values()]
+        estimated = None if None in estimates else sum(estimates)
+        actual = max(0, sum(plan["actual_rows"] for plan in plans.values()) - offset)
+        if limit is not None:
+            actual = min(actual, limit)
+            if estimated is not None:
+                estimated = max(0, min(estimated - offset, limit))
+        expr = as_expr(condition)
+        return {
+            "table": self.name,
+            "condition": None if condition is None else "<функция>" if expr is None else expr.to_string(),
+            "partitioning": self.partitioning.describe(),
+            "partitions": len(self.partitions),
+            "scanned_partitions": numbers,
+            "access": ", ".join(sorted({plan["access"] for plan in plans.values()})) or None,
+            "rows": self.count(),
+            "scanned_rows": sum(plan["scanned_rows"] for plan in plans.values()),
+            "estimated_rows": estimated,
+            "actual_rows": actual,
+            "elapsed_ms": round(elapsed * 1000, 3),
+            "partition_plans": plans,
+        }
+
+    def statistics(self):
+        """
+        Статистика столбцов, объединенная по секциям (см. Table.statistics). Число различных значений
+        столбца секционирования — сумма по секциям, остальных столбцов — наибольшее по секциям.
+        """
+        parts = [partition.statistics() for partition in self.partitions]
+        if None in parts:
+            return None  # Есть лениво открытые секции
+        parts = [part for part in parts if part["rows"]]
+        rows = sum(part["rows"] for part in parts)
+        columns = {}
+        for col in self.schema:
+            items = [part["columns"][col] for part in parts]
+            distinct = [item["distinct"] for item in items]
+            columns[col] = {
+                "null_fraction": round(sum(item["null_fraction"] * part["rows"]
+                                           for item, part in zip(items, parts)) / rows, 4) if rows else 0.0,
+                "distinct": min(rows, sum(distinct)) if col == self.partitioning.column else max(distinct, default=0),
+                "min": _bound(min, [item["min"] for item in items]),
+                "max": _bound(max, [item["max"] for item in items]),
+                "histogram_buckets": max((item["histogram_buckets"] for item in items), default=0),
+                "exact_frequencies": all(item["exact_frequencies"] for item in items),
+            }
+        return {"rows": rows, "columns": columns}
+
+    def iter_batches(self, batch_size=BATCH_SIZE):
+        """Перебирает записи пакетами по секциям (см. Table.iter_batches)."""
+        for partition in self.partitions:
+            yield from partition.iter_batches(batch_size)
+
+    def count(self):
+        return sum(partition.count() for partition in self.partitions)
+
+    def fetch_all(self):
+        return [record for partition in self.partitions for record in partition.fetch_all()]
+
+    @timed("aggregate", condition=2)
+    def aggregate(self, aggregates, group_by=None, condition=None, parallel=False, workers=None):
+        """
+        Вычисляет агрегаты по секциям, оставшимся после отсечения (параметры — см. Table.aggregate),
+        и сливает частичные результаты. Секции обрабатываются параллельно в пуле потоков,
+        с parallel=True каждая секция считается в пуле процессов.
+        """
+        group_by = [group_by] if isinstance(group_by, str) else list(group_by or [])
+        for col in group_by:
+            if col not in self.schema:
+                raise ValueError(f"Столбец '{col}' не существует.")
+        aggregates = normalize_aggregates(aggregates, self.schema)
+        numbers = self._prune(condition)
+        expr = as_expr(condition)
+        if parallel and (condition is None or expr is not None):
+            def partial(number):
+                partition = self.partitions[number]
+                with partition.lock.read():  # См. Table.aggregate
+                    return parallel_aggregate(partition.data, self.schema, aggregates, group_by, expr, workers)
+
+            parts = [partial(number) for number in numbers]
+        else:
+            parts = self._map(lambda number: aggregate_records(self.partitions[number].iter_select(condition),
+                                                               aggregates, group_by), numbers)
+        groups = {}
+        for part in parts:
+            merge_groups(groups, part, aggregates)
+        return finalize_groups(groups, aggregates, group_by)
+
+    def ordered_by(self, columns, nulls):
+        """
+        Записи, упорядоченные по столбцам (см. Table.ordered_by). При упорядоченном индексе
+        по столбцу записи секций сливаются в порядке индексов без сортировки.
+        """
+        if len(columns) == 1 and self.index_kind(columns[0]) == "sorted":
+            return list(heapq.merge(*(partition.ordered_by(columns, nulls) for partition in self.partitions),
+                                    key=key_function(columns)))
+        return super().ordered_by(columns, nulls)
+
+    # --- Сохранение и загрузка ---
+
+    def to_dict(self):
+        """Возвращает таблицу в виде словаря для сохранения (записи всех секций подряд)."""
+        with self.lock.read():
+            return {
+                "name": self.name,
+                "schema": self.schema,
+                "storage": self.storage,
+                "primary_key": self.primary_key,
+                "partition_by": self.partitioning.describe(),
+                "data": [record for partition in self.partitions for record in partition.to_dict()["data"]],
+                "indexes": self._index_definitions(),
+            }
+
+    @staticmethod
+    def from_dict(data):
+        """Создает секционированную таблицу из словаря (см. to_dict)."""
+        table = PartitionedTable(data["name"], data["schema"], data["partition_by"],
+                                 storage=data.get("storage", "rows"), primary_key=data.get("primary_key"))
+        table.types.restore(data["data"])
+        for number, records in table._group(data["data"]).items():
+            table.partitions[number]._insert_batch(records)
+        for column, kind in data.get("indexes", {}).items():
+            table.create_index(column, kind)
+        return table
+
+    def _save_segments(self, directory_path, progress=None):
+        """
+        Записывает секции в каталог сегментов: секция — файл "<таблица>.p<номер>.seg".
+        Секции, не изменившиеся с прошлого сохранения в этот каталог, не перезаписываются.
+        :return: Описание таблицы для каталога: {"partition_by": ..., "files": [...]}.
+        """
+        directory = os.path.abspath(directory_path)
+        files = [f"{self.name}.p{number}.seg" for number in range(len(self.partitions))]
+        pending = []
+        # Снимки секций берутся под блокировкой таблицы: номер записи журнала в заголовке
+        # каждого сегмента соответствует содержимому секции
+        with self.lock.read():
+            # Секции уплотняются до снимка от имени таблицы, чтобы уплотнение попало в журнал
+            self._compact_partitions(range(len(self.partitions)))
+            for number, partition in enumerate(self.partitions):
+                path = os.path.join(directory_path, files[number])
+                if self.saved[number] == (directory, partition.version) and os.path.exists(path):
+                    continue
+                header, snapshot = partition._snapshot_segment(path + ".tmp", progress=progress)
+                pending.append((number, partition.version, path, header, snapshot))
+        for number, version, path, header, snapshot in pending:
+            if snapshot is not None:
+                self.partitions[number]._write_segment(path + ".tmp", header, snapshot, BATCH_SIZE, progress)
+            os.replace(path + ".tmp", path)
+            self.saved[number] = (directory, version)
+        return {"partition_by": self.partitioning.describe(), "files": files}
+
+    @staticmethod
+    def from_segments(directory_path, entry, lazy=False):
+        """
+        Создает таблицу из сегментов секций.
+        :param entry: Описание таблицы из каталога (см. _save_segments).
+        :param lazy: Открыть секции лениво (см. Table.from_segment).
+        """
+        partitions = [Table.from_segment(os.path.join(directory_path, file_name), lazy=lazy)
+                      for file_name in entry["files"]]
+        first = partitions[0]
+        table = PartitionedTable(first.name, first.schema, entry["partition_by"], storage=first.storage,
+                                 primary_key=first.primary_key)
+        if len(partitions) != len(table.partitions):
+            raise ValueError(f"Число файлов секций таблицы '{table.name}' не совпадает с секционированием.")
+        table.partitions = partitions
+        table.lsn = max(partition.lsn for partition in partitions)
+        directory = os.path.abspath(directory_path)
+        table.saved = [(directory, partition.version) for partition in partitions]
+        return table
+
+    def _replay(self, lsn, op, args):
+        """
+        Повторно применяет запись журнала к секциям, в сегментах которых ее еще нет:
+        секции сохраняются независимо, поэтому номер последней примененной записи у каждой свой.
+        """
+        self.lsn = max(self.lsn, lsn)
+        if op in ("insert", "insert_many"):
+            groups = self._group(self.types.validate_batch([args[0]] if op == "insert" else args[0]))
+        elif op in ("update", "delete"):
+            groups = self._split_row_ids(args[0])
+        elif op == "compact":
+            groups = dict.fromkeys(args[0])
+        elif op in ("create_index", "drop_index"):
+            groups = dict.fromkeys(range(len(self.partitions)))
         else:
-            raise ValueError("Неподдерживаемый формат отчета")
+            raise ValueError(f"Неизвестная операция в журнале: '{op}'.")
+        for number, items in groups.items():
+            partition = self.partitions[number]
+            if lsn <= partition.lsn:
+                continue  # Изменение уже есть в сегменте секции
+            if op in ("insert", "insert_many"):
+                partition._insert_batch(items)
+            elif op == "update":
+                partition._update_positions(items, self.types.validate_updates(args[1]))
+            elif op == "delete":
+                partition._delete_positions(items)
+            elif op == "compact":
+                partition._compact()
+            else:
+                getattr(partition, op)(*args)
+            partition.lsn = lsn
+
+
+def _bound(function, values):
+    """Минимум или максимум значений без None; None, если значений нет или они несравнимы."""
+    try:
+        return function(value for value in values if value is not None)
+    except (TypeError, ValueError):
+        return None
+
+
+def _new_table(name, schema, storage="rows", primary_key=None, partition_by=None):
+    """Создает таблицу: секционированную (PartitionedTable), если задано partition_by, иначе Table."""
+    if partition_by is not None:
+        return PartitionedTable(name, schema, partition_by, storage=storage, primary_key=primary_key)
+    return Table(name, schema, storage=storage, primary_key=primary_key)
@@ -0,0 +1,283 @@
+"""
+Агрегация записей: COUNT/SUM/AVG/MIN/MAX с группировкой (хеш-агрегация).
+
+Параллельный режим делит таблицу на диапазоны строк и обрабатывает их в пуле процессов.
+Нужные столбцы один раз копируются в общую память (multiprocessing.shared_memory):
+int/float — типизированными массивами, str — кодами словаря. Процессы читают
+их напрямую, без передачи строк через pickle, и возвращают только частичные агрегаты.
+"""
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from columnar import ColumnarData, DictionaryColumn, NumericColumn
+
+
+def _count_step(state, value):
+    return state if value is None else state + 1
+
+
+def _sum_step(state, value):
+    return state if value is None else state + value
+
+
+def _avg_step(state, value):
+    return state if value is None else (state[0] + value, state[1] + 1)
+
+
+def _min_step(state, value):
+    return state if value is None or (state is not None and state <= value) else value
+
+
+def _max_step(state, value):
+    return state if value is None or (state is not None and state >= value) else value
+
+
+def _min_merge(a, b):
+    return b if a is None else a if b is None else min(a, b)
+
+
+def _max_merge(a, b):
+    return b if a is None else a if b is None else max(a, b)
+
+
+# Функция агрегации: (начальное состояние, шаг, слияние частичных состояний, итог)
+AGGREGATES = {
+    "count": (lambda: 0, _count_step, lambda a, b: a + b, lambda s: s),
+    "sum": (lambda: 0, _sum_step, lambda a, b: a + b, lambda s: s),
+    "avg": (lambda: (0, 0), _avg_step, lambda a, b: (a[0] + b[0], a[1] + b[1]),
+            lambda s: s[0] / s[1] if s[1] else None),
+    "min": (lambda: None, _min_step, _min_merge, lambda s: s),
+    "max": (lambda: None, _max_step, _max_merge, lambda s: s),
+}
+
+
+def normalize_aggregates(aggregates, schema):
+    """
+    Проверяет описание агрегатов.
+    :param aggregates: {"имя результата": ("функция", "столбец")}; для count столбец может быть "*".
+    :return: Список (имя, функция, столбец или None для "*").
+    """
+    result = []
+    for name, (function, column) in aggregates.items():
+        function = function.lower()
+        if function not in AGGREGATES:
+            raise ValueError(f"Неизвестная агрегатная функция '{function}'.")
+        if column == "*":
+            if function != "count":
+                raise ValueError(f"Функция '{function}' требует столбец.")
+            column = None
+        elif column not in schema:
+            raise ValueError(f"Столбец '{column}' не существует.")
+        result.append((name, function, column))
+    return result
+
+
+def aggregate_records(records, aggregates, group_by, check=None):
+    """
+    Хеш-агрегация: частичные состояния по группам.
+    :return: {ключ группы (кортеж): [состояния агрегатов]} в порядке появления групп.
+    """
+    steps = [(AGGREGATES[function][1], column) for _, function, column in aggregates]
+    initial = [AGGREGATES[function][0] for _, function, _ in aggregates]
+    groups = {}
+    for record in records:
+        if check is not None and not check(record):
+            continue
+        key = tuple(record[col] for col in group_by)
+        states = groups.get(key)
+        if states is None:
+            states = groups[key] = [init() for init in initial]
+        for i, (step, column) in enumerate(steps):
+            states[i] = step(states[i], 1 if column is None else record[column])
+    return groups
+
+
+def merge_groups(target, partial, aggregates):
+    """Сливает частичные состояния partial в target."""
+    merges = [AGGREGATES[function][2] for _, function, _ in aggregates]
+    for key, states in partial.items():
+        current = target.get(key)
+        if current is None:
+            target[key] = states
+        else:
+            target[key] = [merge(a, b) for merge, a, b in zip(merges, current, states)]
+    return target
+
+
+def finalize_groups(groups, aggregates, group_by):
+    """
+    Превращает состояния в результат.
+    :return: Словарь агрегатов без группировки или список словарей по группам.
+    """
+    finals = [AGGREGATES[function][3] for _, function, _ in aggregates]
+    names = [name for name, _, _ in aggregates]
+    if not group_by:
+        states = groups.get(()) or [AGGREGATES[function][0]() for _, function, _ in aggregates]
+        return {name: final(state) for name, final, state in zip(names, finals, states)}
+    result = []
+    for key, states in groups.items():
+        row = dict(zip(group_by, key))
+        row.update({name: final(state) for name, final, state in zip(names, finals, states)})
+        result.append(row)
+    return result
+
+
+# --- Параллельная агрегация ---
+
+_TYPECODES = {"int": "q", "float": "d"}
+
+
+def _shared_array(values):
+    """Копирует массив array в новый блок общей памяти."""
+    data = values.tobytes()
+    shm = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+    shm.buf[:len(data)] = data
+    return shm
+
+
+def export_columns(data, schema, columns):
+    """
+    Готовит столбцы таблицы для передачи процессам.
+    :return: (описание столбцов для процессов, список блоков общей памяти для освобождения).
+    """
+    spec = {}
+    blocks = []
+    for col in columns:
+        if isinstance(data, ColumnarData):
+            column = data.columns[col]
+            if isinstance(column, NumericColumn):
+                shm = _shared_array(column.values)
+                spec[col] = ("array", shm.name, column.values.typecode, len(column.values), None)
+                blocks.append(shm)
+            elif isinstance(column, DictionaryColumn):
+                shm = _shared_array(column.codes)
+                spec[col] = ("array", shm.name, column.codes.typecode, len(column.codes), column.dictionary)
+                blocks.append(shm)
+            else:
+                spec[col] = ("list", list(column.values))
+            continue
+
+        values = [record[col] for record in data]
+        typecode = _TYPECODES.get(schema[col])
+        python_type = {"q": int, "d": float}.get(typecode)
+        if typecode and all(type(value) is python_type for value in values):
+            shm = _shared_array(array(typecode, values))
+            spec[col] = ("array", shm.name, typecode, len(values), None)
+            blocks.append(shm)
+        elif schema[col] == "str" and all(type(value) is str for value in values):
+            # Словарное кодирование: в общую память идут только коды
+            lookup = {}
+            codes = array("i", [lookup.setdefault(value, len(lookup)) for value in values])
+            shm = _shared_array(codes)
+            spec[col] = ("array", shm.name, "i", len(values), list(lookup))
+            blocks.append(shm)
+        else:
+            spec[col] = ("list", values)
+    return spec, blocks
+
+
+_worker_columns = {}  # Столбцы, подключенные в процессе-исполнителе: {"col_name": (значения, словарь)}
+_worker_blocks = []
+_worker_deleted = set()  # Позиции удаленных записей, которые процесс пропускает
+
+
+def _init_worker(spec, deleted):
+    _worker_columns.clear()
+    _worker_deleted.clear()
+    _worker_deleted.update(deleted)
+    for col, description in spec.items():
+        if description[0] == "list":
+            _worker_columns[col] = (description[1], None)
+            continue
+        _, name, typecode, length, dictionary = description
+        shm = shared_memory.SharedMemory(name=name)
+        _worker_blocks.append(shm)
+        itemsize = array(typecode).itemsize
+        _worker_columns[col] = (shm.buf[:length * itemsize].cast(typecode), dictionary)
+
+
+def _aggregate_range(start, end, condition, aggregates, group_by):
+    """Агрегирует строки [start, end) в процессе-исполнителе."""
+    check = condition.compile() if condition is not None else None
+    columns = list(_worker_columns)
+    sources = [_worker_columns[col] for col in columns]
+
+    def records():
+        for position in range(start, end):
+            if position in _worker_deleted:
+                continue
+            record = {}
+            for col, (values, dictionary) in zip(columns, sources):
+                value = values[position]
+                record[col] = value if dictionary is None else dictionary[value]
+            yield record
+
+    return aggregate_records(records(), aggregates, group_by, check)
+
+
+def parallel_aggregate(data, schema, aggregates, group_by, condition, workers=None):
+    """
+    Агрегирует записи в пуле процессов.
+    Удаленные записи (None в списке, ColumnarData.deleted) пропускаются, поэтому таблицу
+    не нужно уплотнять: вызывающий держит только блокировку чтения.
+    :param data: Записи таблицы (список словарей, ColumnarData или SegmentData).
+    :param condition: query.Expr или None.
+    :param workers: Число процессов (по умолчанию — число ядер).
+    """
+    workers = workers or os.cpu_count() or 1
+    columns = set(group_by)
+    columns.update(column for _, _, column in aggregates if column is not None)
+    if condition is not None:
+        columns.update(condition.columns())
+    deleted = ()
+    if isinstance(data, ColumnarData):
+        deleted = data.deleted
+    elif isinstance(data, list):
+        data = [record for record in data if record is not None]
+    spec, blocks = export_columns(data, schema, sorted(columns))
+    try:
+        length = len(data)
+        chunks = max(1, workers * 4)  # Несколько диапазонов на процесс выравнивают нагрузку
+        step = max(1, -(-length // chunks))
+        ranges = [(start, min(start + step, length)) for start in range(0, length, step)]
+        groups = {}
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(spec, deleted)) as pool:
+            futures = [pool.submit(_aggregate_range, start, end, condition, aggregates, group_by)
+                       for start, end in ranges]
+            # Слияние в порядке диапазонов сохраняет порядок появления групп
+            for future in futures:
+                merge_groups(groups, future.result(), aggregates)
+        return groups
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+
+class GroupBy:
+    """
+    Группировка записей таблицы (см. Table.group_by); агрегаты считаются хеш-агрегацией
+    за один проход по записям: в памяти — только состояния групп.
+    """
+
+    def __init__(self, table, keys, condition=None):
+        self.table = table
+        self.keys = keys
+        self.condition = condition
+
+    def agg(self, aggregates=None, parallel=False, workers=None, **named):
+        """
+        Вычисляет агрегаты по группам.
+        :param aggregates: {"имя результата": ("функция", "столбец")}; те же описания можно
+                           передать именованными аргументами: agg(total=("sum", "price")).
+        :param parallel: Считать в пуле процессов (см. Table.aggregate).
+        :param workers: Число процессов.
+        :return: Список словарей: значения столбцов группировки и агрегатов, группы в порядке появления.
+        """
+        aggregates = {**(aggregates or {}), **named}
+        if not aggregates:
+            raise ValueError("Не заданы агрегатные функции.")
+        return self.table.aggregate(aggregates, group_by=self.keys, condition=self.condition,
+                                    parallel=parallel, workers=workers)
@@ -0,0 +1,724 @@
+"""
+Замеры производительности SimpleDB.
+
+Запуск:
+    python benchmark.py                      — сравнительные замеры (вставка, индексы, соединения и т.д.);
+    python benchmark.py suite --size 1m      — воспроизводимый набор замеров всех основных операций
+                                               с записью результатов в JSON;
+    python benchmark.py compare old.json new.json — сравнение двух прогонов набора, поиск регрессий.
+
+Набор (suite) строит синтетическую таблицу из 10k, 1m или 10m записей (генератор с фиксированным
+seed) и для каждой операции записывает пропускную способность, задержки p50/p99 и пиковый RSS.
+Каждый замер выполняется в отдельном процессе, поэтому пиковый RSS относится к одному замеру.
+"""
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # resource есть только в Unix: без него пиковый RSS не измеряется
+    resource = None
+
+from client import connect
+from server import DatabaseServer
+from SimpleDB import Database, Table
+
+SCHEMA = {"id": "int", "name": "str", "price": "float", "city": "str"}
+CITIES = ["Москва", "Тула", "Омск", "Казань"]
+
+
+def make_records(count):
+    """Генерирует синтетические записи для таблицы со схемой SCHEMA."""
+    return [
+        {"id": i, "name": f"item{i}", "price": (i % 1000) * 1.5, "city": CITIES[i % len(CITIES)]}
+        for i in range(count)
+    ]
+
+
+def measure(action):
+    """Возвращает время выполнения функции в секундах."""
+    start = time.perf_counter()
+    action()
+    return time.perf_counter() - start
+
+
+def bench_insert(count=200000):
+    """Сравнивает построчный insert и пакетный insert_many."""
+    records = make_records(count)
+    print(f"Вставка {count} записей:")
+    for storage in ("rows", "columnar"):
+        table = Table("bench", SCHEMA, storage=storage)
+        per_row = measure(lambda: [table.insert(record) for record in records])
+        table = Table("bench", SCHEMA, storage=storage)
+        batch = measure(lambda: table.insert_many(records))
+        print(f"  {storage:8}  insert: {count / per_row:12,.0f} строк/с"
+              f"   insert_many: {count / batch:12,.0f} строк/с   ускорение: {per_row / batch:.1f}x")
+    # Пакеты с упорядоченным индексом сливаются с ним, а не вставляются в него поштучно
+    for chunk in (count, 10000):
+        table = Table("bench", SCHEMA)
+        table.create_index("price", "sorted")
+        elapsed = measure(lambda: [table.insert_many(records[start:start + chunk])
+                                   for start in range(0, count, chunk)])
+        print(f"  sorted(price), пакеты по {chunk}: insert_many {count / elapsed:12,.0f} строк/с")
+
+
+def bench_concurrency(thread_counts=(1, 2, 4, 8), operations=20000, storage="rows"):
+    """
+    Нагрузочный тест параллельного доступа: потоки смешивают точечные выборки,
+    полные просмотры, вставки, обновления и удаления. Обновление меняет столбцы
+    a и b одновременно, поэтому запись с a != b означает, что читатель увидел
+    частично примененное изменение.
+    """
+    print(f"Параллельный доступ ({storage}), {operations} операций:")
+    for threads in thread_counts:
+        table = Table("stress", {"id": "int", "a": "int", "b": "int"}, storage=storage)
+        table.insert_many([{"id": i, "a": 0, "b": 0} for i in range(10000)])
+        table.create_index("id")
+        errors = []
+        inserted = []
+
+        def worker(seed):
+            rnd = random.Random(seed)
+            try:
+                for n in range(operations // threads):
+                    op = rnd.random()
+                    if op < 0.15:
+                        key = 1000000 * (seed + 1) + n
+                        table.insert({"id": key, "a": key, "b": key})
+                        inserted.append(key)
+                    elif op < 0.35:
+                        value = rnd.randrange(1000000)
+                        table.update(("id", "==", rnd.randrange(10000)), {"a": value, "b": value})
+                    elif op < 0.40 and inserted:
+                        table.delete(("id", "==", inserted.pop()))
+                    elif op < 0.98:
+                        for record in table.select(("id", "==", rnd.randrange(10000))):
+                            if record["a"] != record["b"]:
+                                errors.append(f"Несогласованная запись: {dict(record)}")
+                    else:
+                        torn = table.select(lambda r: r["a"] != r["b"])
+                        if torn:
+                            errors.append(f"Полный просмотр увидел {len(torn)} несогласованных записей")
+            except Exception as error:
+                errors.append(repr(error))
+
+        workers = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        if len(table.fetch_all()) != 10000 + len(inserted):
+            errors.append("Число записей не совпадает с числом вставок и удалений")
+        status = "OK" if not errors else f"ОШИБКИ: {errors[:3]}"
+        print(f"  потоков: {threads:2}   {operations / elapsed:10,.0f} операций/с   {status}")
+
+
+def bench_aggregate(count=2000000, storage="columnar"):
+    """Сравнивает последовательную и параллельную агрегацию с группировкой."""
+    table = Table("bench", SCHEMA, storage=storage)
+    table.insert_many(make_records(count))
+    aggregates = {"n": ("count", "*"), "total": ("sum", "price"), "avg": ("avg", "price"), "top": ("max", "id")}
+    condition = "price > 100"
+    print(f"Агрегация {count} строк ({storage}), группировка по city:")
+    serial = measure(lambda: table.aggregate(aggregates, group_by="city", condition=condition))
+    print(f"  последовательно:   {serial:6.2f} с")
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        elapsed = measure(lambda: table.aggregate(aggregates, group_by="city", condition=condition,
+                                                  parallel=True, workers=workers))
+        print(f"  процессов: {workers:2}      {elapsed:6.2f} с   ускорение: {serial / elapsed:.1f}x")
+        workers *= 2
+
+
+def bench_top_k(count=1000000, limit=10):
+    """Сравнивает полную сортировку с выборкой первых limit записей (куча и упорядоченный индекс)."""
+    table = Table("bench", SCHEMA)
+    table.insert_many(make_records(count))
+    print(f"Первые {limit} из {count} записей по price (по убыванию):")
+    full = measure(lambda: table.select(order_by="price", ascending=False)[:limit])
+    print(f"  полная сортировка:   {full:7.3f} с")
+    heap = measure(lambda: table.select(order_by="price", ascending=False, limit=limit))
+    print(f"  куча (top-K):        {heap:7.3f} с")
+    table.create_index("price", "sorted")
+    indexed = measure(lambda: table.select(order_by="price", ascending=False, limit=limit))
+    print(f"  упорядоченный индекс: {indexed:7.4f} с")
+
+
+def bench_import(count=500000):
+    """Измеряет скорость и пиковую память потокового импорта из TXT и XML."""
+    records = make_records(count)
+    print(f"Импорт {count} записей:")
+    with tempfile.TemporaryDirectory() as directory:
+        source = Database("bench")
+        source.create_table("bench", SCHEMA)
+        source.bulk_load("bench", records)
+        source.save_database_to_txt(directory)
+        xml_path = os.path.join(directory, "bench.xml")
+        source.save_database_to_xml(xml_path)
+        del source
+
+        loaders = [("txt", lambda db: db.load_database_from_txt(directory)),
+                   ("xml", lambda db: db.load_database_from_xml(xml_path))]
+        for name, load in loaders:
+            db = Database("bench")
+            tracemalloc.start()
+            elapsed = measure(lambda: load(db))
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"  {name:4} {count / elapsed:10,.0f} строк/с   пик памяти: {peak / 2 ** 20:6.1f} МБ")
+
+
+def bench_mixed(count=200000, operations=200):
+    """
+    Смешанная нагрузка: вставка и удаление по первичному ключу в таблице из count записей.
+    Для сравнения удаление с немедленным уплотнением (перестройкой списка записей).
+    """
+    print(f"Вставка и удаление ({operations} пар операций, {count} записей):")
+    for label, compact_each in (("с уплотнением", True), ("отметки удаления", False)):
+        table = Table("bench", SCHEMA, primary_key="id")
+        table.insert_many(make_records(count))
+        rng = random.Random(1)
+        next_id = count
+
+        def workload():
+            nonlocal next_id
+            for _ in range(operations):
+                table.insert({"id": next_id, "name": "new", "price": 1.0, "city": CITIES[0]})
+                next_id += 1
+                table.delete_by_pk(rng.randrange(next_id))
+                if compact_each:
+                    table.compact()
+
+        elapsed = measure(workload)
+        print(f"  {label:17} {2 * operations / elapsed:10,.0f} операций/с")
+
+
+def bench_join(count=1000000):
+    """
+    Соединение таблицы из count записей с таблицей заказов (count // 2 записей):
+    хеш-соединение, слияние с сортировкой и слияние по упорядоченным индексам;
+    затем группировка по городу.
+    """
+    db = Database("bench")
+    db.create_table("items", SCHEMA)
+    db.create_table("orders", {"order_id": "int", "id": "int", "qty": "int"})
+    db.bulk_load("items", make_records(count))
+    rng = random.Random(1)
+    db.bulk_load("orders", [{"order_id": i, "id": rng.randrange(count), "qty": i % 10} for i in range(count // 2)])
+    print(f"Соединение {count} x {count // 2} записей:")
+    for strategy in ("hash", "merge"):
+        elapsed = measure(lambda: sum(1 for _ in db.join("orders", "items", "id", strategy=strategy)))
+        print(f"  {strategy:17} {elapsed:8.2f} с")
+    db.get_table("items").create_index("id", "sorted")
+    db.get_table("orders").create_index("id", "sorted")
+    elapsed = measure(lambda: sum(1 for _ in db.join("orders", "items", "id", strategy="merge")))
+    print(f"  {'merge по индексам':17} {elapsed:8.2f} с")
+    elapsed = measure(lambda: db.get_table("items").group_by("city").agg(n=("count", "*"), total=("sum", "price")))
+    print(f"  {'group_by(city)':17} {elapsed:8.2f} с")
+
+
+def bench_planner(count=1000000):
+    """
+    Планы запросов к таблице из count записей с индексами по price (упорядоченный) и city:
+    выбранный способ доступа, оценка и фактическое число записей, время.
+    """
+    table = Table("bench", SCHEMA)
+    table.insert_many(make_records(count))
+    table.create_index("price", "sorted")
+    table.create_index("city")
+    queries = [
+        {"condition": "price > 1400"},
+        {"condition": "price > 10"},
+        {"condition": "city == 'Тула' and price < 3"},
+        {"condition": "name like 'item12345%'"},
+        {"condition": "city == 'Омск'", "order_by": "price", "limit": 10},
+        {"condition": "price between 10 and 20 or city == 'Тула'"},
+    ]
+    print(f"Планы запросов ({count} записей):")
+    for query in queries:
+        plan = table.explain(**query)
+        print(f"  {str(query):70} {plan['access']:12} оценка {plan['estimated_rows']:>8}"
+              f"   факт {plan['actual_rows']:>8}   {plan['elapsed_ms']:9.1f} мс")
+
+
+def bench_server(count=200000, lookups=2000):
+    """
+    Загрузка базы из count записей в каждом процессе (load_from_file) против подключения
+    к серверу, который держит ее в памяти; задержка точечного запроса через сервер.
+    """
+    db = Database("bench")
+    db.create_table("items", SCHEMA, primary_key="id")
+    db.bulk_load("items", make_records(count))
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(DatabaseServer(db, port=0).start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.json")
+        db.save_to_file(path)
+        elapsed = measure(lambda: Database.load_from_file(path).get_table("items").get(count // 2))
+    print(f"Доступ к базе из {count} записей:")
+    print(f"  {'load_from_file + запрос':28} {elapsed * 1000:10.1f} мс")
+
+    def attach():
+        with connect(server.address, pool_size=1) as remote:
+            remote.get_table("items").get(count // 2)
+
+    print(f"  {'подключение к серверу + запрос':28} {measure(attach) * 1000:10.1f} мс")
+    with connect(server.address) as remote:
+        table = remote.get_table("items")
+        rng = random.Random(1)
+        elapsed = measure(lambda: [table.get(rng.randrange(count)) for _ in range(lookups)])
+        print(f"  {'get по ключу через сервер':28} {elapsed / lookups * 1e6:10.1f} мкс")
+        elapsed = measure(lambda: table.select("price < 150"))
+        print(f"  {'select (10% записей)':28} {elapsed * 1000:10.1f} мс")
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.run_until_complete(server.close())
+    loop.close()
+
+
+def bench_partitions(count=1000000, partitions=8):
+    """
+    Таблица из count записей, секционированная по диапазонам price, против несекционированной:
+    выборка по диапазону (отсечение секций), полный просмотр и повторное сохранение базы
+    после вставки одной записи (перезаписывается только измененная секция).
+    """
+    bounds = [1500 / partitions * number for number in range(1, partitions)]
+    records = make_records(count)
+    databases = {}
+    for name, partition_by in (("plain", None), ("parts", ("range", "price", bounds))):
+        db = databases[name] = Database(name)
+        db.create_table("items", SCHEMA, partition_by=partition_by)
+        db.bulk_load("items", records)
+    print(f"Секционирование ({count} записей, {partitions} секций по price):")
+    for condition in ("price < 150", "city == 'Тула'"):
+        for name, db in databases.items():
+            table = db.get_table("items")
+            elapsed = measure(lambda: table.select(condition))
+            print(f"  {name:6} select {condition:18} {elapsed * 1000:10.1f} мс")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, db in databases.items():
+            path = os.path.join(directory, name)
+            db.save_to_file(path)
+            db.get_table("items").insert({"id": count, "name": "new", "price": 1.0, "city": CITIES[0]})
+            elapsed = measure(lambda: db.save_to_file(path))
+            print(f"  {name:6} сохранение после вставки {elapsed * 1000:10.1f} мс")
+
+
+# Размеры таблицы для набора замеров
+SIZES = {"10k": 10000, "1m": 1000000, "10m": 10000000}
+SEED = 42
+LOAD_CHUNK = 100000  # Записи загружаются в таблицу пакетами, без списка всех записей в памяти
+POINT_OPERATIONS = 1000  # Число точечных операций (вставка, выборка и изменение по ключу)
+SCAN_OPERATIONS = 20  # Число запросов с полным просмотром таблицы
+FILE_REPEATS = 3  # Число повторов сохранения, загрузки, выгрузки и отчета
+REGRESSION_THRESHOLD = 0.1  # Допустимое ухудшение пропускной способности и p99 при сравнении
+
+
+def generate_records(count, seed=SEED):
+    """
+    Генерирует count синтетических записей со схемой SCHEMA.
+    При одинаковом seed последовательность записей всегда одна и та же.
+    """
+    rng = random.Random(seed)
+    for i in range(count):
+        yield {"id": i, "name": f"item{rng.randrange(count)}", "price": round(rng.uniform(0, 1000), 2),
+               "city": rng.choice(CITIES)}
+
+
+def build_database(count, seed=SEED, index=True):
+    """
+    Создает базу с таблицей "bench" из count записей.
+    :param index: Создать хеш-индекс по id (для точечных выборок и изменений).
+    """
+    db = Database("bench")
+    db.create_table("bench", SCHEMA)
+    records = generate_records(count, seed)
+    while True:
+        chunk = list(itertools.islice(records, LOAD_CHUNK))
+        if not chunk:
+            break
+        db.bulk_load("bench", chunk)
+    if index:
+        db.get_table("bench").create_index("id")
+    return db
+
+
+class Recorder:
+    """Задержки отдельных операций одного замера и число обработанных элементов."""
+
+    def __init__(self):
+        self.latencies = []
+        self.items = 0
+
+    def run(self, action, items=1):
+        """
+        Выполняет и замеряет одну операцию.
+        :param items: Сколько элементов (записей или операций) она обработала.
+        """
+        start = time.perf_counter()
+        result = action()
+        self.latencies.append(time.perf_counter() - start)
+        self.items += items
+        return result
+
+
+def percentile(values, fraction):
+    """Перцентиль по рангу для отсортированного списка values."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def peak_rss_mb():
+    """Пиковый RSS текущего процесса в МБ (None, если модуль resource недоступен)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # В Linux ru_maxrss в килобайтах, в macOS — в байтах
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def case_insert_many(rows, seed, recorder, directory):
+    db = Database("bench")
+    db.create_table("bench", SCHEMA)
+    records = generate_records(rows, seed)
+    while True:
+        chunk = list(itertools.islice(records, LOAD_CHUNK))
+        if not chunk:
+            break
+        recorder.run(lambda: db.bulk_load("bench", chunk), len(chunk))
+
+
+def case_insert(rows, seed, recorder, directory):
+    table = build_database(rows, seed).get_table("bench")
+    for i in range(rows, rows + POINT_OPERATIONS):
+        record = {"id": i, "name": f"item{i}", "price": 1.0, "city": CITIES[0]}
+        recorder.run(lambda: table.insert(record))
+
+
+def case_select_point(rows, seed, recorder, directory):
+    table = build_database(rows, seed).get_table("bench")
+    rng = random.Random(seed)
+    for _ in range(POINT_OPERATIONS):
+        key = rng.randrange(rows)
+        recorder.run(lambda: table.select(("id", "==", key)))
+
+
+def case_select_scan(rows, seed, recorder, directory):
+    table = build_database(rows, seed).get_table("bench")
+    rng = random.Random(seed)
+    for _ in range(SCAN_OPERATIONS):
+        # Разные границы, чтобы запросы не попадали в кэш результатов; около 1% записей
+        low = round(rng.uniform(0, 990), 2)
+        recorder.run(lambda: table.select(f"price between {low} and {low + 10}"), rows)
+
+
+def case_select_order_by(rows, seed, recorder, directory):
+    table = build_database(rows, seed).get_table("bench")
+    rng = random.Random(seed)
+    for _ in range(SCAN_OPERATIONS):
+        # Около 10% записей, упорядоченных по неиндексированному столбцу
+        low = round(rng.uniform(0, 900), 2)
+        recorder.run(lambda: table.select(f"price between {low} and {low + 100}", order_by="name"), rows)
+
+
+def case_select_top_k(rows, seed, recorder, directory):
+    table = build_database(rows, seed).get_table("bench")
+    rng = random.Random(seed)
+    for _ in range(SCAN_OPERATIONS):
+        city = rng.choice(CITIES)
+        ascending = rng.random() < 0.5
+        recorder.run(lambda: table.select(("city", "==", city), order_by="price", ascending=ascending,
+                                          limit=10, offset=rng.randrange(100)), rows)
+
+
+def case_update(rows, seed, recorder, directory):
+    table = build_database(rows, seed).get_table("bench")
+    rng = random.Random(seed)
+    for _ in range(POINT_OPERATIONS):
+        key, price = rng.randrange(rows), round(rng.uniform(0, 1000), 2)
+        recorder.run(lambda: table.update(("id", "==", key), {"price": price}))
+
+
+def case_delete(rows, seed, recorder, directory):
+    table = build_database(rows, seed).get_table("bench")
+    keys = random.Random(seed).sample(range(rows), min(rows, POINT_OPERATIONS))
+    for key in keys:
+        recorder.run(lambda: table.delete(("id", "==", key)))
+
+
+def case_save_segments(rows, seed, recorder, directory):
+    db = build_database(rows, seed)
+    path = os.path.join(directory, "db")
+    for _ in range(FILE_REPEATS):
+        recorder.run(lambda: db.save_to_file(path, format="segments"), rows)
+
+
+def case_load_segments(rows, seed, recorder, directory):
+    path = os.path.join(directory, "db")
+    build_database(rows, seed).save_to_file(path, format="segments")
+    for _ in range(FILE_REPEATS):
+        recorder.run(lambda: Database.load_from_file(path), rows)
+
+
+def case_save_json(rows, seed, recorder, directory):
+    db = build_database(rows, seed)
+    path = os.path.join(directory, "db.json")
+    for _ in range(FILE_REPEATS):
+        recorder.run(lambda: db.save_to_file(path, format="json"), rows)
+
+
+def case_load_json(rows, seed, recorder, directory):
+    path = os.path.join(directory, "db.json")
+    build_database(rows, seed).save_to_file(path, format="json")
+    for _ in range(FILE_REPEATS):
+        recorder.run(lambda: Database.load_from_file(path), rows)
+
+
+def export_case(method, target):
+    """Замер выгрузки базы методом save_database_to_* в файл или каталог target."""
+    def case(rows, seed, recorder, directory):
+        db = build_database(rows, seed, index=False)
+        path = os.path.join(directory, target)
+        for _ in range(FILE_REPEATS):
+            recorder.run(lambda: getattr(db, method)(path), rows)
+    return case
+
+
+def import_case(save_method, load_method, target):
+    """Замер загрузки базы методом load_database_from_* из файла, выгруженного save_method."""
+    def case(rows, seed, recorder, directory):
+        path = os.path.join(directory, target)
+        getattr(build_database(rows, seed, index=False), save_method)(path)
+        for _ in range(FILE_REPEATS):
+            recorder.run(lambda: getattr(Database("bench"), load_method)(path), rows)
+    return case
+
+
+def report_case(format, **options):
+    """Замер Table.generate_report в формате format (options — условие, сортировка и т.д.)."""
+    def case(rows, seed, recorder, directory):
+        table = build_database(rows, seed, index=False).get_table("bench")
+        path = os.path.join(directory, f"report.{format}")
+        for _ in range(FILE_REPEATS):
+            recorder.run(lambda: table.generate_report(path, format=format, **options), rows)
+    return case
+
+
+# Замеры набора: {название: (функция, единица пропускной способности)}.
+# "rows/s" — обработанных записей в секунду, "ops/s" — операций в секунду.
+CASES = {
+    "insert_many": (case_insert_many, "rows/s"),
+    "insert": (case_insert, "ops/s"),
+    "select_point": (case_select_point, "ops/s"),
+    "select_scan": (case_select_scan, "rows/s"),
+    "select_order_by": (case_select_order_by, "rows/s"),
+    "select_top_k": (case_select_top_k, "rows/s"),
+    "update": (case_update, "ops/s"),
+    "delete": (case_delete, "ops/s"),
+    "save_segments": (case_save_segments, "rows/s"),
+    "load_segments": (case_load_segments, "rows/s"),
+    "save_json": (case_save_json, "rows/s"),
+    "load_json": (case_load_json, "rows/s"),
+    "export_csv": (export_case("save_database_to_csv", "csv"), "rows/s"),
+    "export_txt": (export_case("save_database_to_txt", "txt"), "rows/s"),
+    "export_xml": (export_case("save_database_to_xml", "db.xml"), "rows/s"),
+    "export_excel": (export_case("save_database_to_excel", "db.xlsx"), "rows/s"),
+    "import_csv": (import_case("save_database_to_csv", "load_database_from_csv", "csv"), "rows/s"),
+    "import_txt": (import_case("save_database_to_txt", "load_database_from_txt", "txt"), "rows/s"),
+    "import_xml": (import_case("save_database_to_xml", "load_database_from_xml", "db.xml"), "rows/s"),
+    "import_excel": (import_case("save_database_to_excel", "load_database_from_excel", "db.xlsx"), "rows/s"),
+    "report_csv": (report_case("csv"), "rows/s"),
+    "report_txt": (report_case("txt"), "rows/s"),
+    "report_jsonl": (report_case("jsonl"), "rows/s"),
+    "report_filtered": (report_case("csv", condition="city == 'Тула'", order_by="price"), "rows/s"),
+}
+
+
+def run_case(name, rows, seed=SEED):
+    """
+    Выполняет один замер набора (в текущем процессе).
+    :return: Словарь с результатом: пропускная способность, p50/p99 в мс, пиковый RSS в МБ.
+             Если замер невозможен (например, не установлен openpyxl), в нем есть ключ "error".
+    """
+    function, unit = CASES[name]
+    recorder = Recorder()
+    result = {"name": name, "rows": rows, "unit": unit}
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            function(rows, seed, recorder, directory)
+        except ImportError as error:
+            result["error"] = str(error)
+            return result
+    latencies = sorted(recorder.latencies)
+    total = sum(latencies)
+    result.update({
+        "operations": len(latencies),
+        "seconds": round(total, 6),
+        "throughput": round(recorder.items / total, 1) if total else None,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 4),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 4),
+        "peak_rss_mb": None if peak_rss_mb() is None else round(peak_rss_mb(), 1),
+    })
+    return result
+
+
+def git_commit():
+    """Текущий коммит репозитория (None вне git)."""
+    try:
+        output = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+    except OSError:
+        return None
+    return output.stdout.strip() or None
+
+
+def run_suite(size="10k", cases=None, seed=SEED, output=None):
+    """
+    Выполняет набор замеров; каждый замер — в отдельном процессе.
+    :param size: Размер таблицы: "10k", "1m" или "10m" (или число записей).
+    :param cases: Список названий замеров из CASES (по умолчанию все).
+    :param output: Путь к файлу JSON с результатами (None — не сохранять).
+    :return: Словарь с описанием окружения и списком результатов.
+    """
+    rows = SIZES[size] if size in SIZES else int(size)
+    names = list(CASES) if not cases else cases
+    for name in names:
+        if name not in CASES:
+            raise ValueError(f"Неизвестный замер '{name}'.")
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "size": str(size),
+        "rows": rows,
+        "seed": seed,
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "commit": git_commit(),
+        },
+        "results": [],
+    }
+    print(f"Набор замеров: {rows} записей, seed {seed}")
+    for name in names:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            result = pool.submit(run_case, name, rows, seed).result()
+        report["results"].append(result)
+        print(format_result(result))
+    if output is not None:
+        with open(output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=4, ensure_ascii=False)
+        print(f"Результаты сохранены в {output}")
+    return report
+
+
+def format_result(result):
+    """Строка результата замера для вывода в консоль."""
+    if "error" in result:
+        return f"  {result['name']:16} пропущен: {result['error']}"
+    # Пропускная способность не записывается (None), если замер занял нулевое время
+    throughput = "—" if result["throughput"] is None else f"{result['throughput']:,.0f}"
+    rss = "—" if result["peak_rss_mb"] is None else f"{result['peak_rss_mb']:8.1f} МБ"
+    return (f"  {result['name']:16} {throughput:>14} {result['unit']:6}"
+            f"   p50 {result['p50_ms']:10.3f} мс   p99 {result['p99_ms']:10.3f} мс   пик RSS {rss}")
+
+
+def compare_results(old, new, threshold=REGRESSION_THRESHOLD):
+    """
+    Сравнивает два прогона набора (словари, сохраненные run_suite).
+    Регрессия — падение пропускной способности или рост p99 больше чем на threshold.
+    :return: (строки сравнения, список названий замеров с регрессией).
+    """
+    previous = {result["name"]: result for result in old["results"] if "error" not in result}
+    lines, regressions = [], []
+    if old["rows"] != new["rows"]:
+        lines.append(f"Внимание: разный размер таблицы ({old['rows']} и {new['rows']} записей).")
+    for result in new["results"]:
+        base = previous.get(result["name"])
+        if base is None or "error" in result:
+            continue
+        # Без пропускной способности одного из прогонов (см. format_result) изменение не считается
+        throughput = (result["throughput"] / base["throughput"] - 1
+                      if base["throughput"] and result["throughput"] is not None else None)
+        p99 = result["p99_ms"] / base["p99_ms"] - 1 if base["p99_ms"] else 0.0
+        regressed = (throughput is not None and throughput < -threshold) or p99 > threshold
+        if regressed:
+            regressions.append(result["name"])
+        change = "—" if throughput is None else f"{throughput:+7.1%}"
+        lines.append(f"  {result['name']:16} пропускная способность {change:>7}   p99 {p99:+7.1%}"
+                     f"{'   РЕГРЕССИЯ' if regressed else ''}")
+    return lines, regressions
+
+
+def main(argv=None):
+    """Разбор аргументов командной строки (см. описание модуля)."""
+    parser = argparse.ArgumentParser(description="Замеры производительности SimpleDB.")
+    commands = parser.add_subparsers(dest="command")
+    suite = commands.add_parser("suite", help="набор замеров всех основных операций")
+    suite.add_argument("--size", default="10k", help="10k, 1m, 10m или число записей")
+    suite.add_argument("--cases", nargs="*", help=f"замеры: {', '.join(CASES)}")
+    suite.add_argument("--seed", type=int, default=SEED)
+    suite.add_argument("--output", help="файл JSON с результатами (по умолчанию bench_<size>.json)")
+    suite.add_argument("--baseline", help="файл JSON предыдущего прогона для сравнения")
+    suite.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    compare = commands.add_parser("compare", help="сравнение двух файлов с результатами")
+    compare.add_argument("old")
+    compare.add_argument("new")
+    compare.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    if args.command is None:
+        bench_insert()
+        bench_concurrency(storage="rows")
+        bench_concurrency(storage="columnar")
+        bench_aggregate()
+        bench_top_k()
+        bench_import()
+        bench_mixed()
+        bench_join()
+        bench_planner()
+        bench_server()
+        bench_partitions()
+        return 0
+    if args.command == "suite":
+        old = None
+        if args.baseline is not None:
+            # Читаем до прогона: файл результатов может совпадать с базовым
+            with open(args.baseline, encoding="utf-8") as file:
+                old = json.load(file)
+        new = run_suite(args.size, args.cases, args.seed, args.output or f"bench_{args.size}.json")
+        if old is None:
+            return 0
+    else:
+        with open(args.old, encoding="utf-8") as file:
+            old = json.load(file)
+        with open(args.new, encoding="utf-8") as file:
+            new = json.load(file)
+    lines, regressions = compare_results(old, new, args.threshold)
+    print("\n".join(lines))
+    if regressions:
+        print(f"Регрессии: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
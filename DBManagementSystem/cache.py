@@ -0,0 +1,81 @@
+import threading
+from collections import OrderedDict
+
+CACHE_ENTRIES = 128  # Сколько результатов запросов хранит кеш таблицы
+CACHE_ROWS = 1000000  # Сколько записей суммарно могут занимать закешированные результаты
+
+
+class QueryCache:
+    """
+    LRU-кеш результатов select для одной таблицы.
+    Все результаты относятся к одной версии таблицы. Таблица увеличивает версию
+    при любом изменении, и при первом обращении с новой версией кеш очищается
+    целиком — устаревшие результаты не возвращаются.
+    """
+
+    def __init__(self, max_entries=CACHE_ENTRIES, max_rows=CACHE_ROWS):
+        """
+        :param max_entries: Максимальное число результатов (0 — кеш выключен).
+        :param max_rows: Максимальное суммарное число записей во всех результатах.
+        """
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.entries = OrderedDict()  # {ключ запроса: список записей}
+        self.version = 0  # Версия таблицы, для которой действительны результаты
+        self.rows = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, version):
+        """Возвращает закешированный результат или None."""
+        with self.lock:
+            self._check_version(version)
+            rows = self.entries.get(key)
+            if rows is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return rows
+
+    def put(self, key, version, rows):
+        """Сохраняет результат, полученный на указанной версии таблицы."""
+        if not self.max_entries or len(rows) > self.max_rows:
+            return
+        with self.lock:
+            self._check_version(version)
+            if version != self.version:
+                return  # Таблица изменилась, пока выполнялся запрос
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.rows -= len(old)
+            self.entries[key] = rows
+            self.rows += len(rows)
+            while len(self.entries) > self.max_entries or self.rows > self.max_rows:
+                _, evicted = self.entries.popitem(last=False)
+                self.rows -= len(evicted)
+                self.evictions += 1
+
+    def _check_version(self, version):
+        if version > self.version:
+            self.entries.clear()
+            self.rows = 0
+            self.version = version
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.rows = 0
+
+    def stats(self):
+        """Статистика кеша: попадания, промахи, вытеснения и текущий размер."""
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "rows": self.rows,
+            }
@@ -0,0 +1,421 @@
+"""
+Клиент сервера SimpleDB (см. модуль server).
+
+    db = connect("127.0.0.1:5433")          # или connect("unix:/tmp/simpledb.sock")
+    table = db.get_table("items")
+    rows = table.select("price > 100", order_by="price", limit=10)
+
+RemoteDatabase и RemoteTable повторяют основные методы Database и Table, поэтому код,
+работающий с локальной базой (в том числе DBInterface), работает и с удаленной.
+Соединения берутся из пула: объект можно использовать из нескольких потоков, каждый
+поток во время запроса получает свое соединение. Пути к файлам (сохранение, экспорт,
+импорт, отчеты) указываются на стороне сервера.
+"""
+import contextlib
+import socket
+import threading
+
+from protocol import PROTOCOL_VERSION, ProtocolError, decode, frame, frame_size
+from query import Expr
+from schema import compile_schema
+
+POOL_SIZE = 4  # Наибольшее число соединений пула
+CONNECT_TIMEOUT = 10  # Ожидание соединения с сервером (секунды)
+REMOTE_BATCH_SIZE = 10000  # Записей в одном запросе insert_many
+
+# Исключения, которые передаются с сервера с сохранением класса
+REMOTE_ERRORS = {"ValueError": ValueError, "KeyError": KeyError, "TypeError": TypeError,
+                 "ProtocolError": ProtocolError}
+
+
+class RemoteError(Exception):
+    """Ошибка, возникшая на сервере (кроме ValueError, KeyError и TypeError, которые передаются как есть)."""
+
+
+def parse_address(address):
+    """
+    Разбирает адрес сервера.
+    :param address: "хост:порт", ("хост", порт), "unix:путь" или путь к сокету Unix, начинающийся с "/".
+    :return: (семейство сокетов, адрес для socket.connect).
+    """
+    if isinstance(address, tuple):
+        return socket.AF_INET, address
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[len("unix:"):]
+    if address.startswith("/"):
+        return socket.AF_UNIX, address
+    host, _, port = address.rpartition(":")
+    if not host or not port.isdigit():
+        raise ValueError(f"Неверный адрес сервера '{address}': ожидается хост:порт или unix:путь.")
+    return socket.AF_INET, (host, int(port))
+
+
+class Connection:
+    """Одно соединение с сервером: запросы выполняются по очереди."""
+
+    def __init__(self, address, timeout=None):
+        family, target = parse_address(address)
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.settimeout(CONNECT_TIMEOUT)
+        self.sock.connect(target)
+        self.sock.settimeout(timeout)
+        if family == socket.AF_INET:
+            # Запрос — один небольшой кадр: отправляем сразу, без алгоритма Нейгла
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.idle = True  # Последний запрос получил ответ целиком: соединение можно использовать снова
+
+    def call(self, request):
+        """Отправляет запрос и возвращает результат; ошибку сервера выбрасывает исключением."""
+        self.idle = False
+        self.sock.sendall(frame(request))
+        response = decode(self._receive(frame_size(self._receive(4))))
+        self.idle = True
+        if not response["ok"]:
+            raise REMOTE_ERRORS.get(response["type"], RemoteError)(response["error"])
+        return response["result"]
+
+    def _receive(self, size):
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        received = 0
+        while received < size:
+            count = self.sock.recv_into(view[received:])
+            if not count:
+                raise ConnectionError("Сервер закрыл соединение.")
+            received += count
+        return buffer
+
+    def close(self):
+        self.sock.close()
+
+
+class ConnectionPool:
+    """
+    Пул соединений с сервером. Соединения создаются по мере надобности (не больше size)
+    и возвращаются в пул, только если ответ на запрос получен целиком; иначе соединение закрывается.
+    """
+
+    def __init__(self, address, size=POOL_SIZE, timeout=None):
+        """
+        :param size: Наибольшее число одновременно открытых соединений.
+        :param timeout: Ожидание ответа сервера (секунды, None — без ограничения).
+        """
+        self.address = address
+        self.size = size
+        self.timeout = timeout
+        self.idle = []  # Свободные соединения: последнее возвращенное используется первым
+        self.opened = 0
+        # Защищает idle, opened и closed; потоки ждут на нем свободное соединение или место в пуле
+        self.available = threading.Condition()
+        self.closed = False
+
+    @contextlib.contextmanager
+    def connection(self):
+        connection = self._acquire()
+        try:
+            yield connection
+        finally:
+            # Прерванный запрос (ошибка ввода-вывода, тайм-аут, KeyboardInterrupt) мог оставить
+            # в сокете непрочитанную часть ответа: такое соединение в пул не возвращаем
+            if connection.idle:
+                self._release(connection)
+            else:
+                self._discard(connection)
+
+    def _acquire(self):
+        with self.available:
+            while True:
+                if self.closed:
+                    raise ConnectionError("Пул соединений закрыт.")
+                if self.idle:
+                    return self.idle.pop()
+                if self.opened < self.size:
+                    self.opened += 1
+                    break
+                self.available.wait()  # Ждем, пока другой поток вернет или закроет соединение
+        try:
+            return Connection(self.address, self.timeout)
+        except BaseException:
+            self._free_slot()
+            raise
+
+    def _release(self, connection):
+        """Возвращает исправное соединение в пул (после закрытия пула — закрывает его)."""
+        with self.available:
+            if not self.closed:
+                self.idle.append(connection)
+                self.available.notify()
+                return
+        self._discard(connection)
+
+    def _discard(self, connection):
+        connection.close()
+        self._free_slot()
+
+    def _free_slot(self):
+        """Освобождает место закрытого соединения: ожидающий поток может открыть новое."""
+        with self.available:
+            self.opened -= 1
+            self.available.notify()
+
+    def call(self, operation, **arguments):
+        """Выполняет операцию сервера через соединение из пула."""
+        with self.connection() as connection:
+            return connection.call({"op": operation, **arguments})
+
+    def close(self):
+        """Закрывает свободные соединения; занятые закрываются при возврате, ожидающие потоки получают ошибку."""
+        with self.available:
+            self.closed = True
+            idle, self.idle = self.idle, []
+            self.available.notify_all()
+        for connection in idle:
+            self._discard(connection)
+
+
+def remote_condition(condition):
+    """Условие в виде, пригодном для передачи: строка, выражение или (столбец, оператор, значение)."""
+    if condition is None or isinstance(condition, str):
+        return condition
+    if isinstance(condition, Expr):
+        return condition.to_string()
+    if callable(condition):
+        raise ValueError("Лямбда-функцию нельзя передать на сервер: используйте строку условия или выражение query.")
+    if isinstance(condition, tuple):
+        return list(condition)
+    return [list(predicate) for predicate in condition]
+
+
+class RemoteTable:
+    """Таблица на сервере с интерфейсом Table."""
+
+    def __init__(self, pool, name, info):
+        self.pool = pool
+        self.name = name
+        self._set_info(info)
+
+    def _set_info(self, info):
+        self.schema = info["schema"]
+        self.primary_key = info["primary_key"]
+        self.storage = info["storage"]
+        self.partition_by = info.get("partition_by")  # Описание секционирования или None
+        self.types = compile_schema(self.schema)  # Значения, введенные пользователем, разбираются на клиенте
+        self.columns = list(self.schema)
+
+    def _call(self, operation, **arguments):
+        return self.pool.call(operation, table=self.name, **arguments)
+
+    def _record(self, values):
+        return dict(zip(self.columns, values))
+
+    @property
+    def version(self):
+        """Версия таблицы на сервере (увеличивается при каждом изменении)."""
+        return self._call("version")
+
+    def count(self):
+        return self._call("count")
+
+    def select(self, condition=None, order_by=None, ascending=True, limit=None, offset=0):
+        rows = self._call("select", condition=remote_condition(condition), order_by=order_by,
+                          ascending=ascending, limit=limit, offset=offset)
+        return [self._record(values) for values in rows]
+
+    def iter_select(self, condition=None, order_by=None, ascending=True, limit=None, offset=0):
+        return iter(self.select(condition, order_by, ascending, limit, offset))
+
+    def get(self, key):
+        values = self._call("get", key=key)
+        return None if values is None else self._record(values)
+
+    def insert(self, record):
+        record = self.types.validate(dict(record))
+        self._call("insert", values=[record[col] for col in self.columns])
+
+    def insert_many(self, records):
+        """
+        Пакетно вставляет записи; запросы отправляются пакетами по REMOTE_BATCH_SIZE записей,
+        каждый пакет вставляется на сервере атомарно.
+        :return: Количество добавленных записей.
+        """
+        columns = self.columns
+        total = 0
+        batch = []
+        for record in records:
+            batch.append([record[col] for col in columns])
+            if len(batch) >= REMOTE_BATCH_SIZE:
+                total += self._call("insert_many", rows=batch)
+                batch = []
+        if batch:
+            total += self._call("insert_many", rows=batch)
+        return total
+
+    def update(self, condition, updates):
+        return self._call("update", condition=remote_condition(condition), updates=updates)
+
+    def delete(self, condition):
+        return self._call("delete", condition=remote_condition(condition))
+
+    def update_by_pk(self, key, updates):
+        return self._call("update_by_pk", key=key, updates=updates)
+
+    def delete_by_pk(self, key):
+        return self._call("delete_by_pk", key=key)
+
+    def update_row(self, row_id, updates):
+        self._call("update_row", row_id=row_id, updates=updates)
+
+    def delete_row(self, row_id):
+        self._call("delete_row", row_id=row_id)
+
+    def row_ids(self, condition=None, order_by=None, ascending=True):
+        return self._call("row_ids", condition=remote_condition(condition), order_by=order_by, ascending=ascending)
+
+    def fetch_rows(self, row_ids):
+        return [(values[0], self._record(values[1:])) for values in self._call("fetch_rows", row_ids=list(row_ids))]
+
+    def select_rows(self, condition=None, order_by=None, ascending=True):
+        return self.fetch_rows(self.row_ids(condition, order_by, ascending))
+
+    def aggregate(self, aggregates, group_by=None, condition=None):
+        return self._call("aggregate", aggregates=aggregates, group_by=group_by, condition=remote_condition(condition))
+
+    def explain(self, condition=None, order_by=None, ascending=True, limit=None, offset=0):
+        return self._call("explain", condition=remote_condition(condition), order_by=order_by,
+                          ascending=ascending, limit=limit, offset=offset)
+
+    def create_index(self, column, kind="hash"):
+        self._call("create_index", column=column, kind=kind)
+
+    def drop_index(self, column):
+        self._call("drop_index", column=column)
+
+    def generate_report(self, filename, progress=None, **options):
+        """Генерирует отчет в файл filename на стороне сервера (параметры — как у Table.generate_report)."""
+        if "condition" in options:
+            options["condition"] = remote_condition(options["condition"])
+        return self._call("generate_report", filename=filename, options=options)
+
+
+class RemoteMetrics:
+    """Метрики базы на сервере (см. RemoteDatabase.metrics)."""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def reset(self):
+        self.pool.call("reset_metrics")
+
+    def snapshot(self):
+        return self.pool.call("stats")["metrics"]
+
+
+class RemoteDatabase:
+    """
+    База данных на сервере с интерфейсом Database.
+    Аргумент progress методов сохранения и загрузки принимается для совместимости:
+    операция выполняется на сервере целиком.
+    """
+
+    def __init__(self, address, pool_size=POOL_SIZE, timeout=None):
+        self.pool = ConnectionPool(address, pool_size, timeout)
+        self.address = address
+        self.name = self.pool.call("hello", version=PROTOCOL_VERSION)["name"]
+        self._tables = {}
+
+    @property
+    def tables(self):
+        """Таблицы базы (список запрашивается у сервера при каждом обращении)."""
+        catalog = self.pool.call("tables")
+        tables = {}
+        for name, info in catalog.items():
+            table = self._tables.get(name)
+            if table is None:
+                table = RemoteTable(self.pool, name, info)
+            else:
+                table._set_info(info)
+            tables[name] = table
+        self._tables = tables
+        return dict(tables)
+
+    def get_table(self, table_name):
+        table = self._tables.get(table_name) or self.tables.get(table_name)
+        if table is None:
+            raise ValueError(f"Таблица '{table_name}' не существует.")
+        return table
+
+    def create_table(self, table_name, schema, storage="rows", primary_key=None, partition_by=None):
+        self.pool.call("create_table", table=table_name, schema=schema, storage=storage, primary_key=primary_key,
+                       partition_by=partition_by)
+        self.tables  # Обновляем список таблиц
+
+    def show_structure(self):
+        return {"Database": self.name, "Tables": {name: table.schema for name, table in self.tables.items()}}
+
+    def insert_into_table(self, table_name, record):
+        self.get_table(table_name).insert(record)
+
+    def bulk_load(self, table_name, records):
+        return self.get_table(table_name).insert_many(records)
+
+    @property
+    def metrics(self):
+        """RemoteMetrics, если на сервере включен сбор метрик, иначе None."""
+        return RemoteMetrics(self.pool) if self.pool.call("metrics_enabled") else None
+
+    def enable_metrics(self, slow_query_ms=None, metrics=None):
+        self.pool.call("enable_metrics", slow_query_ms=slow_query_ms)
+        return self.metrics
+
+    def disable_metrics(self):
+        self.pool.call("disable_metrics")
+
+    def stats(self):
+        return self.pool.call("stats")
+
+    def save_to_file(self, path, format=None, progress=None):
+        self.pool.call("save", path=path, format=format)
+
+    def save_database_to_csv(self, directory_path, compression=None, workers=None, progress=None):
+        self.pool.call("export", format="csv", path=directory_path, compression=compression)
+
+    def save_database_to_txt(self, directory_path, compression=None, workers=None, progress=None):
+        self.pool.call("export", format="txt", path=directory_path, compression=compression)
+
+    def save_database_to_xml(self, file_path, compression=None, progress=None):
+        self.pool.call("export", format="xml", path=file_path, compression=compression)
+
+    def save_database_to_excel(self, file_path, progress=None):
+        self.pool.call("export", format="excel", path=file_path)
+
+    def load_database_from_csv(self, directory_path, progress=None):
+        self.pool.call("import", format="csv", path=directory_path)
+
+    def load_database_from_txt(self, directory_path, progress=None):
+        self.pool.call("import", format="txt", path=directory_path)
+
+    def load_database_from_xml(self, file_path, progress=None):
+        self.pool.call("import", format="xml", path=file_path)
+
+    def load_database_from_excel(self, file_path, progress=None):
+        self.pool.call("import", format="excel", path=file_path)
+
+    def close(self):
+        self.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def connect(address, pool_size=POOL_SIZE, timeout=None):
+    """
+    Подключается к серверу SimpleDB.
+    :param address: "хост:порт", ("хост", порт) или "unix:путь".
+    :param pool_size: Наибольшее число соединений в пуле.
+    :param timeout: Ожидание ответа сервера (секунды, None — без ограничения).
+    :return: RemoteDatabase.
+    """
+    return RemoteDatabase(address, pool_size, timeout)
@@ -0,0 +1,414 @@
+from array import array
+from collections.abc import Mapping
+
+from query import And, Between, Col, Comparison, In
+from schema import parse_type
+
+try:
+    import numpy as np
+except ImportError:  # numpy необязателен: без него фильтрация идет циклом по массиву
+    np = None
+
+# Сравнения для невекторизованного варианта фильтрации
+_PYTHON_COMPARISONS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+}
+
+
+class NumericColumn:
+    """Столбец int/float в типизированном массиве array ('q' — int64, 'd' — float64)."""
+
+    def __init__(self, name, typecode):
+        self.name = name
+        self.values = array(typecode)
+
+    def __len__(self):
+        return len(self.values)
+
+    def get(self, position):
+        return self.values[position]
+
+    def append(self, value):
+        try:
+            self.values.append(value)
+        except (TypeError, OverflowError):
+            raise ValueError(f"Значение {value!r} нельзя сохранить в столбце '{self.name}'.")
+
+    def set(self, position, value):
+        try:
+            self.values[position] = value
+        except (TypeError, OverflowError):
+            raise ValueError(f"Значение {value!r} нельзя сохранить в столбце '{self.name}'.")
+
+    def extend(self, values):
+        try:
+            self.values.extend(values)
+        except (TypeError, OverflowError):
+            raise ValueError(f"Значения нельзя сохранить в столбце '{self.name}'.")
+
+    def pop(self):
+        self.values.pop()
+
+    def keep(self, positions):
+        """Оставляет только значения с указанными позициями."""
+        values = self.values
+        self.values = array(values.typecode, [values[position] for position in positions])
+
+    def nbytes(self):
+        return self.values.itemsize * len(self.values)
+
+    def match(self, op, value):
+        """Возвращает позиции значений, удовлетворяющих сравнению, или None, если сравнение невозможно."""
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return None
+        if np is not None:
+            values = np.frombuffer(self.values, dtype=np.int64 if self.values.typecode == "q" else np.float64)
+            if op == "==":
+                mask = values == value
+            elif op == "!=":
+                mask = values != value
+            elif op == "<":
+                mask = values < value
+            elif op == "<=":
+                mask = values <= value
+            elif op == ">":
+                mask = values > value
+            else:
+                mask = values >= value
+            return np.flatnonzero(mask).tolist()
+        compare = _PYTHON_COMPARISONS[op]
+        return [position for position, item in enumerate(self.values) if compare(item, value)]
+
+    def match_range(self, low, high):
+        """Возвращает позиции значений в диапазоне [low, high]."""
+        for bound in (low, high):
+            if isinstance(bound, bool) or not isinstance(bound, (int, float)):
+                return None
+        if np is not None:
+            values = np.frombuffer(self.values, dtype=np.int64 if self.values.typecode == "q" else np.float64)
+            return np.flatnonzero((values >= low) & (values <= high)).tolist()
+        return [position for position, item in enumerate(self.values) if low <= item <= high]
+
+    def match_any(self, candidates):
+        """Возвращает позиции значений, входящих в набор."""
+        if any(isinstance(value, bool) or not isinstance(value, (int, float)) for value in candidates):
+            return None
+        if np is not None:
+            values = np.frombuffer(self.values, dtype=np.int64 if self.values.typecode == "q" else np.float64)
+            return np.flatnonzero(np.isin(values, list(candidates))).tolist()
+        candidates = set(candidates)
+        return [position for position, item in enumerate(self.values) if item in candidates]
+
+
+class DictionaryColumn:
+    """Строковый столбец со словарным кодированием: массив кодов и список уникальных значений."""
+
+    def __init__(self, name):
+        self.name = name
+        self.codes = array("i")
+        self.dictionary = []  # Код -> значение
+        self.lookup = {}  # Значение -> код
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _encode(self, value):
+        code = self.lookup.get(value)
+        if code is None:
+            code = len(self.dictionary)
+            self.dictionary.append(value)
+            self.lookup[value] = code
+        return code
+
+    def get(self, position):
+        return self.dictionary[self.codes[position]]
+
+    def append(self, value):
+        self.codes.append(self._encode(value))
+
+    def set(self, position, value):
+        self.codes[position] = self._encode(value)
+
+    def extend(self, values):
+        encode = self._encode
+        self.codes.extend([encode(value) for value in values])
+
+    def pop(self):
+        self.codes.pop()
+
+    def keep(self, positions):
+        codes = self.codes
+        self.codes = array("i", [codes[position] for position in positions])
+
+    def nbytes(self):
+        return self.codes.itemsize * len(self.codes) + sum(len(value) for value in self.dictionary)
+
+    def match(self, op, value):
+        # По кодам можно проверить только равенство
+        if op not in ("==", "!="):
+            return None
+        code = self.lookup.get(value, -1)
+        if op == "==":
+            return [position for position, item in enumerate(self.codes) if item == code]
+        return [position for position, item in enumerate(self.codes) if item != code]
+
+    def match_range(self, low, high):
+        return None
+
+    def match_any(self, candidates):
+        codes = {self.lookup[value] for value in candidates if value in self.lookup}
+        return [position for position, item in enumerate(self.codes) if item in codes]
+
+
+class ObjectColumn:
+    """Столбец произвольного типа в обычном списке."""
+
+    def __init__(self, name):
+        self.name = name
+        self.values = []
+
+    def __len__(self):
+        return len(self.values)
+
+    def get(self, position):
+        return self.values[position]
+
+    def append(self, value):
+        self.values.append(value)
+
+    def set(self, position, value):
+        self.values[position] = value
+
+    def extend(self, values):
+        self.values.extend(values)
+
+    def pop(self):
+        self.values.pop()
+
+    def keep(self, positions):
+        values = self.values
+        self.values = [values[position] for position in positions]
+
+    def nbytes(self):
+        return 8 * len(self.values)
+
+    def match(self, op, value):
+        return None
+
+    def match_range(self, low, high):
+        return None
+
+    def match_any(self, candidates):
+        return None
+
+
+def make_column(name, col_type):
+    """Создает столбец подходящего вида по типу из схемы."""
+    base, nullable = parse_type(col_type)
+    if nullable:
+        return ObjectColumn(name)  # Типизированные массивы не хранят None
+    if base == "int":
+        return NumericColumn(name, "q")
+    if base == "float":
+        return NumericColumn(name, "d")
+    if base == "str":
+        return DictionaryColumn(name)
+    return ObjectColumn(name)
+
+
+class RowView(Mapping):
+    """
+    Ленивое представление строки колоночной таблицы в виде словаря (только для чтения).
+    Значения читаются из столбцов при обращении. Представление ссылается
+    на позицию строки и действительно до следующего удаления записей.
+    Изменять запись можно только через таблицу: иначе индексы, статистика,
+    кеш и журнал не узнают об изменении.
+    """
+    __slots__ = ("_data", "_position")
+
+    def __init__(self, data, position):
+        self._data = data
+        self._position = position
+
+    def __getitem__(self, key):
+        return self._data.columns[key].get(self._position)
+
+    def __iter__(self):
+        return iter(self._data.columns)
+
+    def __len__(self):
+        return len(self._data.columns)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class ColumnarData:
+    """
+    Колоночное хранилище записей таблицы.
+    Ведет себя как последовательность записей (len, индексация, итерация, append),
+    поэтому Table работает с ним так же, как со списком словарей.
+    Удаленные записи помечаются (как None в построчной таблице) и убираются из столбцов при compact.
+    """
+
+    def __init__(self, schema):
+        self.columns = {col: make_column(col, col_type) for col, col_type in schema.items()}
+        self.length = 0
+        self.deleted = set()  # Позиции удаленных записей до уплотнения
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += self.length
+        if not 0 <= position < self.length:
+            raise IndexError("Позиция записи вне диапазона.")
+        if position in self.deleted:
+            return None
+        return RowView(self, position)
+
+    def __iter__(self):
+        deleted = self.deleted
+        for position in range(self.length):
+            yield None if position in deleted else RowView(self, position)
+
+    def append(self, record):
+        """Добавляет запись (словарь) в конец хранилища."""
+        appended = []
+        try:
+            for col, column in self.columns.items():
+                column.append(record[col])
+                appended.append(column)
+        except ValueError:
+            # Откатываем уже добавленные значения, чтобы столбцы остались одной длины
+            for column in appended:
+                column.pop()
+            raise
+        self.length += 1
+
+    def extend(self, records):
+        """Добавляет пакет записей: значения каждого столбца дописываются одним вызовом."""
+        records = list(records)
+        done = []
+        try:
+            for col, column in self.columns.items():
+                column.extend([record[col] for record in records])
+                done.append(column)
+        except ValueError:
+            for column in done:
+                column.keep(range(self.length))
+            raise
+        self.length += len(records)
+
+    def update(self, position, updates):
+        """Записывает новые значения столбцов записи с указанной позицией: {"col_name": значение}."""
+        for col, value in updates.items():
+            self.columns[col].set(position, value)
+
+    def extend_columns(self, columns, count):
+        """Добавляет пакет, заданный значениями по столбцам: {"col_name": последовательность}."""
+        for col, column in self.columns.items():
+            column.extend(columns[col])
+        self.length += count
+
+    def slice_columns(self, start, end):
+        """Возвращает значения неудаленных строк [start, end) по столбцам."""
+        result = {}
+        live = None
+        if self.deleted:
+            live = [i for i, position in enumerate(range(start, min(end, self.length))) if position not in self.deleted]
+        for col, column in self.columns.items():
+            if isinstance(column, DictionaryColumn):
+                dictionary = column.dictionary
+                values = [dictionary[code] for code in column.codes[start:end]]
+            else:
+                values = column.values[start:end]
+            result[col] = values if live is None else [values[i] for i in live]
+        return result
+
+    def column_values(self, col):
+        """Значения столбца в неудаленных записях (список)."""
+        column = self.columns[col]
+        if isinstance(column, DictionaryColumn):
+            values = list(map(column.dictionary.__getitem__, column.codes))
+        else:
+            values = list(column.values)
+        if self.deleted:
+            deleted = self.deleted
+            values = [value for position, value in enumerate(values) if position not in deleted]
+        return values
+
+    def can_filter(self, expr):
+        """Можно ли отобрать кандидатов по выражению векторно (см. candidates), без сборки строк."""
+        if isinstance(expr, And):
+            return any(self.can_filter(item) for item in expr.items)
+        column = self.columns.get(getattr(expr, "column", None))
+        if isinstance(column, NumericColumn):
+            return isinstance(expr, (Between, In)) or (isinstance(expr, Comparison) and not isinstance(expr.value, Col))
+        if isinstance(column, DictionaryColumn):
+            return isinstance(expr, In) or (isinstance(expr, Comparison) and expr.op in ("==", "!=")
+                                            and not isinstance(expr.value, Col))
+        return False
+
+    def mark_deleted(self, positions):
+        """Помечает записи удаленными; позиции остальных записей не меняются."""
+        self.deleted.update(positions)
+
+    def compact(self):
+        """Убирает помеченные записи из столбцов (позиции записей после них сдвигаются)."""
+        if self.deleted:
+            self.delete(self.deleted)
+
+    def delete(self, positions):
+        """Удаляет записи с указанными позициями."""
+        positions = set(positions) | self.deleted
+        keep = [position for position in range(self.length) if position not in positions]
+        for column in self.columns.values():
+            column.keep(keep)
+        self.length = len(keep)
+        self.deleted = set()
+
+    def nbytes(self):
+        """Оценка объема памяти, занимаемого значениями столбцов (в байтах)."""
+        return sum(column.nbytes() for column in self.columns.values())
+
+    def candidates(self, expr):
+        """
+        Векторно фильтрует по простым условиям на столбцах.
+        :return: (позиции, exact) — exact=True, если позиции точно соответствуют выражению,
+                 или None, если выражение нельзя обработать по столбцам.
+        """
+        if isinstance(expr, And):
+            best = None
+            exact = True
+            for item in expr.items:
+                result = self.candidates(item)
+                if result is None:
+                    exact = False
+                    continue
+                positions, item_exact = result
+                exact = exact and item_exact
+                best = positions if best is None else sorted(set(best).intersection(positions))
+            return None if best is None else (best, exact)
+
+        column = self.columns.get(getattr(expr, "column", None))
+        if column is None:
+            return None
+        positions = None
+        if isinstance(expr, Comparison) and not isinstance(expr.value, Col):
+            positions = column.match(expr.op, expr.value)
+        elif isinstance(expr, Between):
+            positions = column.match_range(expr.low, expr.high)
+        elif isinstance(expr, In):
+            positions = column.match_any(expr.values)
+        if positions is None:
+            return None
+        if self.deleted:
+            positions = [position for position in positions if position not in self.deleted]
+        return positions, True
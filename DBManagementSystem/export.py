@@ -0,0 +1,154 @@
+"""
+Потоковая выгрузка таблиц в текстовые форматы и Excel.
+
+Записи читаются пакетами (Table.iter_batches) и сразу пишутся в файл,
+поэтому объем памяти не зависит от размера таблицы. Текстовые форматы
+можно сжимать на лету: gzip (стандартная библиотека) или zstd (пакет zstandard).
+"""
+import csv
+import datetime
+import gzip
+import io
+import re
+from xml.sax.saxutils import escape, quoteattr
+
+try:
+    import zstandard
+except ImportError:  # zstandard необязателен: без него доступно только сжатие gzip
+    zstandard = None
+
+# Расширения файлов для способов сжатия
+COMPRESSION_SUFFIXES = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+
+def output_path(path, compression):
+    """Добавляет к пути расширение способа сжатия."""
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"Неизвестный способ сжатия '{compression}'.")
+    return path + COMPRESSION_SUFFIXES[compression]
+
+
+def open_output(path, compression=None):
+    """
+    Открывает текстовый файл для записи с необязательным сжатием.
+    :param compression: None, "gzip" или "zstd".
+    """
+    if compression is None:
+        return open(path, "w", encoding="utf-8", newline="")
+    if compression == "gzip":
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+    if compression == "zstd":
+        if zstandard is None:
+            raise ValueError("Сжатие zstd недоступно: не установлен пакет zstandard.")
+        stream = zstandard.ZstdCompressor().stream_writer(open(path, "wb"))
+        return io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    raise ValueError(f"Неизвестный способ сжатия '{compression}'.")
+
+
+def write_csv(table, file, progress=None):
+    """
+    Пишет таблицу в CSV: строка заголовка, затем записи.
+    :param progress: Функция progress(rows), вызываемая после каждого пакета.
+    """
+    writer = csv.writer(file)
+    writer.writerow(list(table.schema))
+    for batch in table.iter_batches():
+        writer.writerows(batch)
+        if progress is not None:
+            progress(len(batch))
+
+
+# Экранирование в формате TXT: разделители ", " и ": " и перевод строки не встречаются
+# в названиях и значениях, поэтому строка файла однозначно делится на поля
+_TXT_ESCAPES = str.maketrans({"\\": "\\\\", ",": "\\,", ":": "\\:", "\n": "\\n", "\r": "\\r"})
+_TXT_UNESCAPES = {"n": "\n", "r": "\r"}
+_TXT_TOKENS = re.compile(r"\\(.)|(, )|(: )|([^\\,:]+|[,:])", re.S)
+
+
+def txt_escape(value):
+    """Текст значения или названия столбца для формата TXT (см. write_txt)."""
+    return str(value).translate(_TXT_ESCAPES)
+
+
+def parse_txt_line(line):
+    """
+    Разбирает строку в формате write_txt.
+    Файлы без экранирования (записанные до его появления) читаются так же, как раньше.
+    :return: Словарь {столбец: значение}; значения — строки.
+    """
+    if "\\" not in line:
+        # Без экранирования разделители однозначны: быстрый разбор без токенизации
+        return dict(field.partition(": ")[::2] for field in line.split(", "))
+    record = {}
+    key = None
+    parts = []
+    for escaped, separator, colon, text in _TXT_TOKENS.findall(line):
+        if separator:
+            if key is None:
+                key, parts = "".join(parts), []
+            record[key] = "".join(parts)
+            key, parts = None, []
+        elif colon and key is None:
+            key, parts = "".join(parts), []
+        elif escaped:
+            parts.append(_TXT_UNESCAPES.get(escaped, escaped))
+        else:
+            parts.append(colon or text)
+    if key is None:
+        key, parts = "".join(parts), []
+    record[key] = "".join(parts)
+    return record
+
+
+def write_txt(table, file, progress=None):
+    """
+    Пишет таблицу построчно в формате "столбец: значение, столбец: значение".
+    Обратная косая черта, запятая, двоеточие и перевод строки экранируются обратной косой чертой.
+    """
+    columns = [txt_escape(col) for col in table.schema]
+    for batch in table.iter_batches():
+        file.write("".join(
+            ", ".join(f"{col}: {txt_escape(value)}" for col, value in zip(columns, row)) + "\n" for row in batch
+        ))
+        if progress is not None:
+            progress(len(batch))
+
+
+def write_xml_table(table, file, progress=None):
+    """Пишет элемент <table> с записями таблицы; текст и атрибуты экранируются."""
+    columns = list(table.schema)
+    file.write(f"<table name={quoteattr(table.name)}>")
+    for batch in table.iter_batches():
+        file.write("".join(
+            "<row>" + "".join(f"<{col}>{escape(str(value))}</{col}>" for col, value in zip(columns, row)) + "</row>"
+            for row in batch
+        ))
+        if progress is not None:
+            progress(len(batch))
+    file.write("</table>")
+
+
+def excel_value(value):
+    # Ячейка Excel хранит числа, строки, логические значения и пустоту; остальное пишется строкой
+    if value is None or isinstance(value, (bool, int, float, str, datetime.date)):
+        return value
+    return str(value)
+
+
+def write_excel(tables, file_path, progress=None):
+    """
+    Пишет таблицы в книгу Excel (лист на таблицу) в режиме openpyxl write-only:
+    строки сразу сериализуются и не хранятся в памяти книги.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    for table in tables:
+        sheet = workbook.create_sheet(title=table.name)
+        sheet.append(list(table.schema))
+        for batch in table.iter_batches():
+            for row in batch:
+                sheet.append([excel_value(value) for value in row])
+            if progress is not None:
+                progress(len(batch))
+    workbook.save(file_path)
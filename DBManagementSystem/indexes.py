@@ -0,0 +1,190 @@
+import bisect
+import operator
+
+
+class HashIndex:
+    """
+    Хеш-индекс по столбцу: значение -> список позиций записей.
+    Поддерживает только проверку на равенство, поиск за O(1).
+    """
+    kind = "hash"
+    operators = ("==",)
+
+    def __init__(self, column):
+        self.column = column
+        self.entries = {}  # Значение -> список позиций в Table.data
+
+    def build(self, records):
+        """Строит индекс заново по списку записей."""
+        self.entries = {}
+        for position, record in enumerate(records):
+            if record is not None:  # None — удаленная запись
+                self.add(record[self.column], position)
+
+    def add(self, value, position):
+        """Добавляет позицию записи для значения."""
+        self.entries.setdefault(value, []).append(position)
+
+    def add_many(self, values, start):
+        """Добавляет записи пакета: values — значения столбца, позиции идут подряд от start."""
+        entries = self.entries
+        for position, value in enumerate(values, start):
+            entries.setdefault(value, []).append(position)
+
+    def remove(self, value, position):
+        """Удаляет позицию записи для значения."""
+        positions = self.entries.get(value)
+        if positions is None:
+            return
+        positions.remove(position)
+        if not positions:
+            del self.entries[value]
+
+    def supports(self, op):
+        """Проверяет, может ли индекс обработать оператор сравнения."""
+        return op in self.operators
+
+    def lookup(self, op, value):
+        """Возвращает позиции записей, удовлетворяющих условию."""
+        if op != "==":
+            raise ValueError(f"Хеш-индекс не поддерживает оператор '{op}'.")
+        return list(self.entries.get(value, ()))
+
+    def count(self, op, value):
+        """Число записей, удовлетворяющих условию (без выборки позиций)."""
+        return len(self.entries.get(value, ()))
+
+
+class SortedIndex:
+    """
+    Упорядоченный индекс по столбцу: отсортированные ключи и параллельный список позиций.
+    Поддерживает равенство и диапазоны, поиск за O(log n).
+    Пустые значения (None) не упорядочиваются и в индекс не попадают.
+    """
+    kind = "sorted"
+    operators = ("==", "<", "<=", ">", ">=")
+
+    def __init__(self, column):
+        self.column = column
+        self.keys = []  # Отсортированные значения столбца
+        self.positions = []  # Позиции записей, соответствующие self.keys
+
+    def build(self, records):
+        """Строит индекс заново по списку записей."""
+        pairs = sorted(
+            ((record[self.column], position) for position, record in enumerate(records)
+             if record is not None and record[self.column] is not None),
+            key=lambda pair: pair[0],
+        )
+        self.keys = [key for key, _ in pairs]
+        self.positions = [position for _, position in pairs]
+
+    def add(self, value, position):
+        """Добавляет позицию записи для значения (среди равных ключей позиции идут по возрастанию)."""
+        if value is None:
+            return
+        i = bisect.bisect_right(self.keys, value)
+        while i > 0 and self.keys[i - 1] == value and self.positions[i - 1] > position:
+            i -= 1
+        self.keys.insert(i, value)
+        self.positions.insert(i, position)
+
+    def add_many(self, values, start):
+        """
+        Добавляет записи пакета: values — значения столбца, позиции идут подряд от start
+        и больше всех позиций в индексе. Пакет сортируется и сливается с индексом за один
+        проход (O(n + m log n) вместо сдвига списков на каждую запись); среди равных ключей
+        новые позиции идут после старых.
+        """
+        pairs = sorted(((value, position) for position, value in enumerate(values, start) if value is not None),
+                       key=operator.itemgetter(0))
+        if len(pairs) < 8:
+            for value, position in pairs:
+                self.add(value, position)
+            return
+        keys, positions = self.keys, self.positions
+        merged_keys, merged_positions = [], []
+        previous = 0
+        for value, position in pairs:
+            i = bisect.bisect_right(keys, value, previous)
+            merged_keys += keys[previous:i]
+            merged_positions += positions[previous:i]
+            merged_keys.append(value)
+            merged_positions.append(position)
+            previous = i
+        merged_keys += keys[previous:]
+        merged_positions += positions[previous:]
+        self.keys, self.positions = merged_keys, merged_positions
+
+    def remove(self, value, position):
+        """Удаляет позицию записи для значения."""
+        if value is None:
+            return
+        lo = bisect.bisect_left(self.keys, value)
+        hi = bisect.bisect_right(self.keys, value)
+        for i in range(lo, hi):
+            if self.positions[i] == position:
+                del self.keys[i]
+                del self.positions[i]
+                return
+
+    def supports(self, op):
+        """Проверяет, может ли индекс обработать оператор сравнения."""
+        return op in self.operators
+
+    def lookup(self, op, value):
+        """Возвращает позиции записей, удовлетворяющих условию."""
+        lo, hi = self._bounds(op, value)
+        return self.positions[lo:hi]
+
+    def count(self, op, value):
+        """Число записей, удовлетворяющих условию, за O(log n)."""
+        lo, hi = self._bounds(op, value)
+        return hi - lo
+
+    def _bounds(self, op, value):
+        """Границы [lo, hi) ключей, удовлетворяющих условию."""
+        if op == "==":
+            lo = bisect.bisect_left(self.keys, value)
+            hi = bisect.bisect_right(self.keys, value)
+        elif op == "<":
+            lo, hi = 0, bisect.bisect_left(self.keys, value)
+        elif op == "<=":
+            lo, hi = 0, bisect.bisect_right(self.keys, value)
+        elif op == ">":
+            lo, hi = bisect.bisect_right(self.keys, value), len(self.keys)
+        elif op == ">=":
+            lo, hi = bisect.bisect_left(self.keys, value), len(self.keys)
+        else:
+            raise ValueError(f"Упорядоченный индекс не поддерживает оператор '{op}'.")
+        return lo, hi
+
+    def ordered(self, ascending=True):
+        """
+        Перебирает позиции в порядке значений столбца. Равные значения идут
+        в порядке позиций, как после устойчивой сортировки записей.
+        """
+        if ascending:
+            yield from self.positions
+            return
+        hi = len(self.keys)
+        while hi > 0:
+            lo = bisect.bisect_left(self.keys, self.keys[hi - 1], 0, hi)
+            yield from self.positions[lo:hi]
+            hi = lo
+
+    def between(self, low, high):
+        """Возвращает позиции записей со значениями в диапазоне [low, high]."""
+        lo = bisect.bisect_left(self.keys, low)
+        hi = bisect.bisect_right(self.keys, high)
+        return self.positions[lo:hi]
+
+    def count_between(self, low, high):
+        """Число записей со значениями в диапазоне [low, high]."""
+        return bisect.bisect_right(self.keys, high) - bisect.bisect_left(self.keys, low)
+
+
+INDEX_TYPES = {
+    HashIndex.kind: HashIndex,
+    SortedIndex.kind: SortedIndex,
+}
@@ -1,9 +1,61 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 from SimpleDB import Database  # Импортируем нашу реализацию СУБД
+from client import RemoteDatabase, connect
+from partition import parse_partitioning
+from report import REPORT_FORMATS
+from server import DEFAULT_HOST, DEFAULT_PORT
+from schema import parse_type
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import filedialog
 
+ROW_HEIGHT = 20  # Высота строки Treeview по умолчанию (пиксели), если стиль ее не задает
+POLL_INTERVAL = 50  # Как часто (мс) главный поток проверяет завершение фоновой задачи
+JOB_WORKERS = 2  # Сколько длительных операций (загрузка, сохранение, импорт, экспорт) выполняется одновременно
+STATS_INTERVAL = 1000  # Как часто (мс) обновляется открытая панель статистики
+STATS_COLUMNS = [("table", "Таблица"), ("operation", "Операция"), ("calls", "Вызовы"), ("errors", "Ошибки"),
+                 ("rows", "Записи"), ("scanned", "Просмотрено"), ("mean_ms", "Среднее, мс"),
+                 ("p50_ms", "p50, мс"), ("p99_ms", "p99, мс"), ("max_ms", "Макс., мс")]
+
+
+class JobCancelled(Exception):
+    """Операция прервана пользователем."""
+
+
+class Job:
+    """
+    Длительная операция, выполняемая в пуле потоков.
+    Операция получает функцию progress(rows) и вызывает ее после каждого пакета записей;
+    через нее же операция прерывается: после отмены progress выбрасывает JobCancelled.
+    """
+
+    def __init__(self, title, work, total=None):
+        """
+        :param title: Название операции для панели задач.
+        :param work: Функция work(progress), выполняющая операцию.
+        :param total: Ожидаемое число записей (None, если неизвестно).
+        """
+        self.title = title
+        self.work = work
+        self.total = total
+        self.done = 0  # Обработано записей
+        self.cancelled = threading.Event()
+        self.lock = threading.Lock()  # progress может вызываться из нескольких потоков (параллельный экспорт)
+        self.future = None
+        self.on_done = None  # Вызывается в главном потоке с результатом операции
+        self.widgets = None  # (строка панели, надпись, индикатор)
+
+    def progress(self, rows):
+        if self.cancelled.is_set():
+            raise JobCancelled(f"Операция отменена: {self.title}.")
+        with self.lock:
+            self.done += rows
+
+    def cancel(self):
+        self.cancelled.set()
+
 class DBInterface:
     def __init__(self, root):
         self.root = root
@@ -11,6 +63,18 @@ class DBInterface:
         self.db = None
         self.current_view = "databases"  # Текущий уровень интерфейса: databases, tables, table_data
         self.history = []  # История переходов (для кнопки "Назад")
+        self.row_keys = {}  # Строка Treeview -> значение первичного ключа или row id записи
+        # Виртуальная прокрутка: в Treeview выводится только видимое окно результата запроса
+        self.result_ids = []  # Row id всех записей текущего результата
+        self.result_version = None  # Версия таблицы, на которой получен результат
+        self.query = (None, None, True)  # Текущий запрос: (условие, столбец сортировки, по возрастанию)
+        self.offset = 0  # Номер первой видимой записи результата
+        self.query_token = 0  # Номер последнего запроса: результаты устаревших запросов отбрасываются
+        self.background_tasks = 0  # Число выполняющихся фоновых задач (для индикатора)
+        self.jobs = []  # Выполняющиеся длительные операции
+        self.executor = ThreadPoolExecutor(max_workers=JOB_WORKERS)
+        self.stats_window = None  # Открытая панель статистики: (окно, флажок сбора, таблица, журнал)
+        self.stats_timer = None  # Запланированное обновление панели статистики (root.after)
 
         # UI компоненты
         self.setup_ui()
@@ -25,9 +89,11 @@ class DBInterface:
         self.database_buttons = tk.Frame(self.top_frame)
         tk.Button(self.database_buttons, text="Создать базу данных", command=self.create_database).pack(side=tk.LEFT, padx=5)
         tk.Button(self.database_buttons, text="Загрузить базу данных", command=self.load_database).pack(side=tk.LEFT, padx=5)
+        tk.Button(self.database_buttons, text="Подключиться к серверу", command=self.connect_server).pack(side=tk.LEFT, padx=5)
         tk.Button(self.database_buttons, text="Сохранить базу данных", command=self.save_database).pack(side=tk.LEFT, padx=5)
         tk.Button(self.database_buttons, text="Экспорт базы данных", command=self.export_database).pack(side=tk.LEFT, padx=5)
         tk.Button(self.database_buttons, text="Импорт базы данных", command=self.import_database).pack(side=tk.LEFT, padx=5)
+        tk.Button(self.database_buttons, text="Статистика", command=self.show_stats).pack(side=tk.LEFT, padx=5)
 
         self.table_buttons = tk.Frame(self.top_frame)
         tk.Button(self.table_buttons, text="Создать таблицу", command=self.create_table).pack(side=tk.LEFT, padx=5)
@@ -42,16 +108,41 @@ class DBInterface:
         tk.Button(self.data_buttons, text="Создать отчет", command=self.create_report_interface).pack(side=tk.LEFT, padx=5)
         tk.Button(self.data_buttons, text="Назад", command=self.go_back).pack(side=tk.LEFT, padx=5)
 
+        # Индикатор выполнения фоновых запросов
+        self.status_frame = tk.Frame(self.root)
+        self.status_frame.pack(side=tk.BOTTOM, fill=tk.X, padx=10)
+        self.status_label = tk.Label(self.status_frame, anchor=tk.W)
+        self.status_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.progress = ttk.Progressbar(self.status_frame, mode="indeterminate", length=150)
+        # Панель длительных операций: строка с индикатором и кнопкой отмены на каждую операцию
+        self.jobs_frame = tk.Frame(self.root)
+        self.jobs_frame.pack(side=tk.BOTTOM, fill=tk.X, padx=10)
+
         # Центральная панель для отображения содержимого
-        self.tree_view = ttk.Treeview(self.root, columns=[], show="headings")
-        self.tree_view.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.view_frame = tk.Frame(self.root)
+        self.view_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.scrollbar = ttk.Scrollbar(self.view_frame, orient=tk.VERTICAL, command=self.on_scroll)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree_view = ttk.Treeview(self.view_frame, columns=[], show="headings")
+        self.tree_view.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         self.tree_view.bind("<Double-1>", self.on_double_click)
+        self.tree_view.bind("<Configure>", lambda event: self.render_rows())
+        self.tree_view.bind("<MouseWheel>", lambda event: self.scroll_rows(-1 if event.delta > 0 else 1, "units"))
+        self.tree_view.bind("<Button-4>", lambda event: self.scroll_rows(-1, "units"))
+        self.tree_view.bind("<Button-5>", lambda event: self.scroll_rows(1, "units"))
+        self.tree_view.bind("<Prior>", lambda event: self.scroll_rows(-1, "pages"))
+        self.tree_view.bind("<Next>", lambda event: self.scroll_rows(1, "pages"))
 
         self.update_view()
 
     def update_view(self):
         """Обновляет содержимое интерфейса в зависимости от текущего уровня"""
         self.tree_view.delete(*self.tree_view.get_children())  # Очищаем текущее содержимое
+        self.row_keys = {}
+        self.result_ids = []
+        self.result_version = None
+        self.query_token += 1  # Результат незавершенного запроса больше не нужен
+        self.scrollbar.set(0, 1)
         self.database_buttons.pack_forget()
         self.table_buttons.pack_forget()
         self.data_buttons.pack_forget()
@@ -68,7 +159,7 @@ class DBInterface:
             if self.db:
                 self.tree_view["columns"] = ["name"]
                 self.tree_view.heading("name", text="Таблицы")
-                for table_name in self.db.tables.keys():
+                for table_name in list(self.db.tables):  # Фоновый импорт может добавлять таблицы
                     self.tree_view.insert("", "end", values=(table_name,))
                 self.table_buttons.pack()  # Отображаем кнопки для таблиц
         elif self.current_view == "table_data":
@@ -82,13 +173,176 @@ class DBInterface:
                 for col in table.schema.keys():
                     self.tree_view.heading(col, text=col)
 
-                # Заполняем данные
-                for record in table.fetch_all():
-                    self.tree_view.insert("", "end", values=[record[col] for col in table.schema.keys()])
+                # Заполняем данные: запрос выполняется в фоне, выводится только видимое окно
+                self.load_rows(table)
             except ValueError as e:
                 messagebox.showerror("Ошибка", f"Не удалось загрузить данные таблицы: {e}")
             self.data_buttons.pack()  # Отображаем кнопки для данных
 
+    def run_in_background(self, work, on_done, message="Выполняется запрос..."):
+        """
+        Выполняет work() в рабочем потоке, чтобы интерфейс не замирал.
+        Результат передается в on_done(result) в главном потоке (через root.after).
+        :param message: Текст в строке состояния; None — фоновая задача без индикатора (периодические обновления).
+        """
+        quiet = message is None
+        if not quiet:
+            self.status_label.config(text=message)
+            if not self.background_tasks:
+                self.progress.pack(side=tk.RIGHT)
+                self.progress.start(10)
+            self.background_tasks += 1
+        outcome = {}
+
+        def target():
+            try:
+                outcome["result"] = work()
+            except Exception as e:
+                outcome["error"] = e
+
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+
+        def poll():
+            if thread.is_alive():
+                self.root.after(POLL_INTERVAL, poll)
+                return
+            if not quiet:
+                self.background_tasks -= 1
+                if not self.background_tasks:
+                    self.progress.stop()
+                    self.progress.pack_forget()
+                    self.status_label.config(text="")
+            if "error" in outcome:
+                messagebox.showerror("Ошибка", f"Не удалось выполнить операцию: {outcome['error']}")
+            else:
+                on_done(outcome["result"])
+
+        self.root.after(POLL_INTERVAL, poll)
+
+    def start_job(self, title, work, on_done=None, total=None):
+        """
+        Запускает длительную операцию в пуле потоков и показывает ее на панели задач.
+        Интерфейс продолжает работать; результат передается в on_done(result) в главном потоке.
+        :param work: Функция work(progress) — операция с функцией хода выполнения.
+        :param total: Ожидаемое число записей для индикатора (None — индикатор без шкалы).
+        """
+        job = Job(title, work, total)
+        job.on_done = on_done
+        row = tk.Frame(self.jobs_frame)
+        row.pack(fill=tk.X, pady=2)
+        label = tk.Label(row, text=title, anchor=tk.W)
+        label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        tk.Button(row, text="Отмена", command=job.cancel).pack(side=tk.RIGHT)
+        bar = ttk.Progressbar(row, length=200, maximum=max(total or 0, 1),
+                              mode="determinate" if total else "indeterminate")
+        bar.pack(side=tk.RIGHT, padx=5)
+        if not total:
+            bar.start(10)
+        job.widgets = (row, label, bar)
+        job.future = self.executor.submit(job.work, job.progress)
+        self.jobs.append(job)
+        if len(self.jobs) == 1:
+            self.root.after(POLL_INTERVAL, self.poll_jobs)
+        return job
+
+    def poll_jobs(self):
+        """Обновляет индикаторы операций и обрабатывает завершившиеся (в главном потоке)."""
+        for job in list(self.jobs):
+            row, label, bar = job.widgets
+            if job.total:
+                bar["value"] = min(job.done, job.total)
+            label.config(text=f"{job.title}: {job.done} записей" + (" (отмена...)" if job.cancelled.is_set() else ""))
+            if not job.future.done():
+                continue
+            self.jobs.remove(job)
+            row.destroy()
+            error = job.future.exception()
+            if isinstance(error, JobCancelled):
+                messagebox.showinfo("Отменено", str(error))
+            elif error is not None:
+                messagebox.showerror("Ошибка", f"{job.title}: {error}")
+            elif job.on_done is not None:
+                job.on_done(job.future.result())
+        if self.jobs:
+            self.root.after(POLL_INTERVAL, self.poll_jobs)
+
+    def load_rows(self, table, condition=None, order_by=None, ascending=True):
+        """Выполняет запрос к таблице в фоне и показывает первую страницу результата."""
+        self.query_token += 1
+        token = self.query_token
+        self.query = (condition, order_by, ascending)
+
+        def work():
+            version = table.version
+            return version, table.row_ids(condition=condition, order_by=order_by, ascending=ascending)
+
+        def done(result):
+            if token != self.query_token:
+                return  # Пользователь уже ушел с этой таблицы или запустил другой запрос
+            self.result_version, self.result_ids = result
+            self.offset = 0
+            self.render_rows()
+            self.status_label.config(text=f"Записей: {len(self.result_ids)}")
+
+        self.run_in_background(work, done)
+
+    def visible_rows(self):
+        """Сколько строк помещается в видимой области Treeview."""
+        row_height = int(ttk.Style().lookup("Treeview", "rowheight") or ROW_HEIGHT)
+        # Первую строку занимают заголовки столбцов
+        return max(1, (self.tree_view.winfo_height() - row_height) // row_height)
+
+    def render_rows(self):
+        """Выводит в Treeview только видимое окно результата, читая записи страницей из таблицы."""
+        if self.current_view != "table_data" or not self.history:
+            return
+        table = self.db.get_table(self.history[-1])
+        if self.result_version is not None and table.version != self.result_version:
+            # Таблица изменилась: row id могли устареть, повторяем запрос
+            self.result_version = None
+            self.load_rows(table, *self.query)
+            return
+        visible = self.visible_rows()
+        total = len(self.result_ids)
+        self.offset = max(0, min(self.offset, total - visible))
+        selected = self.selected_key()
+        rows = table.fetch_rows(self.result_ids[self.offset:self.offset + visible])
+
+        self.tree_view.delete(*self.tree_view.get_children())
+        self.row_keys = {}
+        for row_id, record in rows:
+            item = self.tree_view.insert("", "end", values=[record[col] for col in table.schema.keys()])
+            key = record[table.primary_key] if table.primary_key else row_id
+            self.row_keys[item] = key
+            if key == selected:
+                self.tree_view.selection_set(item)
+        if total:
+            self.scrollbar.set(self.offset / total, min(1, (self.offset + visible) / total))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def scroll_rows(self, amount, what):
+        """Прокручивает окно результата на amount строк ("units") или страниц ("pages")."""
+        step = self.visible_rows() if what == "pages" else 1
+        self.offset += int(amount) * step
+        self.render_rows()
+        return "break"
+
+    def on_scroll(self, action, *args):
+        """Обработчик полосы прокрутки: перемещение ползунка или прокрутка стрелками."""
+        if action == "moveto":
+            self.offset = int(float(args[0]) * len(self.result_ids))
+            self.render_rows()
+        elif action == "scroll":
+            self.scroll_rows(args[0], args[1])
+
+    def selected_key(self):
+        """Ключ записи, выбранной в таблице интерфейса, или None."""
+        selected_item = self.tree_view.selection()
+        if not selected_item:
+            return None
+        return self.row_keys.get(selected_item[0])
 
     def go_back(self):
         """Возвращение на предыдущий уровень"""
@@ -122,29 +376,147 @@ class DBInterface:
         self.update_view()
 
     def load_database(self):
-        """Загружаем базу данных из файла"""
-        filename = simpledialog.askstring("Загрузить", "Введите имя файла базы данных (JSON):")
-        if filename:
-            try:
-                self.db = Database.load_from_file(filename)
-                messagebox.showinfo("Успех", f"База данных '{self.db.name}' успешно загружена!")
-            except Exception as e:
-                messagebox.showerror("Ошибка", f"Не удалось загрузить базу данных: {e}")
-        self.update_view()
+        """Загружаем базу данных из файла (в фоне)"""
+        filename = simpledialog.askstring("Загрузить", "Введите путь к базе данных (каталог сегментов или файл JSON):")
+        if not filename:
+            return
+
+        def done(db):
+            self.db = db
+            self.current_view = "databases"
+            self.history = []
+            messagebox.showinfo("Успех", f"База данных '{db.name}' успешно загружена!")
+            self.update_view()
+
+        # Если сбор метрик включен, он продолжается для загруженной базы
+        metrics = self.db.metrics if self.db else None
+        self.start_job(f"Загрузка '{filename}'",
+                       lambda progress: Database.load_from_file(filename, progress=progress, metrics=metrics), done)
+
+    def connect_server(self):
+        """Подключается к серверу SimpleDB (см. server.py): интерфейс работает с базой на сервере."""
+        address = simpledialog.askstring("Подключение", "Введите адрес сервера (хост:порт или unix:путь):",
+                                         initialvalue=f"{DEFAULT_HOST}:{DEFAULT_PORT}")
+        if not address:
+            return
+
+        def done(db):
+            if isinstance(self.db, RemoteDatabase):
+                self.db.close()
+            self.db = db
+            self.current_view = "databases"
+            self.history = []
+            messagebox.showinfo("Успех", f"Подключено к базе '{db.name}' на сервере {address}.")
+            self.update_view()
+
+        self.run_in_background(lambda: connect(address.strip()), done, message=f"Подключение к {address}...")
 
     def save_database(self):
-        """Сохраняем базу данных в файл"""
+        """Сохраняем базу данных в файл (в фоне)"""
         if not self.db:
             messagebox.showwarning("Предупреждение", "Сначала создайте или загрузите базу данных!")
             return
 
-        filename = simpledialog.askstring("Сохранить", "Введите имя файла для сохранения базы данных (JSON):")
+        filename = simpledialog.askstring("Сохранить", "Введите путь для сохранения базы данных (каталог сегментов или файл .json):")
         if filename:
-            try:
-                self.db.save_to_file(filename)
-                messagebox.showinfo("Успех", f"База данных успешно сохранена в файл '{filename}'!")
-            except Exception as e:
-                messagebox.showerror("Ошибка", f"Не удалось сохранить базу данных: {e}")
+            db = self.db
+            self.start_job(f"Сохранение в '{filename}'",
+                           lambda progress: db.save_to_file(filename, progress=progress),
+                           lambda result: messagebox.showinfo("Успех", f"База данных успешно сохранена в '{filename}'!"),
+                           total=self.total_rows())
+
+    def total_rows(self):
+        """Число записей во всех таблицах базы (для индикатора хода операции)."""
+        return sum(table.count() for table in list(self.db.tables.values()))
+
+    def show_stats(self):
+        """Открывает панель статистики: метрики операций по таблицам и журнал медленных запросов."""
+        if not self.db:
+            messagebox.showwarning("Предупреждение", "Сначала создайте или загрузите базу данных!")
+            return
+        if self.stats_window is not None:
+            self.stats_window[0].lift()
+            return
+        window = tk.Toplevel(self.root)
+        window.title("Статистика")
+        window.protocol("WM_DELETE_WINDOW", self.close_stats)
+        controls = tk.Frame(window)
+        controls.pack(fill=tk.X, padx=10, pady=5)
+        enabled = tk.BooleanVar(value=self.db.metrics is not None)
+        tk.Checkbutton(controls, text="Собирать метрики", variable=enabled,
+                       command=lambda: self.toggle_metrics(enabled.get())).pack(side=tk.LEFT)
+        tk.Button(controls, text="Сбросить", command=self.reset_metrics).pack(side=tk.LEFT, padx=5)
+        operations = ttk.Treeview(window, columns=[name for name, _ in STATS_COLUMNS], show="headings", height=12)
+        for name, title in STATS_COLUMNS:
+            operations.heading(name, text=title)
+            operations.column(name, width=90)
+        operations.pack(fill=tk.BOTH, expand=True, padx=10)
+        tk.Label(window, text="Медленные запросы:", anchor=tk.W).pack(fill=tk.X, padx=10)
+        slow = tk.Listbox(window, height=8)
+        slow.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        self.stats_window = (window, enabled, operations, slow)
+        self.refresh_stats()
+
+    def close_stats(self):
+        if self.stats_window is not None:
+            self.stats_window[0].destroy()
+            self.stats_window = None
+        if self.stats_timer is not None:
+            self.root.after_cancel(self.stats_timer)
+            self.stats_timer = None
+
+    def toggle_metrics(self, enabled):
+        """Включает или выключает сбор метрик текущей базы."""
+        if not self.db:
+            return
+        if enabled:
+            if self.db.metrics is None:
+                self.db.enable_metrics()
+        else:
+            self.db.disable_metrics()
+        self.refresh_stats(schedule=False)
+
+    def reset_metrics(self):
+        if self.db and self.db.metrics is not None:
+            self.db.metrics.reset()
+        self.refresh_stats(schedule=False)
+
+    def refresh_stats(self, schedule=True):
+        """
+        Обновляет панель статистики; пока панель открыта, повторяется каждые STATS_INTERVAL мс.
+        Снимок метрик собирается в рабочем потоке, следующее обновление планируется после отрисовки.
+        """
+        if self.stats_window is None or not self.db:
+            return
+        db = self.db
+        window = self.stats_window[0]
+
+        def done(snapshot):
+            # Панель могли закрыть (или открыть заново), пока собирался снимок
+            if self.stats_window is None or self.stats_window[0] is not window:
+                return
+            self.render_stats(snapshot)
+            if schedule:
+                self.stats_timer = self.root.after(STATS_INTERVAL, self.refresh_stats)
+
+        self.run_in_background(lambda: db.stats()["metrics"], done, message=None)
+
+    def render_stats(self, snapshot):
+        """Заполняет панель статистики снимком метрик (None — сбор метрик выключен)."""
+        window, enabled, operations, slow = self.stats_window
+        operations.delete(*operations.get_children())
+        slow.delete(0, tk.END)
+        enabled.set(snapshot is not None)
+        if snapshot is not None:
+            rows = [(table, name, stats) for table, items in sorted(snapshot["tables"].items())
+                    for name, stats in items.items()]
+            rows += [("(база)", name, stats) for name, stats in snapshot["database"].items()]
+            for table, name, stats in rows:
+                values = {"table": table, "operation": name, **stats}
+                operations.insert("", "end", values=[values.get(column, "") for column, _ in STATS_COLUMNS])
+            for entry in reversed(snapshot["slow_queries"]):
+                slow.insert(tk.END, f"{entry['time']}  {entry['ms']:.1f} мс  {entry['operation']} {entry['table'] or ''}"
+                                    f"  {entry['detail'] or ''}  записей: {entry['rows']}, просмотрено: {entry['scanned']}")
 
     def create_table(self):
         """Создаем новую таблицу"""
@@ -161,15 +533,24 @@ class DBInterface:
             col_name = simpledialog.askstring("Схема таблицы", "Введите имя столбца (или оставьте пустым для завершения):")
             if not col_name:
                 break
-            col_type = simpledialog.askstring("Схема таблицы", f"Введите тип данных для '{col_name}' (int, str, float):")
-            if col_type not in ["int", "str", "float"]:
+            col_type = simpledialog.askstring(
+                "Схема таблицы", f"Введите тип данных для '{col_name}' (int, str, float, bool, date; '?' в конце — допускается пусто):")
+            try:
+                parse_type(col_type or "")
+            except ValueError:
                 messagebox.showwarning("Предупреждение", "Некорректный тип данных! Повторите ввод.")
                 continue
             schema[col_name] = col_type
 
         if schema:
+            primary_key = simpledialog.askstring(
+                "Схема таблицы", f"Первичный ключ (один из: {', '.join(schema)}; оставьте пустым, если не нужен):")
+            partitioning = simpledialog.askstring(
+                "Схема таблицы", "Секционирование: 'hash столбец число_секций' или 'range столбец граница1, граница2, ...'"
+                                 " (оставьте пустым, если не нужно):")
             try:
-                self.db.create_table(table_name, schema)
+                partition_by = parse_partitioning(partitioning) if partitioning else None
+                self.db.create_table(table_name, schema, primary_key=primary_key or None, partition_by=partition_by)
                 messagebox.showinfo("Успех", f"Таблица '{table_name}' успешно создана!")
             except ValueError as e:
                 messagebox.showerror("Ошибка", str(e))
@@ -191,24 +572,19 @@ class DBInterface:
             messagebox.showerror("Ошибка", str(e))
             return
 
-        record = {}
+        values = {}
         for col, col_type in table.schema.items():
-            value = simpledialog.askstring("Добавить запись", f"Введите значение для '{col}' ({col_type}):")
-            if col_type == "int":
-                value = int(value)
-            elif col_type == "float":
-                value = float(value)
-            record[col] = value
+            values[col] = simpledialog.askstring("Добавить запись", f"Введите значение для '{col}' ({col_type}):")
 
         try:
-            table.insert(record)
+            table.insert({col: table.types.parse(col, value) for col, value in values.items()})
             messagebox.showinfo("Успех", f"Запись успешно добавлена в таблицу '{table_name}'!")
         except ValueError as e:
             messagebox.showerror("Ошибка", str(e))
         self.update_view()
 
     def export_database(self):
-        """Экспортирует базу данных в выбранный формат"""
+        """Экспортирует базу данных в выбранный формат (в фоне)"""
         if not self.db:
             messagebox.showwarning("Предупреждение", "Сначала создайте или загрузите базу данных!")
             return
@@ -223,23 +599,29 @@ class DBInterface:
         if not file_path:
             return
 
-        try:
-            if file_path.endswith(".xml"):
-                self.db.save_database_to_xml(file_path)
-            elif file_path.endswith(".xlsx"):
-                self.db.save_database_to_excel(file_path)
-            elif os.path.isdir(file_path) or not os.path.splitext(file_path)[1]:
-                # Если путь указывает на каталог или формат не задан
-                self.db.save_database_to_csv(file_path)
-            else:
-                raise ValueError("Неподдерживаемый формат файла!")
+        db = self.db
+        if file_path.endswith(".xml"):
+            export = db.save_database_to_xml
+        elif file_path.endswith(".xlsx"):
+            export = db.save_database_to_excel
+        elif os.path.isdir(file_path) or not os.path.splitext(file_path)[1]:
+            # Если путь указывает на каталог или формат не задан
+            export = db.save_database_to_csv
+        else:
+            messagebox.showerror("Ошибка", "Не удалось экспортировать базу данных: Неподдерживаемый формат файла!")
+            return
 
-            messagebox.showinfo("Успех", "База данных успешно экспортирована!")
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось экспортировать базу данных: {e}")
+        self.start_job(f"Экспорт в '{file_path}'",
+                       lambda progress: export(file_path, progress=progress),
+                       lambda result: messagebox.showinfo("Успех", "База данных успешно экспортирована!"),
+                       total=self.total_rows())
 
     def import_database(self):
-        """Импортирует базу данных из выбранного формата"""
+        """Импортирует базу данных из выбранного формата (в фоне)"""
+        if not self.db:
+            messagebox.showwarning("Предупреждение", "Сначала создайте или загрузите базу данных!")
+            return
+
         file_path = filedialog.askopenfilename(filetypes=[
             ("CSV файлы (каталог)", ""),
             ("XML файлы", "*.xml"),
@@ -250,20 +632,23 @@ class DBInterface:
         if not file_path:
             return
 
-        try:
-            if file_path.endswith(".xml"):
-                self.db.load_database_from_xml(file_path)
-            elif file_path.endswith(".xlsx"):
-                self.db.load_database_from_excel(file_path)
-            elif os.path.isdir(file_path) or not os.path.splitext(file_path)[1]:
-                self.db.load_database_from_csv(file_path)
-            else:
-                raise ValueError("Неподдерживаемый формат файла!")
+        db = self.db
+        if file_path.endswith(".xml"):
+            load = db.load_database_from_xml
+        elif file_path.endswith(".xlsx"):
+            load = db.load_database_from_excel
+        elif os.path.isdir(file_path) or not os.path.splitext(file_path)[1]:
+            load = db.load_database_from_csv
+        else:
+            messagebox.showerror("Ошибка", "Не удалось импортировать базу данных: Неподдерживаемый формат файла!")
+            return
 
+        def done(result):
             messagebox.showinfo("Успех", "База данных успешно импортирована!")
             self.update_view()
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось импортировать базу данных: {e}")
+
+        # Отмена прерывает импорт после текущего пакета; загруженные записи остаются в таблицах
+        self.start_job(f"Импорт из '{file_path}'", lambda progress: load(file_path, progress=progress), done)
 
     def update_record(self):
         """Обновить запись"""
@@ -274,22 +659,29 @@ class DBInterface:
         table_name = self.history[-1]
         table = self.db.get_table(table_name)
 
-        selected_item = self.tree_view.selection()
-        if not selected_item:
+        key = self.selected_key()
+        if key is None:
             messagebox.showwarning("Предупреждение", "Выберите запись для обновления!")
             return
 
-        record_values = self.tree_view.item(selected_item)["values"]
         columns = list(table.schema.keys())
-        original_record = {columns[i]: record_values[i] for i in range(len(columns))}
-
         updates = {}
         for column in columns:
             new_value = simpledialog.askstring("Обновить запись", f"Новое значение для '{column}' (оставьте пустым для пропуска):")
             if new_value:
-                updates[column] = eval(table.schema[column])(new_value)
+                updates[column] = new_value
 
-        table.update(lambda r: r == original_record, updates)
+        try:
+            # Введенные строки приводятся к типам столбцов скомпилированной схемой таблицы
+            updates = {column: table.types.parse(column, value) for column, value in updates.items()}
+            # Запись находится по первичному ключу или row id, без просмотра таблицы
+            if table.primary_key:
+                table.update_by_pk(key, updates)
+            else:
+                table.update_row(key, updates)
+        except ValueError as e:
+            messagebox.showerror("Ошибка", str(e))
+            return
         messagebox.showinfo("Успех", "Запись обновлена!")
         self.update_view()
 
@@ -302,16 +694,21 @@ class DBInterface:
         table_name = self.history[-1]
         table = self.db.get_table(table_name)
 
-        selected_item = self.tree_view.selection()
-        if not selected_item:
+        key = self.selected_key()
+        if key is None:
             messagebox.showwarning("Предупреждение", "Выберите запись для удаления!")
             return
 
-        record_values = self.tree_view.item(selected_item)["values"]
-        columns = list(table.schema.keys())
-        record_to_delete = {columns[i]: record_values[i] for i in range(len(columns))}
-
-        table.delete(lambda r: r == record_to_delete)
+        try:
+            if table.primary_key:
+                table.delete_by_pk(key)
+            else:
+                table.delete_row(key)
+        except ValueError as e:
+            # Запись уже удалена (например, другим клиентом): row id ни на что не указывает
+            messagebox.showerror("Ошибка", str(e))
+            self.update_view()
+            return
         messagebox.showinfo("Успех", "Запись удалена!")
         self.update_view()
 
@@ -324,17 +721,12 @@ class DBInterface:
         table_name = self.history[-1]
         table = self.db.get_table(table_name)
 
-        condition = simpledialog.askstring("Фильтрация", "Введите условие для фильтрации (пример: age > 30):")
+        condition = simpledialog.askstring("Фильтрация", "Введите условие для фильтрации (пример: age > 30 and name like 'A%'):")
         if not condition:
             return
 
-        try:
-            result = table.select(condition=lambda r: eval(condition, {}, r))
-            self.tree_view.delete(*self.tree_view.get_children())
-            for record in result:
-                self.tree_view.insert("", "end", values=[record[col] for col in table.schema.keys()])
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось выполнить фильтрацию: {e}")
+        # Условие разбирается и компилируется один раз, а не вычисляется eval для каждой записи
+        self.load_rows(table, condition=condition)
 
     def sort_records(self):
         """Сортировка записей в таблице"""
@@ -352,13 +744,8 @@ class DBInterface:
 
         ascending = messagebox.askyesno("Порядок сортировки", "Сортировать по возрастанию?")
 
-        try:
-            result = table.select(order_by=order_by, ascending=ascending)
-            self.tree_view.delete(*self.tree_view.get_children())
-            for record in result:
-                self.tree_view.insert("", "end", values=[record[col] for col in table.schema.keys()])
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось выполнить сортировку: {e}")
+        # Сортируется результат текущего фильтра
+        self.load_rows(table, condition=self.query[0], order_by=order_by, ascending=ascending)
 
     def create_report_interface(self):
         """
@@ -380,18 +767,23 @@ class DBInterface:
         columns_input = simpledialog.askstring("Выбор столбцов", f"Введите столбцы для отчета через запятую (или оставьте пустым для всех):")
         selected_columns = columns_input.split(",") if columns_input else None  # Если пусто - выбираем все столбцы
 
-        format_input = simpledialog.askstring("Выбор формата", "Введите формат отчета (csv или txt):").strip().lower()
-        filename = simpledialog.askstring("Имя файла", "Введите имя файла для сохранения отчета (с расширением):").strip()
+        format_input = (simpledialog.askstring("Выбор формата", "Введите формат отчета (csv, txt, jsonl или xlsx):") or "").strip().lower()
+        filename = (simpledialog.askstring("Имя файла", "Введите имя файла для сохранения отчета (с расширением):") or "").strip()
 
-        if format_input not in ["csv", "txt"]:
+        if format_input not in REPORT_FORMATS:
             messagebox.showwarning("Ошибка", "Неверный формат отчета!")
             return
+        if not filename:
+            return
 
-        try:
-            table.generate_report(filename, columns=selected_columns, format=format_input)
-            messagebox.showinfo("Успех", f"Отчет успешно создан: {os.path.abspath(filename)}")
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось создать отчет: {str(e)}")
+        # В отчет попадают записи текущего вида: с тем же фильтром и сортировкой
+        condition, order_by, ascending = self.query
+        self.start_job(f"Отчет '{filename}'",
+                       lambda progress: table.generate_report(filename, columns=selected_columns, format=format_input,
+                                                              condition=condition, order_by=order_by,
+                                                              ascending=ascending, progress=progress),
+                       lambda rows: messagebox.showinfo("Успех", f"Отчет успешно создан ({rows} строк): {os.path.abspath(filename)}"),
+                       total=table.count() if condition is None else None)
 
 
 if __name__ == "__main__":
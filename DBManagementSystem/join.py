@@ -0,0 +1,112 @@
+"""
+Соединение таблиц: хеш-соединение и соединение слиянием.
+
+Обе стратегии — генераторы: результат выдается по мере просмотра и не собирается
+целиком в памяти. Хеш-соединение держит в памяти только таблицу сборки (одну сторону),
+соединение слиянием — группу записей правой стороны с одинаковым ключом.
+Значения None в ключе не равны ничему (как NULL в SQL).
+"""
+import itertools
+import operator
+
+JOIN_TYPES = ("inner", "left")
+JOIN_STRATEGIES = ("auto", "hash", "merge")
+
+
+def normalize_on(on, left_schema, right_schema):
+    """
+    Разбирает условие соединения.
+    :param on: Столбец с одинаковым именем в обеих таблицах ("id"), пара (левый, правый)
+               или список таких элементов для составного ключа.
+    :return: (столбцы левой таблицы, столбцы правой таблицы).
+    """
+    items = on if isinstance(on, list) else [on]
+    if not items:
+        raise ValueError("Не заданы столбцы соединения.")
+    left_columns, right_columns = [], []
+    for item in items:
+        left_col, right_col = (item, item) if isinstance(item, str) else item
+        if left_col not in left_schema:
+            raise ValueError(f"Столбец '{left_col}' не существует.")
+        if right_col not in right_schema:
+            raise ValueError(f"Столбец '{right_col}' не существует.")
+        left_columns.append(left_col)
+        right_columns.append(right_col)
+    return left_columns, right_columns
+
+
+def key_function(columns):
+    """Функция ключа записи: значение столбца или кортеж значений для составного ключа."""
+    return operator.itemgetter(*columns)
+
+
+def null_check(columns):
+    """Функция, проверяющая, есть ли None в ключе записи."""
+    if len(columns) == 1:
+        col = columns[0]
+        return lambda record: record[col] is None
+    return lambda record: any(record[col] is None for col in columns)
+
+
+def combiner(left_schema, right_schema, right_name, skip=()):
+    """
+    Функция, собирающая запись результата из левой и правой записи.
+    Столбцы правой таблицы, совпадающие по имени с левыми, получают префикс "таблица.";
+    столбцы из skip (ключи с тем же именем, что и в левой таблице) не повторяются.
+    Для левого соединения без пары правые столбцы равны None.
+    :return: (функция combine(left, right), список столбцов результата).
+    """
+    left_columns = list(left_schema)
+    right_columns = [col for col in right_schema if col not in skip]
+    output = [f"{right_name}.{col}" if col in left_schema else col for col in right_columns]
+    pairs = list(zip(output, right_columns))
+    empty = dict.fromkeys(output)
+
+    def combine(left, right):
+        row = {col: left[col] for col in left_columns}
+        if right is None:
+            row.update(empty)
+        else:
+            for name, col in pairs:
+                row[name] = right[col]
+        return row
+
+    return combine, left_columns + output
+
+
+def hash_join(probe, build, probe_key, build_key, probe_null, build_null, combine, how="inner", build_left=False):
+    """
+    Хеш-соединение: по записям build строится таблица {ключ: [записи]}, затем записи
+    probe просматриваются потоком и ищутся в ней за O(1).
+    :param build_left: Таблица сборки — левая сторона (только для inner): combine получает
+                       записи в порядке (левая, правая).
+    """
+    table = {}
+    for record in build:
+        if not build_null(record):
+            table.setdefault(build_key(record), []).append(record)
+    for record in probe:
+        matches = None if probe_null(record) else table.get(probe_key(record))
+        if matches:
+            for match in matches:
+                yield combine(match, record) if build_left else combine(record, match)
+        elif how == "left":
+            yield combine(record, None)
+
+
+def merge_join(left, right, left_key, right_key, combine, how="inner"):
+    """
+    Соединение слиянием двух потоков, упорядоченных по ключу соединения (без None в ключах).
+    Каждая сторона просматривается один раз; в памяти — только текущая группа правой стороны.
+    """
+    groups = ((key, list(group)) for key, group in itertools.groupby(right, key=right_key))
+    current = next(groups, None)
+    for record in left:
+        key = left_key(record)
+        while current is not None and current[0] < key:
+            current = next(groups, None)
+        if current is not None and current[0] == key:
+            for match in current[1]:
+                yield combine(record, match)
+        elif how == "left":
+            yield combine(record, None)
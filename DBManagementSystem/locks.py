@@ -0,0 +1,76 @@
+import threading
+from contextlib import contextmanager
+
+
+class ReadWriteLock:
+    """
+    Блокировка «много читателей / один писатель».
+    Ожидающий писатель получает приоритет над новыми читателями, чтобы
+    поток чтений не мог бесконечно откладывать изменения. Писатель может
+    повторно захватывать блокировку на запись и брать ее на чтение.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0  # Число активных читателей
+        self._writer = None  # Идентификатор потока-писателя
+        self._write_depth = 0  # Глубина повторного захвата на запись
+        self._waiting_writers = 0
+
+    def acquire_read(self):
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer == me:
+                # Писатель читает внутри своей же операции
+                self._write_depth += 1
+                return
+            while self._writer is not None or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._condition:
+            if self._writer == threading.get_ident():
+                self._write_depth -= 1
+                return
+            self._readers -= 1
+            if not self._readers:
+                self._condition.notify_all()
+
+    def acquire_write(self):
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer == me:
+                self._write_depth += 1
+                return
+            self._waiting_writers += 1
+            while self._writer is not None or self._readers:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writer = me
+            self._write_depth = 1
+
+    def release_write(self):
+        with self._condition:
+            self._write_depth -= 1
+            if not self._write_depth:
+                self._writer = None
+                self._condition.notify_all()
+
+    @contextmanager
+    def read(self):
+        """Захватывает блокировку на чтение: with lock.read(): ..."""
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        """Захватывает блокировку на запись: with lock.write(): ..."""
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
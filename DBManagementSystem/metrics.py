@@ -0,0 +1,248 @@
+"""
+Метрики операций базы данных: счетчики, гистограммы задержек и журнал медленных запросов.
+
+Сбор включается явно (Database.enable_metrics). Пока он выключен, у таблиц и базы
+metrics равно None, и обертка операции (см. timed) только проверяет это поле —
+время не замеряется и ничего не записывается.
+"""
+import collections
+import datetime
+import functools
+import logging
+import math
+import threading
+import time
+
+from query import as_expr
+
+# Верхние границы интервалов гистограммы задержек (секунды): от 10 мкс, каждая вдвое больше предыдущей
+LATENCY_BOUNDS = [0.00001 * 2 ** i for i in range(24)]
+SLOW_QUERY_MS = 100  # Порог медленного запроса по умолчанию (мс)
+SLOW_LOG_SIZE = 100  # Сколько последних медленных запросов хранится
+# Операции, которые попадают в журнал медленных запросов
+QUERY_OPERATIONS = ("select", "update", "delete", "aggregate")
+
+logger = logging.getLogger("SimpleDB")
+
+
+class LatencyHistogram:
+    """Гистограмма задержек с логарифмическими интервалами (фиксированный объем памяти)."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BOUNDS) + 1)  # Последний интервал — все, что больше границ
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        scaled = seconds / LATENCY_BOUNDS[0]
+        if scaled <= 1:
+            bucket = 0
+        else:
+            # Наименьшее i, при котором scaled <= 2 ** i
+            mantissa, exponent = math.frexp(scaled)
+            bucket = min(exponent - (mantissa == 0.5), len(LATENCY_BOUNDS))
+        self.buckets[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction):
+        """Оценка перцентиля: верхняя граница интервала, в который он попадает (не больше максимума)."""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank and count:
+                return min(LATENCY_BOUNDS[bucket], self.max) if bucket < len(LATENCY_BOUNDS) else self.max
+        return self.max
+
+
+class OperationStats:
+    """Счетчики одной операции одной таблицы."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0  # Записей обработано (вставлено, изменено, возвращено)
+        self.scanned = 0  # Записей просмотрено (для выборок)
+        self.latency = LatencyHistogram()
+
+    def describe(self):
+        latency = self.latency
+        milliseconds = lambda seconds: None if seconds is None else round(seconds * 1000, 3)
+        result = {
+            "calls": self.calls,
+            "errors": self.errors,
+            "rows": self.rows,
+            "total_ms": milliseconds(latency.total),
+            "mean_ms": milliseconds(latency.total / latency.count) if latency.count else None,
+            "p50_ms": milliseconds(latency.percentile(0.5)),
+            "p99_ms": milliseconds(latency.percentile(0.99)),
+            "max_ms": milliseconds(latency.max),
+        }
+        if self.scanned:
+            result["scanned"] = self.scanned
+            # Сколько записей просматривается на одну возвращенную: большие значения — кандидаты на индекс
+            result["scanned_per_row"] = round(self.scanned / self.rows, 2) if self.rows else None
+        return result
+
+
+class QueryTrace:
+    """Сведения о выполнении одного запроса, которые заполняет Table._iter_select."""
+    __slots__ = ("scanned",)
+
+    def __init__(self):
+        self.scanned = 0
+
+
+class Metrics:
+    """
+    Метрики базы данных: по каждой паре (таблица, операция) — число вызовов, ошибок,
+    обработанных и просмотренных записей и гистограмма задержек; журнал медленных запросов.
+    Один объект разделяется базой и всеми ее таблицами.
+    """
+
+    def __init__(self, slow_query_ms=SLOW_QUERY_MS, slow_log_size=SLOW_LOG_SIZE):
+        """
+        :param slow_query_ms: Запросы дольше порога (мс) записываются в журнал медленных запросов
+                              и в logging (логгер "SimpleDB", уровень WARNING); None — не записывать.
+        :param slow_log_size: Сколько последних медленных запросов хранить.
+        """
+        self.slow_query_ms = slow_query_ms
+        self.operations = {}  # {(таблица или None для операций базы, операция): OperationStats}
+        self.slow_queries = collections.deque(maxlen=slow_log_size)
+        self.started = time.time()
+        self.lock = threading.Lock()
+
+    def record(self, table, operation, seconds, rows=0, scanned=0, error=False, detail=None):
+        """
+        Записывает выполнение операции.
+        :param table: Название таблицы или None для операций всей базы (сохранение, загрузка, экспорт).
+        :param detail: Описание запроса (условие) для журнала медленных запросов.
+        """
+        with self.lock:
+            stats = self.operations.get((table, operation))
+            if stats is None:
+                stats = self.operations[(table, operation)] = OperationStats()
+            stats.calls += 1
+            stats.errors += error
+            stats.rows += rows
+            stats.scanned += scanned
+            stats.latency.add(seconds)
+            slow = (self.slow_query_ms is not None and operation in QUERY_OPERATIONS
+                    and seconds * 1000 >= self.slow_query_ms)
+            if slow:
+                entry = {
+                    "time": datetime.datetime.now().isoformat(timespec="milliseconds"),
+                    "table": table,
+                    "operation": operation,
+                    "detail": detail,
+                    "ms": round(seconds * 1000, 3),
+                    "rows": rows,
+                    "scanned": scanned,
+                }
+                self.slow_queries.append(entry)
+        if slow:
+            logger.warning("Медленный запрос (%.1f мс): %s %s %s, записей %d, просмотрено %d",
+                           seconds * 1000, operation, table, detail or "", rows, scanned)
+
+    def snapshot(self):
+        """
+        Снимок метрик.
+        :return: {"uptime_s", "slow_query_ms", "operations": {операция: итог по всем таблицам},
+                  "tables": {таблица: {операция: ...}}, "database": {операция: ...}, "slow_queries": [...]}.
+        """
+        with self.lock:
+            items = [(key, self._copy(stats)) for key, stats in self.operations.items()]
+            slow_queries = list(self.slow_queries)
+        totals, tables, database = {}, {}, {}
+        for (table, operation), stats in items:
+            if table is None:
+                database[operation] = stats.describe()
+            else:
+                tables.setdefault(table, {})[operation] = stats.describe()
+            total = totals.setdefault(operation, OperationStats())
+            total.calls += stats.calls
+            total.errors += stats.errors
+            total.rows += stats.rows
+            total.scanned += stats.scanned
+            merged = total.latency
+            merged.buckets = [a + b for a, b in zip(merged.buckets, stats.latency.buckets)]
+            merged.count += stats.latency.count
+            merged.total += stats.latency.total
+            merged.max = max(merged.max, stats.latency.max)
+        return {
+            "uptime_s": round(time.time() - self.started, 1),
+            "slow_query_ms": self.slow_query_ms,
+            "operations": {operation: stats.describe() for operation, stats in totals.items()},
+            "tables": tables,
+            "database": database,
+            "slow_queries": slow_queries,
+        }
+
+    @staticmethod
+    def _copy(stats):
+        copy = OperationStats()
+        copy.calls, copy.errors, copy.rows, copy.scanned = stats.calls, stats.errors, stats.rows, stats.scanned
+        copy.latency.buckets = list(stats.latency.buckets)
+        copy.latency.count, copy.latency.total, copy.latency.max = (stats.latency.count, stats.latency.total,
+                                                                    stats.latency.max)
+        return copy
+
+    def reset(self):
+        """Обнуляет счетчики и журнал медленных запросов."""
+        with self.lock:
+            self.operations = {}
+            self.slow_queries.clear()
+            self.started = time.time()
+
+
+def describe_condition(condition):
+    """Текст условия запроса для журнала медленных запросов."""
+    if condition is None:
+        return None
+    expr = as_expr(condition)
+    return "<функция>" if expr is None else expr.to_string()
+
+
+def timed(operation, rows=None, table=True, condition=None):
+    """
+    Декоратор метода Table или Database, записывающий операцию в self.metrics.
+    :param rows: Число обработанных записей за вызов; по умолчанию — результат метода,
+                 если это int, или длина результата-списка.
+    :param table: Операция таблицы (записывается под self.name) или всей базы (под None).
+    :param condition: Номер позиционного аргумента condition метода (для журнала медленных запросов).
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            metrics = self.metrics
+            if metrics is None:
+                return method(self, *args, **kwargs)
+            start = time.perf_counter()
+            try:
+                result = method(self, *args, **kwargs)
+            except Exception:
+                metrics.record(self.name if table else None, operation, time.perf_counter() - start, error=True)
+                raise
+            elapsed = time.perf_counter() - start
+            if rows is not None:
+                count = rows
+            elif type(result) is int:
+                count = result
+            else:
+                count = len(result) if isinstance(result, list) else 0
+            detail = None
+            if condition is not None:
+                try:
+                    detail = describe_condition(args[condition] if len(args) > condition else kwargs.get("condition"))
+                except ValueError:
+                    detail = None
+            metrics.record(self.name if table else None, operation, elapsed, count, detail=detail)
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,202 @@
+"""
+Секционирование таблиц: распределение записей по секциям и отсечение секций по условию запроса.
+
+Таблица делится по значению одного столбца (см. Database.create_table, partition_by):
+    ("hash", "столбец", число секций) — номер секции — устойчивый хеш значения по модулю числа секций
+        (не зависит от запуска: числа и даты хешируются по значению, строки — crc32);
+    ("range", "столбец", [границы]) — секция i содержит значения от границы i - 1 включительно
+        до границы i не включительно: значения меньше первой границы попадают в секцию 0,
+        не меньше последней — в последнюю секцию.
+Пустые значения (None) всегда попадают в секцию 0.
+
+По условию запроса определяется, в каких секциях могут быть подходящие записи:
+равенство и IN по столбцу секционирования оставляют по одной секции на значение,
+диапазоны (<, <=, >, >=, BETWEEN) при секционировании по диапазонам — секции,
+пересекающиеся с диапазоном. Остальные условия просматривают все секции.
+"""
+import bisect
+import datetime
+import zlib
+
+from query import And, Between, Col, Comparison, In, Or
+
+PARTITION_KINDS = ("hash", "range")
+MAX_PARTITIONS = 1024
+PARTITION_WORKERS = 4  # Потоков для параллельного просмотра секций
+PARALLEL_MIN_ROWS = 10000  # Секции меньшего суммарного размера просматриваются по очереди
+# Row id записи секционированной таблицы: номер секции << PARTITION_ROW_BITS | row id в секции
+# (в изменениях и журнале — позиция в секции)
+PARTITION_ROW_BITS = 40
+
+
+def stable_hash(value):
+    """Хеш значения, одинаковый во всех процессах (встроенный hash строк зависит от PYTHONHASHSEED)."""
+    if value is None:
+        return 0
+    if isinstance(value, int):
+        return int(value)
+    if isinstance(value, float):
+        # Равные значения int и float (1 и 1.0) попадают в одну секцию
+        return int(value) if value.is_integer() else zlib.crc32(repr(value).encode("ascii"))
+    if isinstance(value, datetime.date):
+        return value.toordinal()
+    return zlib.crc32(str(value).encode("utf-8"))
+
+
+class Partitioning:
+    """Способ секционирования: номер секции по значению столбца и отсечение секций по условию."""
+    kind = None
+
+    def __init__(self, column, count):
+        self.column = column
+        self.count = count  # Число секций
+
+    def partition_of(self, value):
+        """Номер секции для значения столбца секционирования."""
+        raise NotImplementedError
+
+    def describe(self):
+        """Описание для каталога, журнала и create_table: [вид, столбец, параметр]."""
+        raise NotImplementedError
+
+    def prune(self, expr):
+        """
+        Номера секций, в которых могут быть записи, удовлетворяющие условию.
+        :param expr: query.Expr или None (условия нет или это лямбда-функция).
+        :return: Список номеров секций по возрастанию.
+        """
+        numbers = None if expr is None else self._matching(expr)
+        return list(range(self.count)) if numbers is None else sorted(numbers)
+
+    def _matching(self, expr):
+        """Множество секций для выражения или None, если отсечь секции нельзя."""
+        if isinstance(expr, And):
+            result = None
+            for item in expr.items:
+                numbers = self._matching(item)
+                if numbers is not None:
+                    result = numbers if result is None else result & numbers
+            return result
+        if isinstance(expr, Or):
+            result = set()
+            for item in expr.items:
+                numbers = self._matching(item)
+                if numbers is None:
+                    return None
+                result |= numbers
+            return result
+        if getattr(expr, "column", None) != self.column:
+            return None
+        try:
+            if isinstance(expr, Comparison) and not isinstance(expr.value, Col):
+                return self._compare(expr.op, expr.value)
+            if isinstance(expr, In):
+                return {self.partition_of(value) for value in expr.values}
+            if isinstance(expr, Between):
+                return self._between(expr.low, expr.high)
+        except TypeError:
+            return None  # Значение несравнимо с границами секций
+        return None
+
+    def _compare(self, op, value):
+        return {self.partition_of(value)} if op == "==" else None
+
+    def _between(self, low, high):
+        return None
+
+
+class HashPartitioning(Partitioning):
+    """Секционирование по хешу значения: записи распределяются по секциям равномерно."""
+    kind = "hash"
+
+    def partition_of(self, value):
+        return stable_hash(value) % self.count
+
+    def describe(self):
+        return [self.kind, self.column, self.count]
+
+
+class RangePartitioning(Partitioning):
+    """Секционирование по диапазонам значений: запросы по диапазону просматривают только свои секции."""
+    kind = "range"
+
+    def __init__(self, column, bounds):
+        super().__init__(column, len(bounds) + 1)
+        self.bounds = bounds  # Возрастающие границы секций
+
+    def partition_of(self, value):
+        return 0 if value is None else bisect.bisect_right(self.bounds, value)
+
+    def describe(self):
+        return [self.kind, self.column, list(self.bounds)]
+
+    def _compare(self, op, value):
+        if value is None or op in ("==", "!="):
+            return super()._compare(op, value)
+        if op == "<":
+            # Секция i содержит значения не меньше границы i - 1
+            return set(range(bisect.bisect_left(self.bounds, value) + 1))
+        if op == "<=":
+            return set(range(self.partition_of(value) + 1))
+        # > и >=: значения секции i меньше границы i
+        return set(range(self.partition_of(value), self.count))
+
+    def _between(self, low, high):
+        if low is None or high is None:
+            return None
+        if high < low:
+            return set()
+        return set(range(self.partition_of(low), self.partition_of(high) + 1))
+
+
+def make_partitioning(partition_by, types):
+    """
+    Создает способ секционирования по описанию.
+    :param partition_by: ("hash", "столбец", число секций) или ("range", "столбец", [границы]).
+    :param types: Скомпилированная схема таблицы (schema.CompiledSchema): границы диапазонов
+                  приводятся к типу столбца (строки разбираются, как ввод пользователя).
+    :return: HashPartitioning или RangePartitioning.
+    """
+    try:
+        kind, column, argument = partition_by
+    except (TypeError, ValueError):
+        raise ValueError("Секционирование задается как (\"hash\", столбец, число секций) "
+                         "или (\"range\", столбец, [границы]).") from None
+    if kind not in PARTITION_KINDS:
+        raise ValueError(f"Неизвестный способ секционирования '{kind}'.")
+    if column not in types.by_name:
+        raise ValueError(f"Столбец '{column}' не существует.")
+    if kind == "hash":
+        if type(argument) is not int or not 1 <= argument <= MAX_PARTITIONS:
+            raise ValueError(f"Число секций должно быть целым от 1 до {MAX_PARTITIONS}.")
+        return HashPartitioning(column, argument)
+    if isinstance(argument, (str, bytes)) or not hasattr(argument, "__iter__"):
+        raise ValueError("Границы секций задаются списком значений.")
+    bounds = [types.parse(column, bound) for bound in argument]
+    if not bounds or len(bounds) >= MAX_PARTITIONS:
+        raise ValueError(f"Число границ секций должно быть от 1 до {MAX_PARTITIONS - 1}.")
+    if any(bound is None for bound in bounds):
+        raise ValueError("Граница секции не может быть пустой.")
+    if any(low >= high for low, high in zip(bounds, bounds[1:])):
+        raise ValueError("Границы секций должны строго возрастать.")
+    return RangePartitioning(column, bounds)
+
+
+def parse_partitioning(text):
+    """
+    Разбирает секционирование, введенное пользователем: "hash столбец число_секций"
+    или "range столбец граница1, граница2, ..." (границы приводятся к типу столбца в make_partitioning).
+    :return: Описание для create_table (partition_by).
+    """
+    parts = text.split(None, 2)
+    if len(parts) != 3:
+        raise ValueError("Секционирование задается как 'hash столбец число_секций' "
+                         "или 'range столбец граница1, граница2, ...'.")
+    kind, column, argument = parts
+    kind = kind.lower()
+    if kind == "hash":
+        try:
+            return kind, column, int(argument)
+        except ValueError:
+            raise ValueError(f"Число секций должно быть целым от 1 до {MAX_PARTITIONS}.") from None
+    return kind, column, [bound.strip() for bound in argument.split(",")]
@@ -0,0 +1,374 @@
+"""
+Статистика столбцов и оценка стоимости планов запросов.
+
+Для каждого столбца таблицы хранится число пустых значений, число различных значений,
+минимум и максимум, частоты значений (для столбцов с небольшим числом различных значений)
+и гистограмма равной глубины. Статистика собирается при первом планировании запроса
+по выборке записей, затем поддерживается вставками, обновлениями и удалениями;
+когда изменений накопилось много, она пересобирается.
+
+По статистике оценивается доля записей, удовлетворяющих условию (селективность),
+и по ней выбирается способ доступа: полный просмотр, индекс или обход упорядоченного индекса.
+"""
+import bisect
+import datetime
+import math
+import random
+from collections import Counter
+
+SAMPLE_SIZE = 30000  # Записей в выборке для гистограмм и оценки числа различных значений
+HISTOGRAM_BUCKETS = 32
+FREQUENCY_LIMIT = 200  # До скольких различных значений столбца частоты считаются точно
+STALE_RATIO = 0.2  # Статистика пересобирается, когда изменилась такая доля записей
+STALE_MIN_ROWS = 1000
+
+# Стоимость обработки одной записи в условных единицах: проверка записи при полном просмотре = 1.
+# Соотношения замерены на построчной таблице из 1 млн записей.
+SCAN_ROW_COST = 1.0
+COLUMNAR_ROW_COST = 0.5  # Фильтрация по типизированному столбцу
+INDEX_ROW_COST = 3.5  # Запись-кандидат из индекса: множество позиций, их сортировка и проверка записи
+ORDERED_ROW_COST = 3.0  # Запись при обходе упорядоченного индекса (произвольный доступ и проверка)
+SORT_ROW_COST = 0.09  # Сортировка: на n * log2(n)
+HEAP_ROW_COST = 0.7  # Отбор первых k записей кучей
+HASH_BUILD_COST = 8.0  # Запись в хеш-таблице соединения
+HASH_PROBE_COST = 1.2  # Поиск записи в хеш-таблице соединения
+
+# Селективность условий, которые нельзя оценить по статистике
+DEFAULT_EQUALITY = 0.005
+DEFAULT_RANGE = 1 / 3
+DEFAULT_LIKE = 0.1
+
+
+def _numeric(value):
+    """Числовое представление значения для интерполяции внутри интервала гистограммы."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, datetime.date):
+        return value.toordinal()
+    return None
+
+
+class ColumnStats:
+    """Статистика одного столбца."""
+
+    def __init__(self, values):
+        """
+        :param values: Значения столбца во всех (неудаленных) записях таблицы, включая None.
+        """
+        self.nonnull = len(values) - values.count(None)  # Непустых значений в таблице
+        self.frequencies = None  # {значение: число записей} или None, если значений много
+        self.histogram = []  # Границы интервалов равной глубины (по выборке)
+        self.minimum = self.maximum = None
+        self.distinct_ratio = 1.0  # Доля различных значений среди непустых
+        sample = values if len(values) <= SAMPLE_SIZE else random.sample(values, SAMPLE_SIZE)
+        sample = [value for value in sample if value is not None]
+        if not sample:
+            return
+        try:
+            ordered = sorted(sample)
+        except TypeError:
+            ordered = None  # Значения несравнимы: без гистограммы и границ
+        if ordered is not None:
+            self.minimum, self.maximum = ordered[0], ordered[-1]
+            step = max(1, len(ordered) // HISTOGRAM_BUCKETS)
+            self.histogram = ordered[::step] + [ordered[-1]]
+        counts = Counter(sample)
+        if len(counts) <= FREQUENCY_LIMIT:
+            # Различных значений мало: точные частоты по всей таблице
+            frequencies = Counter(values)
+            frequencies.pop(None, None)
+            if len(frequencies) <= FREQUENCY_LIMIT:
+                self.frequencies = dict(frequencies)
+                self.distinct_ratio = len(frequencies) / self.nonnull
+                return
+        # Оценка числа различных значений по выборке (Haas–Stokes, Duj1)
+        n, d = len(sample), len(counts)
+        singles = sum(1 for count in counts.values() if count == 1)
+        distinct = d if n >= self.nonnull else n * d / (n - singles + singles * n / self.nonnull)
+        self.distinct_ratio = min(1.0, max(1.0, distinct) / self.nonnull)
+
+    def distinct(self):
+        """Оценка числа различных непустых значений."""
+        if self.frequencies is not None:
+            return len(self.frequencies)
+        return max(1, round(self.distinct_ratio * self.nonnull))
+
+    def add(self, value):
+        if value is None:
+            return
+        self.nonnull += 1
+        frequencies = self.frequencies
+        if frequencies is not None:
+            frequencies[value] = frequencies.get(value, 0) + 1
+            if len(frequencies) > FREQUENCY_LIMIT:
+                # Значений стало много: дальше только доля различных значений
+                self.distinct_ratio = len(frequencies) / self.nonnull
+                self.frequencies = None
+        try:
+            if self.minimum is None or value < self.minimum:
+                self.minimum = value
+            if self.maximum is None or value > self.maximum:
+                self.maximum = value
+        except TypeError:
+            pass
+
+    def remove(self, value):
+        # Минимум и максимум не сужаются: они остаются верными границами
+        if value is None:
+            return
+        self.nonnull -= 1
+        frequencies = self.frequencies
+        if frequencies is not None:
+            count = frequencies.get(value, 0) - 1
+            if count > 0:
+                frequencies[value] = count
+            else:
+                frequencies.pop(value, None)
+
+    def equal(self, value, rows):
+        """Доля записей таблицы из rows со значением value."""
+        if not rows:
+            return 0.0
+        if value is None:
+            return 0.0  # Сравнение с None через == в условиях не выбирает пустые значения
+        if self.frequencies is not None:
+            return self.frequencies.get(value, 0) / rows
+        if self.minimum is not None:
+            try:
+                if value < self.minimum or value > self.maximum:
+                    return 0.0
+            except TypeError:
+                return 0.0
+        return self.nonnull / rows / self.distinct()
+
+    def range(self, low, high, rows, low_inclusive=True, high_inclusive=True):
+        """Доля записей со значениями между low и high (None — без границы)."""
+        if not rows or not self.nonnull:
+            return 0.0
+        if self.frequencies is not None:
+            total = 0
+            try:
+                for value, count in self.frequencies.items():
+                    if low is not None and (value < low or (value == low and not low_inclusive)):
+                        continue
+                    if high is not None and (value > high or (value == high and not high_inclusive)):
+                        continue
+                    total += count
+            except TypeError:
+                return DEFAULT_RANGE
+            return total / rows
+        if not self.histogram:
+            return DEFAULT_RANGE
+        try:
+            upper = 1.0 if high is None else self._cdf(high)
+            lower = 0.0 if low is None else self._cdf(low)
+        except TypeError:
+            return DEFAULT_RANGE
+        return max(0.0, upper - lower) * self.nonnull / rows
+
+    def _cdf(self, value):
+        """Доля непустых значений не больше value (по гистограмме, с интерполяцией внутри интервала)."""
+        bounds = self.histogram
+        if value < bounds[0]:
+            return 0.0
+        if value >= bounds[-1]:
+            return 1.0
+        i = bisect.bisect_right(bounds, value) - 1
+        low, high = bounds[i], bounds[i + 1]
+        within = 0.5
+        low_number, high_number, number = _numeric(low), _numeric(high), _numeric(value)
+        if None not in (low_number, high_number, number) and high_number > low_number:
+            within = (number - low_number) / (high_number - low_number)
+        return (i + within) / (len(bounds) - 1)
+
+
+class TableStats:
+    """Статистика таблицы: число записей и статистика столбцов."""
+
+    def __init__(self, schema, records):
+        """
+        Собирает статистику по записям таблицы.
+        :param records: Список записей (None — удаленные записи) или колоночное хранилище.
+        """
+        self.rows = 0
+        self.columns = {}
+        for col in schema:
+            if isinstance(records, list):
+                values = [record[col] for record in records if record is not None]
+            else:
+                values = records.column_values(col)
+            self.rows = len(values)
+            self.columns[col] = ColumnStats(values)
+        self.analyzed_rows = self.rows
+        self.changes = 0  # Изменений с момента сбора
+
+    def stale(self):
+        """Нужно ли пересобрать статистику."""
+        return self.changes > STALE_RATIO * max(self.analyzed_rows, STALE_MIN_ROWS)
+
+    def add(self, record):
+        self.rows += 1
+        self.changes += 1
+        for col, stats in self.columns.items():
+            stats.add(record[col])
+
+    def add_many(self, records):
+        self.rows += len(records)
+        self.changes += len(records)
+        for col, stats in self.columns.items():
+            add = stats.add
+            for record in records:
+                add(record[col])
+
+    def remove(self, record):
+        self.rows -= 1
+        self.changes += 1
+        for col, stats in self.columns.items():
+            stats.remove(record[col])
+
+    def update(self, record, updates):
+        """Учитывает обновление записи record значениями updates (до изменения записи)."""
+        self.changes += 1
+        for col, value in updates.items():
+            stats = self.columns[col]
+            stats.remove(record[col])
+            stats.add(value)
+
+    def estimate(self, expr):
+        """Оценка числа записей, удовлетворяющих выражению."""
+        return self.selectivity(expr) * self.rows
+
+    def selectivity(self, expr):
+        """Оценка доли записей, удовлетворяющих выражению query.Expr (условия считаются независимыми)."""
+        # Импорт здесь: query не зависит от планировщика
+        from query import And, Between, Col, Comparison, In, Like, Not, Or
+
+        rows = self.rows
+        if isinstance(expr, And):
+            return math.prod(self.selectivity(item) for item in expr.items)
+        if isinstance(expr, Or):
+            return 1 - math.prod(1 - self.selectivity(item) for item in expr.items)
+        if isinstance(expr, Not):
+            return max(0.0, 1 - self.selectivity(expr.item))
+        stats = self.columns.get(getattr(expr, "column", None))
+        if stats is None:
+            return DEFAULT_RANGE
+        if isinstance(expr, Comparison):
+            if isinstance(expr.value, Col):
+                return DEFAULT_EQUALITY if expr.op == "==" else DEFAULT_RANGE
+            value = expr.value
+            if expr.op == "==":
+                return stats.equal(value, rows)
+            if expr.op == "!=":
+                return max(0.0, stats.nonnull / rows - stats.equal(value, rows)) if rows else 0.0
+            if expr.op in ("<", "<="):
+                return stats.range(None, value, rows, high_inclusive=expr.op == "<=")
+            return stats.range(value, None, rows, low_inclusive=expr.op == ">=")
+        if isinstance(expr, Between):
+            return stats.range(expr.low, expr.high, rows)
+        if isinstance(expr, In):
+            return min(1.0, sum(stats.equal(value, rows) for value in set(expr.values)))
+        if isinstance(expr, Like):
+            pattern = expr.pattern
+            if not any(char in pattern for char in "%_"):
+                return stats.equal(pattern, rows)
+            prefix = pattern.rstrip("%")
+            if prefix and not any(char in prefix for char in "%_"):
+                # Шаблон "префикс%" — диапазон строк, начинающихся с префикса
+                return stats.range(prefix, prefix + "\U0010ffff", rows, high_inclusive=False)
+            return DEFAULT_LIKE
+        return DEFAULT_RANGE
+
+    def describe(self):
+        """Статистика в виде словаря (для отладки и explain)."""
+        return {
+            "rows": self.rows,
+            "columns": {
+                col: {
+                    "null_fraction": round(1 - stats.nonnull / self.rows, 4) if self.rows else 0.0,
+                    "distinct": stats.distinct(),
+                    "min": stats.minimum,
+                    "max": stats.maximum,
+                    "histogram_buckets": max(0, len(stats.histogram) - 1),
+                    "exact_frequencies": stats.frequencies is not None,
+                }
+                for col, stats in self.columns.items()
+            },
+        }
+
+
+def scan_cost(rows, columnar=False):
+    """Стоимость полного просмотра rows записей."""
+    return rows * (COLUMNAR_ROW_COST if columnar else SCAN_ROW_COST)
+
+
+def index_cost(matches, rows):
+    """Стоимость поиска по индексу: спуск по индексу и чтение matches записей по позициям."""
+    return math.log2(rows + 1) + matches * INDEX_ROW_COST
+
+
+def ordered_walk_cost(needed, selectivity, rows):
+    """
+    Стоимость обхода упорядоченного индекса по order_by до needed подходящих записей:
+    в среднем просматривается needed / selectivity записей, но не больше rows.
+    """
+    return min(rows, needed / max(selectivity, 1e-9)) * ORDERED_ROW_COST
+
+
+def sort_cost(rows, limit=None):
+    """Стоимость упорядочивания rows записей: полная сортировка или куча на limit записей."""
+    if limit is not None:
+        return rows * HEAP_ROW_COST
+    return rows * math.log2(rows + 2) * SORT_ROW_COST
+
+
+def join_costs(left_rows, right_rows, left_sorted, right_sorted, how):
+    """
+    Оценки стоимости стратегий соединения.
+    :param left_sorted: Есть ли у левой таблицы упорядоченный индекс по ключу (то же для right_sorted).
+    :return: {"hash": стоимость, "merge": стоимость} и сторона сборки хеш-соединения ("left" или "right").
+    """
+    build = "left" if how == "inner" and left_rows < right_rows else "right"
+    build_rows, probe_rows = (left_rows, right_rows) if build == "left" else (right_rows, left_rows)
+    costs = {"hash": build_rows * HASH_BUILD_COST + probe_rows * HASH_PROBE_COST}
+    merge = 0.0
+    for rows, indexed in ((left_rows, left_sorted), (right_rows, right_sorted)):
+        merge += rows * ORDERED_ROW_COST if indexed else rows * SCAN_ROW_COST + sort_cost(rows)
+    costs["merge"] = merge
+    return costs, build
+
+
+class Plan:
+    """
+    Выбранный план запроса: способ доступа, оценки и (после выполнения в explain) фактические значения.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.condition = None  # Условие в нормализованном виде
+        self.access = "scan"  # "scan", "index", "columnar", "index order"
+        self.index = None  # Описание использованного индекса
+        self.order = None  # "sort", "top-k", "index" или None
+        self.rows = 0  # Записей в таблице
+        self.estimated_rows = None  # Оценка числа записей результата
+        self.candidates = None  # Записей-кандидатов, выбранных индексом
+        self.scanned = 0  # Записей, просмотренных при выполнении (заполняется в explain)
+        self.cost = None
+        self.alternatives = {}  # Оценки стоимости рассмотренных способов доступа
+
+    def describe(self):
+        return {
+            "table": self.table,
+            "condition": self.condition,
+            "access": self.access,
+            "index": self.index,
+            "order": self.order,
+            "rows": self.rows,
+            "candidates": self.candidates,
+            "scanned_rows": self.scanned,
+            "estimated_rows": None if self.estimated_rows is None else round(self.estimated_rows),
+            "cost": None if self.cost is None else round(self.cost, 1),
+            "alternatives": {name: round(cost, 1) for name, cost in self.alternatives.items()},
+        }
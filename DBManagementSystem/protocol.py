@@ -0,0 +1,163 @@
+"""
+Двоичный протокол сервера SimpleDB.
+
+Сообщение (кадр) — длина полезной нагрузки (4 байта, big-endian) и сама нагрузка:
+значение, закодированное тегированным двоичным форматом. Тег — один байт:
+
+    N — None, T/F — True/False,
+    b — целое от -128 до 127 (1 байт), i — целое int64 (8 байт), I — длинное целое (длина + десятичная запись),
+    d — float64, D — дата (номер дня, 4 байта),
+    s — строка до 255 байт (длина 1 байт + UTF-8), S — длинная строка (длина 4 байта + UTF-8),
+    l — список или кортеж (число элементов 4 байта + элементы), m — словарь (число пар + ключи и значения).
+
+Запрос — словарь {"op": операция, ...аргументы}, ответ — {"ok": True, "result": ...}
+или {"ok": False, "error": текст, "type": класс исключения}.
+Записи результатов передаются списками значений со списком столбцов один раз на ответ.
+"""
+import datetime
+import struct
+
+PROTOCOL_VERSION = 1
+MAX_FRAME = 1 << 30  # Наибольший допустимый размер кадра (байт)
+
+_HEADER = struct.Struct(">I")
+_INT8 = struct.Struct(">b")
+_INT32 = struct.Struct(">i")
+_UINT32 = struct.Struct(">I")
+_INT64 = struct.Struct(">q")
+_FLOAT = struct.Struct(">d")
+_INT64_MIN, _INT64_MAX = -(1 << 63), (1 << 63) - 1
+
+
+class ProtocolError(Exception):
+    """Поврежденное или неподдерживаемое сообщение."""
+
+
+def _encode(value, out):
+    kind = type(value)
+    if kind is str:
+        data = value.encode("utf-8")
+        if len(data) < 256:
+            out += b"s"
+            out.append(len(data))
+        else:
+            out += b"S"
+            out += _UINT32.pack(len(data))
+        out += data
+    elif kind is int:
+        if -128 <= value <= 127:
+            out += b"b"
+            out += _INT8.pack(value)
+        elif _INT64_MIN <= value <= _INT64_MAX:
+            out += b"i"
+            out += _INT64.pack(value)
+        else:
+            data = str(value).encode("ascii")
+            out += b"I"
+            out += _UINT32.pack(len(data))
+            out += data
+    elif kind is float:
+        out += b"d"
+        out += _FLOAT.pack(value)
+    elif value is None:
+        out += b"N"
+    elif kind is bool:
+        out += b"T" if value else b"F"
+    elif kind is list or kind is tuple:
+        out += b"l"
+        out += _UINT32.pack(len(value))
+        for item in value:
+            _encode(item, out)
+    elif kind is dict:
+        out += b"m"
+        out += _UINT32.pack(len(value))
+        for key, item in value.items():
+            _encode(key, out)
+            _encode(item, out)
+    elif kind is datetime.date:
+        out += b"D"
+        out += _INT32.pack(value.toordinal())
+    else:
+        raise ProtocolError(f"Значение типа {kind.__name__} нельзя передать по протоколу.")
+
+
+def encode(value):
+    """Кодирует значение в байты (без заголовка кадра)."""
+    out = bytearray()
+    _encode(value, out)
+    return bytes(out)
+
+
+def decode(data):
+    """Декодирует значение, закодированное encode."""
+    view = memoryview(data)
+    value, position = _decode(view, 0)
+    if position != len(view):
+        raise ProtocolError("Длина сообщения не совпадает с его содержимым.")
+    return value
+
+
+def _decode(view, position):
+    try:
+        tag = view[position]
+        position += 1
+        if tag == 0x73:  # s
+            size = view[position]
+            end = position + 1 + size
+            return str(view[position + 1:end], "utf-8"), end
+        if tag == 0x62:  # b
+            return _INT8.unpack_from(view, position)[0], position + 1
+        if tag == 0x69:  # i
+            return _INT64.unpack_from(view, position)[0], position + 8
+        if tag == 0x64:  # d
+            return _FLOAT.unpack_from(view, position)[0], position + 8
+        if tag == 0x4E:  # N
+            return None, position
+        if tag == 0x54:  # T
+            return True, position
+        if tag == 0x46:  # F
+            return False, position
+        if tag == 0x6C:  # l
+            count = _UINT32.unpack_from(view, position)[0]
+            position += 4
+            items = []
+            append = items.append
+            for _ in range(count):
+                item, position = _decode(view, position)
+                append(item)
+            return items, position
+        if tag == 0x6D:  # m
+            count = _UINT32.unpack_from(view, position)[0]
+            position += 4
+            result = {}
+            for _ in range(count):
+                key, position = _decode(view, position)
+                result[key], position = _decode(view, position)
+            return result, position
+        if tag == 0x53:  # S
+            size = _UINT32.unpack_from(view, position)[0]
+            end = position + 4 + size
+            return str(view[position + 4:end], "utf-8"), end
+        if tag == 0x44:  # D
+            return datetime.date.fromordinal(_INT32.unpack_from(view, position)[0]), position + 4
+        if tag == 0x49:  # I
+            size = _UINT32.unpack_from(view, position)[0]
+            end = position + 4 + size
+            return int(str(view[position + 4:end], "ascii")), end
+    except (IndexError, struct.error, UnicodeDecodeError, ValueError) as error:
+        raise ProtocolError(f"Поврежденное сообщение: {error}") from None
+    raise ProtocolError(f"Неизвестный тег {tag:#x}.")
+
+
+def frame(value):
+    """Кодирует значение в кадр: заголовок с длиной и полезная нагрузка."""
+    payload = encode(value)
+    return _HEADER.pack(len(payload)) + payload
+
+
+def frame_size(header):
+    """Размер полезной нагрузки по 4-байтовому заголовку кадра."""
+    size = _HEADER.unpack(header)[0]
+    if size > MAX_FRAME:
+        raise ProtocolError(f"Слишком большой кадр: {size} байт.")
+    return size
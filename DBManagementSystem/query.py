@@ -0,0 +1,486 @@
+import datetime
+import re
+
+# Операторы сравнения и их синонимы в строковых условиях
+COMPARISON_OPERATORS = ("==", "!=", "<", "<=", ">", ">=")
+OPERATOR_ALIASES = {"=": "==", "<>": "!="}
+# Оператор с переставленными операндами: 30 < age -> age > 30
+FLIPPED_OPERATORS = {"==": "==", "!=": "!=", "<": ">", "<=": ">=", ">": "<", ">=": "<="}
+
+
+class Expr:
+    """
+    Базовый класс узла выражения-условия.
+    Выражение разбирается один раз, компилируется в одну Python-функцию
+    и может быть проанализировано движком для выбора индекса.
+    """
+
+    def __and__(self, other):
+        return And(self, other)
+
+    def __or__(self, other):
+        return Or(self, other)
+
+    def __invert__(self):
+        return Not(self)
+
+    def __call__(self, record):
+        return self.compile()(record)
+
+    def __repr__(self):
+        return self.to_string()
+
+    def __getstate__(self):
+        # Скомпилированная функция не сериализуется — она будет создана заново
+        state = self.__dict__.copy()
+        state.pop("_compiled", None)
+        return state
+
+    def compile(self):
+        """Компилирует выражение в функцию record -> bool (однократно)."""
+        compiled = self.__dict__.get("_compiled")
+        if compiled is None:
+            namespace = {"_like": _like_regex}
+            source = self._source(namespace)
+            compiled = eval(f"lambda r: {source}", namespace)
+            self._compiled = compiled
+        return compiled
+
+    def columns(self):
+        """Возвращает множество столбцов, используемых в выражении."""
+        raise NotImplementedError
+
+    def conjuncts(self):
+        """Раскладывает выражение на части, объединенные через AND."""
+        return [self]
+
+    def to_string(self):
+        """Возвращает выражение в виде строки, которую понимает parse_condition."""
+        raise NotImplementedError
+
+    def _source(self, namespace):
+        raise NotImplementedError
+
+
+def _bind(namespace, value):
+    """Кладет значение в пространство имен скомпилированной функции и возвращает его имя."""
+    if isinstance(value, Col):
+        return f"r[{value.name!r}]"
+    name = f"_v{len(namespace)}"
+    namespace[name] = value
+    return name
+
+
+def _guarded(condition, *operands):
+    """
+    Добавляет к условию проверку, что операнды-столбцы не пусты: пустое значение (None)
+    не упорядочивается и не удовлетворяет сравнениям на порядок, BETWEEN и LIKE
+    (как и в упорядоченном индексе, который пустые значения не хранит).
+    """
+    checks = [f"{operand} is not None" for operand in operands if operand.startswith("r[")]
+    return f"({' and '.join(checks + [condition])})" if checks else f"({condition})"
+
+
+def _literal(value):
+    """Строковое представление значения в языке условий."""
+    if isinstance(value, Col):
+        return value.name
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, str):
+        return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+    if isinstance(value, datetime.date):
+        return f"date '{value.isoformat()}'"
+    return repr(value)
+
+
+def _like_regex(pattern):
+    """Преобразует шаблон LIKE (% и _) в регулярное выражение."""
+    parts = []
+    for char in pattern:
+        if char == "%":
+            parts.append(".*")
+        elif char == "_":
+            parts.append(".")
+        else:
+            parts.append(re.escape(char))
+    return re.compile("".join(parts) + r"\Z", re.DOTALL)
+
+
+class Col:
+    """Ссылка на столбец. Операторы сравнения строят узлы выражения: Col("age") > 30."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __eq__(self, value):
+        return Comparison(self.name, "==", value)
+
+    def __ne__(self, value):
+        return Comparison(self.name, "!=", value)
+
+    def __lt__(self, value):
+        return Comparison(self.name, "<", value)
+
+    def __le__(self, value):
+        return Comparison(self.name, "<=", value)
+
+    def __gt__(self, value):
+        return Comparison(self.name, ">", value)
+
+    def __ge__(self, value):
+        return Comparison(self.name, ">=", value)
+
+    __hash__ = object.__hash__
+
+    def isin(self, values):
+        return In(self.name, values)
+
+    def between(self, low, high):
+        return Between(self.name, low, high)
+
+    def like(self, pattern):
+        return Like(self.name, pattern)
+
+    def __repr__(self):
+        return f"Col({self.name!r})"
+
+
+class Comparison(Expr):
+    """Сравнение столбца со значением или с другим столбцом."""
+
+    def __init__(self, column, op, value):
+        op = OPERATOR_ALIASES.get(op, op)
+        if op not in COMPARISON_OPERATORS:
+            raise ValueError(f"Неизвестный оператор сравнения '{op}'.")
+        self.column = column
+        self.op = op
+        self.value = value
+
+    def columns(self):
+        columns = {self.column}
+        if isinstance(self.value, Col):
+            columns.add(self.value.name)
+        return columns
+
+    def to_string(self):
+        return f"{self.column} {self.op} {_literal(self.value)}"
+
+    def _source(self, namespace):
+        column, value = f"r[{self.column!r}]", _bind(namespace, self.value)
+        if self.op in ("==", "!="):
+            return f"({column} {self.op} {value})"
+        if self.value is None:
+            return "False"  # С пустым значением сравнение на порядок не выполняется
+        return _guarded(f"{column} {self.op} {value}", column, value)
+
+
+class In(Expr):
+    """Проверка вхождения значения столбца в список: column IN (...)."""
+
+    def __init__(self, column, values):
+        self.column = column
+        self.values = tuple(values)
+
+    def columns(self):
+        return {self.column}
+
+    def to_string(self):
+        return f"{self.column} in ({', '.join(_literal(value) for value in self.values)})"
+
+    def _source(self, namespace):
+        try:
+            values = frozenset(self.values)
+        except TypeError:
+            values = self.values
+        return f"(r[{self.column!r}] in {_bind(namespace, values)})"
+
+
+class Between(Expr):
+    """Проверка попадания в диапазон включительно: column BETWEEN low AND high."""
+
+    def __init__(self, column, low, high):
+        self.column = column
+        self.low = low
+        self.high = high
+
+    def columns(self):
+        return {self.column}
+
+    def to_string(self):
+        return f"{self.column} between {_literal(self.low)} and {_literal(self.high)}"
+
+    def _source(self, namespace):
+        if self.low is None or self.high is None:
+            return "False"
+        column, low, high = f"r[{self.column!r}]", _bind(namespace, self.low), _bind(namespace, self.high)
+        return _guarded(f"{low} <= {column} <= {high}", column, low, high)
+
+
+class Like(Expr):
+    """Сопоставление строки с шаблоном: % — любая подстрока, _ — один символ."""
+
+    def __init__(self, column, pattern):
+        self.column = column
+        self.pattern = pattern
+
+    def columns(self):
+        return {self.column}
+
+    def to_string(self):
+        return f"{self.column} like {_literal(self.pattern)}"
+
+    def _source(self, namespace):
+        regex = _bind(namespace, _like_regex(self.pattern))
+        column = f"r[{self.column!r}]"
+        return _guarded(f"{regex}.match({column}) is not None", column)
+
+
+class And(Expr):
+    """Логическое И."""
+
+    def __init__(self, *items):
+        self.items = []
+        for item in items:
+            # Вложенные AND разворачиваются в один список
+            self.items.extend(item.items if isinstance(item, And) else [item])
+
+    def columns(self):
+        return set().union(*(item.columns() for item in self.items))
+
+    def conjuncts(self):
+        return list(self.items)
+
+    def to_string(self):
+        return " and ".join(f"({item.to_string()})" for item in self.items)
+
+    def _source(self, namespace):
+        return "(" + " and ".join(item._source(namespace) for item in self.items) + ")"
+
+
+class Or(Expr):
+    """Логическое ИЛИ."""
+
+    def __init__(self, *items):
+        self.items = []
+        for item in items:
+            self.items.extend(item.items if isinstance(item, Or) else [item])
+
+    def columns(self):
+        return set().union(*(item.columns() for item in self.items))
+
+    def to_string(self):
+        return " or ".join(f"({item.to_string()})" for item in self.items)
+
+    def _source(self, namespace):
+        return "(" + " or ".join(item._source(namespace) for item in self.items) + ")"
+
+
+class Not(Expr):
+    """Логическое НЕ."""
+
+    def __init__(self, item):
+        self.item = item
+
+    def columns(self):
+        return self.item.columns()
+
+    def to_string(self):
+        return f"not ({self.item.to_string()})"
+
+    def _source(self, namespace):
+        return f"(not {self.item._source(namespace)})"
+
+
+def as_expr(condition):
+    """
+    Приводит условие к выражению.
+    :param condition: Expr, строка условия, кортеж (столбец, оператор, значение) или список кортежей.
+    :return: Expr или None, если условие — непрозрачная функция (лямбда).
+    """
+    if condition is None or isinstance(condition, Expr):
+        return condition
+    if isinstance(condition, str):
+        return parse_condition(condition)
+    if callable(condition):
+        return None
+    if isinstance(condition, tuple):
+        return Comparison(*condition)
+    comparisons = [Comparison(*predicate) for predicate in condition]
+    if not comparisons:
+        return None
+    return comparisons[0] if len(comparisons) == 1 else And(*comparisons)
+
+
+# --- Разбор строковых условий ---
+
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<number>-?\d+\.\d*(?:[eE][-+]?\d+)?|-?\d*\.\d+(?:[eE][-+]?\d+)?|-?\d+(?:[eE][-+]?\d+)?)
+      | (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+      | (?P<name>[^\W\d]\w*)
+      | (?P<op>==|!=|<>|<=|>=|<|>|=)
+      | (?P<punct>[(),\[\]])
+    )""", re.VERBOSE)
+
+_KEYWORDS = {"and", "or", "not", "in", "between", "like", "true", "false", "null", "none"}
+_CONSTANTS = {"true": True, "false": False, "null": None, "none": None}
+
+
+def _tokenize(text):
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN_RE.match(text, position)
+        if not match:
+            raise ValueError(f"Не удалось разобрать условие около: '{text[position:].strip()}'")
+        position = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "number":
+            value = float(value) if any(c in value for c in ".eE") else int(value)
+        elif kind == "string":
+            value = re.sub(r"\\(.)", r"\1", value[1:-1])
+        elif kind == "name" and value.lower() in _KEYWORDS:
+            kind, value = "keyword", value.lower()
+        tokens.append((kind, value))
+    return tokens
+
+
+class _Parser:
+    def __init__(self, text):
+        self.tokens = _tokenize(text)
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, "конец условия")
+
+    def take(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def accept(self, kind, value=None):
+        token_kind, token_value = self.peek()
+        if token_kind == kind and (value is None or token_value == value):
+            self.position += 1
+            return True
+        return False
+
+    def expect(self, kind, value=None):
+        if not self.accept(kind, value):
+            found = self.peek()[1]
+            raise ValueError(f"Ожидалось '{value or kind}', найдено '{found}'.")
+
+    def parse(self):
+        expr = self.parse_or()
+        if self.position != len(self.tokens):
+            raise ValueError(f"Лишний текст в условии: '{self.peek()[1]}'.")
+        return expr
+
+    def parse_or(self):
+        items = [self.parse_and()]
+        while self.accept("keyword", "or"):
+            items.append(self.parse_and())
+        return items[0] if len(items) == 1 else Or(*items)
+
+    def parse_and(self):
+        items = [self.parse_not()]
+        while self.accept("keyword", "and"):
+            items.append(self.parse_not())
+        return items[0] if len(items) == 1 else And(*items)
+
+    def parse_not(self):
+        if self.accept("keyword", "not"):
+            return Not(self.parse_not())
+        return self.parse_predicate()
+
+    def parse_operand(self):
+        kind, value = self.take()
+        if kind == "name":
+            if value.lower() == "date" and self.peek()[0] == "string":
+                return _parse_date(self.take()[1])  # Литерал даты: date '2024-01-31'
+            return Col(value)
+        if kind in ("number", "string"):
+            return value
+        if kind == "keyword" and value in _CONSTANTS:
+            return _CONSTANTS[value]
+        raise ValueError(f"Ожидался столбец или значение, найдено '{value}'.")
+
+    def parse_literal(self):
+        value = self.parse_operand()
+        if isinstance(value, Col):
+            raise ValueError(f"Ожидалось значение, найден столбец '{value.name}'.")
+        return value
+
+    def parse_predicate(self):
+        if self.accept("punct", "("):
+            expr = self.parse_or()
+            self.expect("punct", ")")
+            return expr
+
+        left = self.parse_operand()
+        kind, value = self.peek()
+        if kind == "op":
+            self.take()
+            right = self.parse_operand()
+            op = OPERATOR_ALIASES.get(value, value)
+            if isinstance(left, Col):
+                return Comparison(left.name, op, right)
+            if isinstance(right, Col):
+                return Comparison(right.name, FLIPPED_OPERATORS[op], left)
+            raise ValueError("В сравнении должен участвовать хотя бы один столбец.")
+
+        if not isinstance(left, Col):
+            raise ValueError(f"Ожидался столбец, найдено значение {left!r}.")
+        negated = self.accept("keyword", "not")
+        if self.accept("keyword", "in"):
+            expr = In(left.name, self.parse_list())
+        elif self.accept("keyword", "between"):
+            low = self.parse_literal()
+            self.expect("keyword", "and")
+            expr = Between(left.name, low, self.parse_literal())
+        elif self.accept("keyword", "like"):
+            pattern = self.parse_literal()
+            if not isinstance(pattern, str):
+                raise ValueError("Шаблон LIKE должен быть строкой.")
+            expr = Like(left.name, pattern)
+        else:
+            raise ValueError(f"Ожидался оператор после столбца '{left.name}'.")
+        return Not(expr) if negated else expr
+
+    def parse_list(self):
+        closing = ")" if self.accept("punct", "(") else None
+        if closing is None:
+            self.expect("punct", "[")
+            closing = "]"
+        values = []
+        if not self.accept("punct", closing):
+            values.append(self.parse_literal())
+            while self.accept("punct", ","):
+                values.append(self.parse_literal())
+            self.expect("punct", closing)
+        return values
+
+
+def _parse_date(text):
+    try:
+        return datetime.date.fromisoformat(text)
+    except ValueError:
+        raise ValueError(f"Неверная дата '{text}': ожидается ГГГГ-ММ-ДД.") from None
+
+
+def parse_condition(text):
+    """
+    Разбирает строковое условие в выражение.
+    Пример: "age > 30 and name like 'A%' or city in ('Москва', 'Тула')".
+    Даты записываются как date '2024-01-31'.
+    :param text: Строка условия.
+    :return: Expr.
+    """
+    if not text or not text.strip():
+        raise ValueError("Пустое условие.")
+    return _Parser(text).parse()
@@ -0,0 +1,88 @@
+"""
+Потоковые отчеты по таблице: CSV, TXT, JSON Lines и Excel.
+
+Строки отчета поступают из генератора (Table.iter_select или результат агрегации)
+и пишутся в файл пакетами по REPORT_BATCH_SIZE: в памяти одновременно находится
+только текущий пакет строк отчета, а не весь отчет.
+"""
+import csv
+import itertools
+import json
+
+from export import excel_value, open_output, output_path
+from schema import json_default
+
+REPORT_FORMATS = ("csv", "txt", "jsonl", "xlsx")
+REPORT_BATCH_SIZE = 10000  # Строк отчета в одном пакете записи
+
+
+def _text(value):
+    return "" if value is None else str(value)
+
+
+def _write_csv(file, columns, batches):
+    writer = csv.writer(file)
+    writer.writerow(columns)
+    for batch in batches:
+        writer.writerows(batch)
+        yield len(batch)
+
+
+def _write_txt(file, columns, batches):
+    # Значения разделяются табуляцией, первая строка — названия столбцов
+    file.write("\t".join(columns) + "\n")
+    for batch in batches:
+        file.write("".join("\t".join(map(_text, row)) + "\n" for row in batch))
+        yield len(batch)
+
+
+def _write_jsonl(file, columns, batches):
+    # Строка — объект JSON {"столбец": значение}; даты — строками ISO
+    encode = json.JSONEncoder(ensure_ascii=False, default=json_default).encode
+    for batch in batches:
+        file.write("".join(encode(dict(zip(columns, row))) + "\n" for row in batch))
+        yield len(batch)
+
+
+# Писатели текстовых форматов — генераторы: после каждого пакета выдают число записанных строк
+TEXT_WRITERS = {"csv": _write_csv, "txt": _write_txt, "jsonl": _write_jsonl}
+
+
+def write_report(file_path, columns, rows, format="csv", compression=None, sheet="report", progress=None):
+    """
+    Пишет строки отчета в файл.
+    :param columns: Названия столбцов (заголовок отчета).
+    :param rows: Итерируемый набор строк — последовательностей значений в порядке columns.
+    :param format: "csv", "txt", "jsonl" или "xlsx".
+    :param compression: Сжатие текстовых форматов: None, "gzip" или "zstd" (к имени добавляется .gz/.zst).
+    :param sheet: Название листа для xlsx.
+    :param progress: Функция progress(rows), вызываемая после каждого записанного пакета.
+    :return: Число записанных строк (без заголовка).
+    """
+    if format not in REPORT_FORMATS:
+        raise ValueError(f"Неподдерживаемый формат отчета '{format}'.")
+    rows = iter(rows)
+    batches = iter(lambda: list(itertools.islice(rows, REPORT_BATCH_SIZE)), [])
+    written = 0
+    if format == "xlsx":
+        if compression is not None:
+            raise ValueError("Отчет Excel не сжимается.")
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet(title=sheet[:31])  # Excel ограничивает название листа 31 символом
+        worksheet.append(list(columns))
+        for batch in batches:
+            for row in batch:
+                worksheet.append([excel_value(value) for value in row])
+            written += len(batch)
+            if progress is not None:
+                progress(len(batch))
+        workbook.save(file_path)
+        return written
+    with open_output(output_path(file_path, compression), compression) as file:
+        for count in TEXT_WRITERS[format](file, list(columns), batches):
+            written += count
+            if progress is not None:
+                progress(count)
+    return written
@@ -0,0 +1,197 @@
+"""
+Типы столбцов и проверка записей по схеме таблицы.
+
+Схема {"col_name": "type"} компилируется один раз при создании таблицы: для каждого
+столбца заранее выбираются проверка и преобразование значения, поэтому вставка
+не разбирает названия типов для каждой записи.
+
+Типы: int, float, str, bool, date (datetime.date). Суффикс "?" разрешает пустое
+значение None: "int?", "date?". Названия TEXT, INTEGER, REAL, BOOLEAN и DATE
+(встречаются в импортированных и старых схемах) — синонимы основных типов.
+"""
+import datetime
+
+# Синонимы названий типов (регистр не важен)
+TYPE_ALIASES = {"TEXT": "str", "INTEGER": "int", "REAL": "float", "BOOLEAN": "bool", "DATE": "date"}
+PYTHON_TYPES = {"int": int, "float": float, "str": str, "bool": bool, "date": datetime.date}
+# Текстовые представления для разбора значений, введенных пользователем или прочитанных из файла
+TRUE_STRINGS = {"true", "1", "yes", "да"}
+FALSE_STRINGS = {"false", "0", "no", "нет"}
+NULL_STRINGS = {"", "none", "null"}
+
+
+def parse_type(col_type):
+    """
+    Разбирает название типа столбца.
+    :return: (основной тип, допускается ли None), например ("int", True) для "int?".
+    """
+    nullable = col_type.endswith("?")
+    base = col_type[:-1] if nullable else col_type
+    base = TYPE_ALIASES.get(base.upper(), base)
+    if base not in PYTHON_TYPES:
+        raise ValueError(f"Неизвестный тип столбца '{col_type}'.")
+    return base, nullable
+
+
+def json_default(value):
+    """Функция default для json.dumps: даты сохраняются строками ISO (ГГГГ-ММ-ДД)."""
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    raise TypeError(f"Значение {value!r} нельзя сохранить в JSON.")
+
+
+class ColumnType:
+    """Скомпилированный тип одного столбца."""
+    __slots__ = ("name", "col_type", "base", "nullable", "python_type")
+
+    def __init__(self, name, col_type):
+        self.name = name
+        self.col_type = col_type
+        self.base, self.nullable = parse_type(col_type)
+        self.python_type = PYTHON_TYPES[self.base]
+
+    def _error(self, value):
+        return ValueError(f"Столбец '{self.name}' должен быть типа {self.col_type}, получено {value!r}.")
+
+    def check(self, value):
+        """
+        Проверяет значение, которое не совпало с типом столбца напрямую.
+        Допускаются только преобразования без потери данных: int -> float
+        и строка ISO -> date (так даты хранятся в JSON и журнале).
+        :return: Значение, приведенное к типу столбца.
+        """
+        if value is None:
+            if self.nullable:
+                return None
+            raise self._error(value)
+        base = self.base
+        if base == "float" and type(value) is int:
+            return float(value)
+        if base == "date":
+            if isinstance(value, datetime.datetime):
+                return value.date()
+            if isinstance(value, datetime.date):
+                return value
+            if isinstance(value, str):
+                try:
+                    return datetime.date.fromisoformat(value)
+                except ValueError:
+                    raise self._error(value)
+        # bool — подкласс int, но в столбцы int и float не допускается
+        if isinstance(value, self.python_type) and not (isinstance(value, bool) and base != "bool"):
+            return value
+        raise self._error(value)
+
+    def parse(self, text):
+        """
+        Преобразует строку (ввод пользователя, значение из CSV/XML/Excel) в значение столбца.
+        """
+        if not isinstance(text, str):
+            return self.check(text)
+        stripped = text.strip()
+        if self.nullable and stripped.lower() in NULL_STRINGS:
+            return None
+        try:
+            if self.base == "int":
+                return int(stripped)
+            if self.base == "float":
+                return float(stripped)
+            if self.base == "bool":
+                lowered = stripped.lower()
+                if lowered in TRUE_STRINGS:
+                    return True
+                if lowered in FALSE_STRINGS:
+                    return False
+                raise ValueError
+            if self.base == "date":
+                return datetime.date.fromisoformat(stripped)
+        except ValueError:
+            raise self._error(text)
+        return text
+
+
+class CompiledSchema:
+    """
+    Схема таблицы, скомпилированная для проверки записей.
+    Проверка пакета идет по столбцам: значения точного типа пропускаются одной
+    проверкой type(value) is ..., медленный путь check вызывается только для остальных.
+    """
+
+    def __init__(self, schema):
+        self.types = [ColumnType(col, col_type) for col, col_type in schema.items()]
+        self.by_name = {column.name: column for column in self.types}
+        self.names = set(schema)
+        # Столбцы, значения которых в JSON хранятся строками и восстанавливаются при загрузке
+        self.restored = [column for column in self.types if column.base == "date"]
+
+    def validate(self, record):
+        """
+        Проверяет запись и приводит значения к типам столбцов.
+        :return: Новый словарь: таблица хранит его, а не запись вызывающего кода,
+                 поэтому последующие изменения той записи не расходятся с индексами.
+        """
+        if not isinstance(record, dict):
+            raise ValueError("Запись должна быть словарем.")
+        if record.keys() != self.names:
+            raise ValueError("Запись должна содержать все столбцы таблицы.")
+        record = dict(record)
+        for column in self.types:
+            value = record[column.name]
+            if type(value) is not column.python_type:
+                record[column.name] = column.check(value)
+        return record
+
+    def validate_batch(self, records):
+        """
+        Проверяет пакет записей; при ошибке исключение выбрасывается до изменения таблицы.
+        :param records: Итерируемый набор записей; сами записи не изменяются.
+        :return: Список новых словарей с приведенными значениями (см. validate).
+        """
+        names = self.names
+        batch = []
+        for record in records:
+            if not isinstance(record, dict):
+                raise ValueError("Запись должна быть словарем.")
+            if record.keys() != names:
+                raise ValueError("Запись должна содержать все столбцы таблицы.")
+            batch.append(dict(record))
+        for column in self.types:
+            col, exact, check = column.name, column.python_type, column.check
+            for record in batch:
+                value = record[col]
+                if type(value) is not exact:
+                    record[col] = check(value)
+        return batch
+
+    def validate_updates(self, updates):
+        """
+        Проверяет словарь обновлений.
+        :return: Новый словарь с приведенными значениями.
+        """
+        result = {}
+        for col, value in updates.items():
+            column = self.by_name.get(col)
+            if column is None:
+                raise ValueError(f"Столбец '{col}' не существует.")
+            result[col] = value if type(value) is column.python_type else column.check(value)
+        return result
+
+    def parse(self, column, text):
+        """Преобразует строку в значение столбца column."""
+        if column not in self.by_name:
+            raise ValueError(f"Столбец '{column}' не существует.")
+        return self.by_name[column].parse(text)
+
+    def restore(self, records):
+        """Восстанавливает значения, сохраненные в JSON строками (даты), на месте."""
+        for column in self.restored:
+            col, check = column.name, column.check
+            for record in records:
+                if isinstance(record[col], str):
+                    record[col] = check(record[col])
+        return records
+
+
+def compile_schema(schema):
+    """Компилирует схему {"col_name": "type"} для проверки записей."""
+    return CompiledSchema(schema)
@@ -0,0 +1,288 @@
+"""
+Сервер SimpleDB: база данных в памяти одного процесса, доступная другим процессам
+по локальному TCP-сокету или сокету Unix (протокол — см. модуль protocol, клиент — модуль client).
+
+Запуск: python server.py [путь к базе] [--host 127.0.0.1] [--port 5433] [--unix путь] [--wal] [--metrics]
+
+Сетевой ввод-вывод выполняется в цикле asyncio, а операции с базой — в пуле потоков:
+пока один клиент выполняет долгий запрос, остальные обслуживаются (Database и Table
+потокобезопасны). Запросы одного соединения выполняются по очереди.
+"""
+import argparse
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from protocol import PROTOCOL_VERSION, ProtocolError, decode, frame, frame_size
+from SimpleDB import Database, PartitionedTable
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 5433
+SERVER_WORKERS = 8  # Потоков, выполняющих операции с базой
+
+# Методы Database, выгружающие и загружающие базу: {формат: (выгрузка, загрузка)}
+TRANSFER_METHODS = {
+    "csv": ("save_database_to_csv", "load_database_from_csv"),
+    "txt": ("save_database_to_txt", "load_database_from_txt"),
+    "xml": ("save_database_to_xml", "load_database_from_xml"),
+    "excel": ("save_database_to_excel", "load_database_from_excel"),
+}
+
+
+def _condition(value):
+    """Восстанавливает условие из запроса: строка, (столбец, оператор, значение) или список таких троек."""
+    if value is None or isinstance(value, str):
+        return value
+    if len(value) == 3 and isinstance(value[0], str) and isinstance(value[1], str):
+        return tuple(value)
+    return [tuple(predicate) for predicate in value]
+
+
+class DatabaseServer:
+    """Обслуживает запросы клиентов к одной базе данных."""
+
+    def __init__(self, db, host=DEFAULT_HOST, port=DEFAULT_PORT, path=None, workers=SERVER_WORKERS):
+        """
+        :param db: Обслуживаемая база данных (Database).
+        :param path: Путь к сокету Unix; если задан, host и port не используются.
+        :param workers: Число потоков, выполняющих операции.
+        """
+        self.db = db
+        self.host = host
+        self.port = port
+        self.path = path
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.server = None
+
+    async def start(self):
+        """Начинает принимать соединения."""
+        if self.path is not None:
+            self.server = await asyncio.start_unix_server(self._serve_client, self.path)
+        else:
+            self.server = await asyncio.start_server(self._serve_client, self.host, self.port)
+            # При port=0 система выбирает свободный порт
+            self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    @property
+    def address(self):
+        """Адрес для client.connect: "unix:путь" или "хост:порт"."""
+        return f"unix:{self.path}" if self.path is not None else f"{self.host}:{self.port}"
+
+    async def serve_forever(self):
+        await self.server.serve_forever()
+
+    async def close(self):
+        """Закрывает сервер и ждет завершения выполняющихся операций."""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self.executor.shutdown(wait=True)
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+    async def _serve_client(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(4)
+                    payload = await reader.readexactly(frame_size(header))
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break  # Клиент закрыл соединение
+                # Разбор запроса и кодирование ответа тоже выполняются в пуле, чтобы не задерживать цикл
+                response = await loop.run_in_executor(self.executor, self.handle, payload)
+                writer.write(response)
+                await writer.drain()
+        except ProtocolError:
+            pass  # Неверный заголовок кадра: соединение закрывается
+        finally:
+            writer.close()
+
+    def handle(self, payload):
+        """
+        Выполняет один запрос.
+        :param payload: Закодированный запрос {"op": операция, ...аргументы}.
+        :return: Кадр с ответом.
+        """
+        try:
+            request = decode(payload)
+            operation = request.pop("op")
+            method = getattr(self, f"op_{operation}", None)
+            if method is None:
+                raise ValueError(f"Неизвестная операция '{operation}'.")
+            return frame({"ok": True, "result": method(**request)})
+        except Exception as error:
+            return frame({"ok": False, "error": str(error), "type": type(error).__name__})
+
+    # --- Операции базы данных ---
+
+    def op_hello(self, version=PROTOCOL_VERSION):
+        if version != PROTOCOL_VERSION:
+            raise ProtocolError(f"Версия протокола клиента {version} не поддерживается (сервер: {PROTOCOL_VERSION}).")
+        return {"version": PROTOCOL_VERSION, "name": self.db.name}
+
+    def op_tables(self):
+        return {name: {"schema": table.schema, "primary_key": table.primary_key, "storage": table.storage,
+                       "partition_by": table.partitioning.describe() if isinstance(table, PartitionedTable) else None}
+                for name, table in list(self.db.tables.items())}
+
+    def op_create_table(self, table, schema, storage="rows", primary_key=None, partition_by=None):
+        self.db.create_table(table, schema, storage=storage, primary_key=primary_key, partition_by=partition_by)
+
+    def op_stats(self):
+        return self.db.stats()
+
+    def op_enable_metrics(self, slow_query_ms=None):
+        if self.db.metrics is None:
+            if slow_query_ms is None:
+                self.db.enable_metrics()
+            else:
+                self.db.enable_metrics(slow_query_ms)
+
+    def op_disable_metrics(self):
+        self.db.disable_metrics()
+
+    def op_metrics_enabled(self):
+        return self.db.metrics is not None
+
+    def op_reset_metrics(self):
+        if self.db.metrics is not None:
+            self.db.metrics.reset()
+
+    def op_save(self, path, format=None):
+        self.db.save_to_file(path, format=format)
+
+    def op_export(self, format, path, compression=None):
+        method = getattr(self.db, TRANSFER_METHODS[format][0])
+        if compression is not None:
+            method(path, compression=compression)
+        else:
+            method(path)
+
+    def op_import(self, format, path):
+        getattr(self.db, TRANSFER_METHODS[format][1])(path)
+
+    # --- Операции таблицы: записи передаются списками значений в порядке столбцов схемы ---
+
+    def _table(self, table):
+        return self.db.get_table(table)
+
+    @staticmethod
+    def _values(table, records):
+        columns = list(table.schema)
+        return [[record[col] for col in columns] for record in records]
+
+    def op_select(self, table, condition=None, order_by=None, ascending=True, limit=None, offset=0):
+        table = self._table(table)
+        return self._values(table, table.select(_condition(condition), order_by, ascending, limit, offset))
+
+    def op_get(self, table, key):
+        table = self._table(table)
+        record = table.get(key)
+        return None if record is None else self._values(table, [record])[0]
+
+    def op_insert(self, table, values):
+        table = self._table(table)
+        table.insert(dict(zip(table.schema, values)))
+
+    def op_insert_many(self, table, rows):
+        table = self._table(table)
+        columns = list(table.schema)
+        return table.insert_many([dict(zip(columns, values)) for values in rows])
+
+    def op_update(self, table, condition, updates):
+        return self._table(table).update(_condition(condition), updates)
+
+    def op_delete(self, table, condition):
+        return self._table(table).delete(_condition(condition))
+
+    def op_update_by_pk(self, table, key, updates):
+        return self._table(table).update_by_pk(key, updates)
+
+    def op_delete_by_pk(self, table, key):
+        return self._table(table).delete_by_pk(key)
+
+    def op_update_row(self, table, row_id, updates):
+        self._table(table).update_row(row_id, updates)
+
+    def op_delete_row(self, table, row_id):
+        self._table(table).delete_row(row_id)
+
+    def op_row_ids(self, table, condition=None, order_by=None, ascending=True):
+        return self._table(table).row_ids(_condition(condition), order_by, ascending)
+
+    def op_fetch_rows(self, table, row_ids):
+        table = self._table(table)
+        columns = list(table.schema)
+        return [[row_id] + [record[col] for col in columns] for row_id, record in table.fetch_rows(row_ids)]
+
+    def op_count(self, table):
+        return self._table(table).count()
+
+    def op_version(self, table):
+        return self._table(table).version
+
+    def op_aggregate(self, table, aggregates, group_by=None, condition=None):
+        aggregates = {name: tuple(spec) for name, spec in aggregates.items()}
+        return self._table(table).aggregate(aggregates, group_by=group_by, condition=_condition(condition))
+
+    def op_explain(self, table, condition=None, order_by=None, ascending=True, limit=None, offset=0):
+        return self._table(table).explain(_condition(condition), order_by, ascending, limit, offset)
+
+    def op_create_index(self, table, column, kind="hash"):
+        self._table(table).create_index(column, kind)
+
+    def op_drop_index(self, table, column):
+        self._table(table).drop_index(column)
+
+    def op_generate_report(self, table, filename, options):
+        if options.get("aggregates") is not None:
+            options["aggregates"] = {name: tuple(spec) for name, spec in options["aggregates"].items()}
+        options["condition"] = _condition(options.get("condition"))
+        return self._table(table).generate_report(filename, **options)
+
+
+async def serve(db, host=DEFAULT_HOST, port=DEFAULT_PORT, path=None, workers=SERVER_WORKERS):
+    """Запускает сервер базы db и обслуживает клиентов до отмены."""
+    server = await DatabaseServer(db, host, port, path, workers).start()
+    print(f"Сервер SimpleDB: база '{db.name}', адрес {server.address}")
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    """Разбор аргументов командной строки (см. описание модуля)."""
+    parser = argparse.ArgumentParser(description="Сервер SimpleDB.")
+    parser.add_argument("database", nargs="?", help="каталог сегментов или файл JSON (по умолчанию — пустая база)")
+    parser.add_argument("--name", default="server", help="имя новой базы, если путь не задан")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", help="путь к сокету Unix вместо TCP")
+    parser.add_argument("--wal", action="store_true", help="журналировать изменения (каталог сегментов)")
+    parser.add_argument("--metrics", action="store_true", help="включить сбор метрик")
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS)
+    args = parser.parse_args(argv)
+
+    if args.database is not None and os.path.exists(args.database):
+        db = Database.load_from_file(args.database, wal=args.wal)
+    else:
+        db = Database(args.name)
+        if args.database is not None and args.wal:
+            db.enable_wal(args.database)
+    if args.metrics:
+        db.enable_metrics()
+    try:
+        asyncio.run(serve(db, args.host, args.port, args.unix, args.workers))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if db.wal is not None:
+            db.commit()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,300 @@
+"""
+Бинарный сегментный формат хранения таблиц.
+
+Файл сегмента (одна таблица):
+    MAGIC | u32 длина заголовка | заголовок (JSON: имя, схема, индексы...)
+    u32 длина пакета | пакет строк           (повторяется)
+    футер (JSON: смещения, длины и число строк пакетов) | u64 смещение футера | FOOTER_MAGIC
+
+Пакет хранит значения по столбцам: u32 число строк, затем для каждого столбца
+u8 кодировка | u32 длина | данные. int и float пишутся массивами int64/float64,
+str — длинами строк и общим буфером UTF-8, date — массивом порядковых номеров дней
+(date.toordinal), остальные типы — списком JSON (даты в нем — строками ISO).
+Все числа в формате little-endian.
+"""
+import bisect
+import datetime
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+
+from schema import json_default, parse_type
+
+MAGIC = b"SDBSEG01"
+FOOTER_MAGIC = b"SDBFOOT1"
+BATCH_SIZE = 10000  # Строк в одном пакете по умолчанию
+CACHED_BATCHES = 4  # Сколько декодированных пакетов держит в памяти ленивая таблица
+
+_U8 = struct.Struct("<B")
+_U32 = struct.Struct("<I")
+_U64 = struct.Struct("<Q")
+_TRAILER_SIZE = _U64.size + len(FOOTER_MAGIC)
+
+# Кодировки столбцов в пакете
+ENCODING_JSON = 0
+ENCODING_INT64 = 1
+ENCODING_FLOAT64 = 2
+ENCODING_UTF8 = 3
+ENCODING_DATE = 4
+
+_INT64_MIN, _INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def _to_little_endian(values):
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_little_endian(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def _encode_column(col_type, values):
+    """Кодирует значения одного столбца, выбирая компактную кодировку, если типы позволяют."""
+    col_type = parse_type(col_type)[0]
+    if col_type == "int" and all(type(value) is int and _INT64_MIN <= value <= _INT64_MAX for value in values):
+        return ENCODING_INT64, _to_little_endian(array("q", values))
+    if col_type == "float" and all(type(value) is float for value in values):
+        return ENCODING_FLOAT64, _to_little_endian(array("d", values))
+    if col_type == "str" and all(type(value) is str for value in values):
+        encoded = [value.encode("utf-8") for value in values]
+        lengths = _to_little_endian(array("I", [len(item) for item in encoded]))
+        return ENCODING_UTF8, lengths + b"".join(encoded)
+    if col_type == "date" and all(type(value) is datetime.date for value in values):
+        return ENCODING_DATE, _to_little_endian(array("i", [value.toordinal() for value in values]))
+    return ENCODING_JSON, json.dumps(list(values), ensure_ascii=False, default=json_default).encode("utf-8")
+
+
+def _decode_column(encoding, data, count):
+    if encoding == ENCODING_INT64:
+        return _from_little_endian("q", data)
+    if encoding == ENCODING_FLOAT64:
+        return _from_little_endian("d", data)
+    if encoding == ENCODING_UTF8:
+        lengths = _from_little_endian("I", data[:4 * count])
+        values = []
+        offset = 4 * count
+        for length in lengths:
+            values.append(str(data[offset:offset + length], "utf-8"))
+            offset += length
+        return values
+    if encoding == ENCODING_DATE:
+        return [datetime.date.fromordinal(day) for day in _from_little_endian("i", data)]
+    if encoding == ENCODING_JSON:
+        return json.loads(bytes(data).decode("utf-8"))
+    raise ValueError(f"Неизвестная кодировка столбца: {encoding}.")
+
+
+def encode_batch(schema, columns, count):
+    """
+    Кодирует пакет строк.
+    :param schema: Схема таблицы.
+    :param columns: Значения по столбцам: {"col_name": последовательность значений}.
+    :param count: Число строк в пакете.
+    :return: bytes.
+    """
+    parts = [_U32.pack(count)]
+    for col, col_type in schema.items():
+        encoding, data = _encode_column(col_type, columns[col])
+        parts.append(_U8.pack(encoding))
+        parts.append(_U32.pack(len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+
+def decode_batch(schema, payload):
+    """
+    Декодирует пакет строк.
+    :return: (число строк, {"col_name": последовательность значений}).
+    """
+    payload = memoryview(payload)
+    count = _U32.unpack_from(payload, 0)[0]
+    offset = _U32.size
+    columns = {}
+    for col, col_type in schema.items():
+        encoding = _U8.unpack_from(payload, offset)[0]
+        length = _U32.unpack_from(payload, offset + _U8.size)[0]
+        offset += _U8.size + _U32.size
+        values = _decode_column(encoding, payload[offset:offset + length], count)
+        if encoding == ENCODING_JSON and parse_type(col_type)[0] == "date":
+            # Столбец с пустыми значениями: даты сохранены строками ISO
+            values = [datetime.date.fromisoformat(value) if isinstance(value, str) else value for value in values]
+        columns[col] = values
+        offset += length
+    return count, columns
+
+
+def rows_from_columns(schema, columns):
+    """Собирает записи-словари из значений по столбцам."""
+    names = list(schema)
+    return [dict(zip(names, values)) for values in zip(*(columns[col] for col in names))]
+
+
+class SegmentWriter:
+    """
+    Запись файла сегмента пакетами. Футер пишется при закрытии,
+    поэтому файл можно наполнять постепенно, не держа таблицу целиком в памяти.
+    """
+
+    def __init__(self, path, header):
+        self.path = path
+        self.schema = header["schema"]
+        self.batches = []  # [смещение, длина, число строк]
+        self.file = open(path, "wb")
+        data = json.dumps(header, ensure_ascii=False).encode("utf-8")
+        self.file.write(MAGIC + _U32.pack(len(data)) + data)
+
+    def write_columns(self, columns, count):
+        """Записывает пакет, заданный значениями по столбцам."""
+        if not count:
+            return
+        payload = encode_batch(self.schema, columns, count)
+        offset = self.file.tell()
+        self.file.write(_U32.pack(len(payload)))
+        self.file.write(payload)
+        self.batches.append([offset, len(payload), count])
+
+    def close(self):
+        """Дописывает футер и закрывает файл."""
+        if self.file.closed:
+            return
+        footer_offset = self.file.tell()
+        footer = {"rows": sum(batch[2] for batch in self.batches), "batches": self.batches}
+        self.file.write(json.dumps(footer).encode("utf-8"))
+        self.file.write(_U64.pack(footer_offset) + FOOTER_MAGIC)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+
+
+class SegmentReader:
+    """
+    Чтение файла сегмента. При открытии читаются только заголовок и футер,
+    пакеты строк декодируются по запросу.
+    """
+
+    def __init__(self, path, use_mmap=False):
+        """
+        :param path: Путь к файлу сегмента.
+        :param use_mmap: Отобразить файл в память: пакеты читаются из отображения без вызовов read.
+        """
+        self.path = path
+        self.mmap = None
+        self.file = open(path, "rb")
+        magic = self.file.read(len(MAGIC))
+        if magic != MAGIC:
+            self.file.close()
+            raise ValueError(f"Файл '{path}' не является сегментом таблицы.")
+        header_length = _U32.unpack(self.file.read(_U32.size))[0]
+        self.header = json.loads(self.file.read(header_length).decode("utf-8"))
+        self.schema = self.header["schema"]
+
+        self.file.seek(-_TRAILER_SIZE, os.SEEK_END)
+        trailer = self.file.read(_TRAILER_SIZE)
+        if trailer[_U64.size:] != FOOTER_MAGIC:
+            self.file.close()
+            raise ValueError(f"Сегмент '{path}' поврежден: не найден футер.")
+        footer_offset = _U64.unpack(trailer[:_U64.size])[0]
+        end = self.file.seek(0, os.SEEK_END) - _TRAILER_SIZE
+        self.file.seek(footer_offset)
+        footer = json.loads(self.file.read(end - footer_offset).decode("utf-8"))
+        self.row_count = footer["rows"]
+        self.batches = footer["batches"]
+        if use_mmap:
+            self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read_columns(self, number):
+        """Декодирует пакет с указанным номером: (число строк, значения по столбцам)."""
+        offset, length, _ = self.batches[number]
+        start = offset + _U32.size
+        if self.mmap is not None:
+            with memoryview(self.mmap) as view:
+                return decode_batch(self.schema, view[start:start + length])
+        self.file.seek(start)
+        return decode_batch(self.schema, self.file.read(length))
+
+    def read_batch(self, number):
+        """Декодирует пакет с указанным номером в список записей-словарей."""
+        _, columns = self.read_columns(number)
+        return rows_from_columns(self.schema, columns)
+
+    def close(self):
+        if self.mmap is not None:
+            self.mmap.close()
+            self.mmap = None
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+
+class SegmentData:
+    """
+    Ленивая последовательность записей сегмента (только чтение).
+    Длина известна из футера; пакет декодируется при первом обращении к его строкам,
+    последние CACHED_BATCHES пакетов кешируются.
+    """
+
+    def __init__(self, reader):
+        self.reader = reader
+        self.starts = []  # Номер первой строки каждого пакета
+        total = 0
+        for _, _, count in reader.batches:
+            self.starts.append(total)
+            total += count
+        self.length = total
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()  # Кеш и чтение файла общие для параллельных читателей
+
+    def __len__(self):
+        return self.length
+
+    def batch(self, number):
+        """Возвращает записи пакета с указанным номером."""
+        with self.lock:
+            rows = self.cache.get(number)
+            if rows is None:
+                rows = self.reader.read_batch(number)
+                self.cache[number] = rows
+                if len(self.cache) > CACHED_BATCHES:
+                    self.cache.popitem(last=False)
+            else:
+                self.cache.move_to_end(number)
+            return rows
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(self.length))]
+        if position < 0:
+            position += self.length
+        if not 0 <= position < self.length:
+            raise IndexError("Позиция записи вне диапазона.")
+        number = bisect.bisect_right(self.starts, position) - 1
+        return self.batch(number)[position - self.starts[number]]
+
+    def __iter__(self):
+        for number in range(len(self.starts)):
+            yield from self.batch(number)
@@ -0,0 +1,42 @@
+"""
+Вывод результатов замеров (benchmark.format_result, benchmark.compare_results): замер без
+пропускной способности (нулевое время) выводится и сравнивается без ошибок.
+Запуск из каталога DBManagementSystem: python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import compare_results, format_result  # noqa: E402
+
+
+def make_result(throughput, p99_ms=1.0):
+    return {"name": "select", "rows": 10, "unit": "rows/s", "operations": 1, "seconds": 0.0,
+            "throughput": throughput, "p50_ms": 0.5, "p99_ms": p99_ms, "peak_rss_mb": None}
+
+
+class BenchmarkOutputTest(unittest.TestCase):
+
+    def test_format_result(self):
+        self.assertIn("1,000", format_result(make_result(1000.0)))
+        line = format_result(make_result(None))
+        self.assertIn("—", line)
+        self.assertEqual(len(line), len(format_result(make_result(1000.0))))
+
+    def test_compare_without_throughput(self):
+        for old, new in [(None, 1000.0), (1000.0, None), (None, None)]:
+            with self.subTest(old=old, new=new):
+                lines, regressions = compare_results({"rows": 10, "results": [make_result(old)]},
+                                                     {"rows": 10, "results": [make_result(new)]})
+                self.assertEqual(regressions, [])
+                self.assertIn("пропускная способность       —", lines[0])
+        lines, regressions = compare_results({"rows": 10, "results": [make_result(1000.0)]},
+                                             {"rows": 10, "results": [make_result(500.0, p99_ms=1.0)]})
+        self.assertEqual(regressions, ["select"])
+        self.assertIn("-50.0%", lines[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,166 @@
+"""
+Параллельный доступ к таблице (блокировка locks.ReadWriteLock): потоки-писатели вставляют,
+обновляют и удаляют записи, потоки-читатели в это время выбирают их по индексу и полным
+просмотром. Читатели не видят частично примененных изменений, а после завершения потоков
+число записей, индексы и версия таблицы согласованы с выполненными изменениями.
+Запуск из каталога DBManagementSystem: python -m unittest discover tests
+"""
+import os
+import random
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from SimpleDB import COMPACT_MIN_ROWS, Database  # noqa: E402
+
+ROWS = 2000
+WRITERS = 4
+READERS = 4
+OPERATIONS = 300  # Операций на поток
+LAYOUTS = [
+    ("rows", None),
+    ("columnar", None),
+    ("rows", ("hash", "id", 3)),
+    ("columnar", ("range", "id", [ROWS // 2])),
+]
+
+
+class ConcurrentAccessTest(unittest.TestCase):
+
+    def make_table(self, storage, partition_by):
+        db = Database("stress")
+        db.create_table("t", {"id": "int", "a": "int", "b": "int"}, storage=storage, partition_by=partition_by)
+        table = db.get_table("t")
+        table.insert_many([{"id": i, "a": 0, "b": 0} for i in range(ROWS)])
+        table.create_index("id")
+        table.create_index("a", "sorted")
+        return table
+
+    def run_threads(self, table):
+        """
+        Запускает писателей и читателей.
+        :return: (ошибки, вставленные и не удаленные ключи, число изменений, версии, увиденные читателями).
+        """
+        errors, inserted, versions = [], [], []
+        changes = [0]
+        guard = threading.Lock()
+
+        def writer(seed):
+            rnd = random.Random(seed)
+            own = []
+            try:
+                for n in range(OPERATIONS):
+                    op = rnd.random()
+                    if op < 0.3:
+                        key = ROWS * (seed + 1) * 10 + n
+                        table.insert({"id": key, "a": key, "b": key})
+                        own.append(key)
+                        changed = 1
+                    elif op < 0.6 and own:
+                        changed = table.delete(("id", "==", own.pop(rnd.randrange(len(own)))))
+                    else:
+                        # a и b меняются одним изменением: читатель не должен увидеть a != b
+                        value = rnd.randrange(1000)
+                        changed = table.update(("id", "==", rnd.randrange(ROWS)), {"a": value, "b": value})
+                    with guard:
+                        changes[0] += bool(changed)
+            except Exception as error:
+                errors.append(repr(error))
+            with guard:
+                inserted.extend(own)
+
+        def reader(seed):
+            rnd = random.Random(-seed)
+            seen = []
+            try:
+                for n in range(OPERATIONS):
+                    seen.append(table.version)
+                    if n % 50 == 0:
+                        torn = table.select(lambda r: r["a"] != r["b"])
+                        if torn:
+                            errors.append(f"Полный просмотр увидел несогласованные записи: {torn[:3]}")
+                        continue
+                    key = rnd.randrange(ROWS)
+                    records = table.select(("id", "==", key))
+                    if [record["id"] for record in records] != [key]:
+                        errors.append(f"Выборка по индексу id == {key}: {records}")
+                    for record in table.select(("a", ">=", 990)):
+                        if record["a"] != record["b"] or record["a"] < 990:
+                            errors.append(f"Выборка по индексу a >= 990: {dict(record)}")
+            except Exception as error:
+                errors.append(repr(error))
+            with guard:
+                versions.append(seen)
+
+        threads = ([threading.Thread(target=writer, args=(seed,)) for seed in range(WRITERS)]
+                   + [threading.Thread(target=reader, args=(seed,)) for seed in range(READERS)])
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(60)
+        self.assertFalse(any(thread.is_alive() for thread in threads), "Потоки не завершились")
+        return errors, inserted, changes[0], versions
+
+    def assertConsistent(self, table, inserted):
+        """Число записей и выборки по индексам совпадают с полным просмотром."""
+        keys = sorted(list(range(ROWS)) + inserted)
+        self.assertEqual(table.count(), len(keys))
+        self.assertEqual(sorted(record["id"] for record in table.fetch_all()), keys)
+        self.assertEqual(table.select(lambda r: r["a"] != r["b"]), [])
+        for key in keys[::50] + inserted:
+            self.assertEqual([record["id"] for record in table.select(("id", "==", key))], [key])
+        for low in (0, 500, 990):
+            expected = sorted(record["id"] for record in table.select(lambda r, low=low: r["a"] >= low))
+            self.assertEqual(sorted(record["id"] for record in table.select(("a", ">=", low))), expected)
+
+    def test_writers_and_readers(self):
+        for storage, partition_by in LAYOUTS:
+            with self.subTest(storage=storage, partition_by=partition_by):
+                table = self.make_table(storage, partition_by)
+                version = table.version
+                errors, inserted, changes, versions = self.run_threads(table)
+                self.assertEqual(errors, [])
+                self.assertConsistent(table, inserted)
+                # Каждое изменение увеличивает версию; читатель не видит ее уменьшения
+                self.assertGreaterEqual(table.version, version + changes)
+                for seen in versions:
+                    self.assertEqual(seen, sorted(seen))
+
+    def test_compaction_under_readers(self):
+        # Удаления превышают порог уплотнения, пока читатели просматривают таблицу
+        for storage, partition_by in LAYOUTS:
+            with self.subTest(storage=storage, partition_by=partition_by):
+                table = self.make_table(storage, partition_by)
+                table.insert_many([{"id": -i, "a": 0, "b": 0} for i in range(1, COMPACT_MIN_ROWS * 2)])
+                errors = []
+
+                def delete():
+                    try:
+                        for start in range(1, COMPACT_MIN_ROWS * 2, 100):
+                            table.delete(f"id <= {-start} and id > {-start - 100}")
+                        table.compact()
+                    except Exception as error:
+                        errors.append(repr(error))
+
+                def read():
+                    try:
+                        for key in range(0, ROWS, 5):
+                            if [record["id"] for record in table.select(("id", "==", key))] != [key]:
+                                errors.append(f"Запись {key} не найдена по индексу")
+                    except Exception as error:
+                        errors.append(repr(error))
+
+                threads = [threading.Thread(target=delete), threading.Thread(target=read),
+                           threading.Thread(target=read)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join(60)
+                self.assertEqual(errors, [])
+                self.assertConsistent(table, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
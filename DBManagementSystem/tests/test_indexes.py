@@ -0,0 +1,174 @@
+"""
+Индексы и кеш результатов: выборка через хеш- или упорядоченный индекс совпадает с полным
+просмотром и с проверкой условия на Python, в том числе после вставок, обновлений, удалений
+и уплотнения, которые должны поддерживать индексы и сбрасывать кеш результатов select.
+Запуск из каталога DBManagementSystem: python -m unittest discover tests
+"""
+import datetime
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from SimpleDB import Database  # noqa: E402
+
+ROWS = 2000
+START = datetime.date(2024, 1, 1)
+SCHEMA = {"id": "int", "a": "int?", "s": "str?", "d": "date?"}
+LAYOUTS = [
+    ("rows", None),
+    ("columnar", None),
+    ("rows", ("hash", "id", 3)),
+    ("columnar", ("range", "id", [ROWS // 2])),
+]
+INDEXES = [None, "hash", "sorted"]
+
+
+def less(value, bound):
+    return value is not None and value < bound
+
+
+def greater(value, bound):
+    return value is not None and value > bound
+
+
+# Условие и та же проверка на Python (сравнения с пустым значением ложны, != и not — как в Python)
+CONDITIONS = [
+    ("a == 3", lambda r: r["a"] == 3),
+    ("a != 3", lambda r: r["a"] != 3),
+    ("a < 2", lambda r: less(r["a"], 2)),
+    ("a >= 8", lambda r: r["a"] is not None and r["a"] >= 8),
+    ("a between 2 and 4", lambda r: r["a"] is not None and 2 <= r["a"] <= 4),
+    ("a in (1, 5, 42)", lambda r: r["a"] in (1, 5, 42)),
+    ("a == null", lambda r: r["a"] is None),
+    ("not (a > 6)", lambda r: not greater(r["a"], 6)),
+    ("s == 'k13'", lambda r: r["s"] == "k13"),
+    ("s like 'k1%'", lambda r: r["s"] is not None and r["s"].startswith("k1")),
+    ("s > 'k5'", lambda r: greater(r["s"], "k5")),
+    ("d <= date '2024-01-10'", lambda r: r["d"] is not None and r["d"] <= datetime.date(2024, 1, 10)),
+    ("id >= 100 and id < 150", lambda r: 100 <= r["id"] < 150),
+    ("a == 3 and s like 'k%'", lambda r: r["a"] == 3 and r["s"] is not None and r["s"].startswith("k")),
+    ("a < 1 or s == 'k7' or d == null", lambda r: less(r["a"], 1) or r["s"] == "k7" or r["d"] is None),
+]
+
+
+def make_record(rnd, key):
+    return {"id": key,
+            "a": None if rnd.random() < 0.1 else rnd.randrange(10),
+            "s": None if rnd.random() < 0.1 else f"k{rnd.randrange(30)}",
+            "d": None if rnd.random() < 0.1 else START + datetime.timedelta(days=rnd.randrange(60))}
+
+
+class IndexScanTest(unittest.TestCase):
+
+    def make_tables(self, records):
+        """
+        Таблицы всех способов хранения без индексов и с индексами каждого типа.
+        :return: {(номер в LAYOUTS, тип индексов): таблица}.
+        """
+        db = Database("indexes")
+        tables = {}
+        for layout, (storage, partition_by) in enumerate(LAYOUTS):
+            for kind in INDEXES:
+                name = f"t{len(tables)}"
+                db.create_table(name, SCHEMA, storage=storage, partition_by=partition_by)
+                table = db.get_table(name)
+                table.insert_many(records)
+                if kind is not None:
+                    for column in SCHEMA:
+                        table.create_index(column, kind)
+                tables[(layout, kind)] = table
+        return tables
+
+    def assertSameResults(self, tables, records):
+        for (layout, kind), table in tables.items():
+            for condition, check in CONDITIONS:
+                with self.subTest(layout=LAYOUTS[layout], index=kind, condition=condition):
+                    expected = sorted(record["id"] for record in records if check(record))
+                    # Второй запрос берет результат из кеша
+                    for _ in range(2):
+                        self.assertEqual(sorted(record["id"] for record in table.select(condition)), expected)
+                    self.assertEqual(sorted(record["id"] for record in table.select(check)), expected)
+            self.assertEqual(table.count(), len(records))
+
+    def assertSameOrder(self, tables):
+        """Упорядоченная выборка (в том числе обходом упорядоченного индекса) совпадает с сортировкой просмотра."""
+        queries = [("a >= 2", "a", True, None, 0), (None, "d", False, 25, 10), ("s != 'k3'", "s", True, 40, 0),
+                   (None, "id", False, 15, 5)]
+        for (layout, kind), table in tables.items():
+            scan = tables[(layout, None)]
+            for condition, order_by, ascending, limit, offset in queries:
+                with self.subTest(layout=LAYOUTS[layout], index=kind, condition=condition, order_by=order_by):
+                    expected = scan.select(condition, order_by, ascending, limit, offset)
+                    actual = table.select(condition, order_by, ascending, limit, offset)
+                    # Порядок записей с равными значениями не определен: сравниваются значения столбца
+                    self.assertEqual([record[order_by] for record in actual],
+                                     [record[order_by] for record in expected])
+                    if limit is None:
+                        self.assertEqual(sorted(record["id"] for record in actual),
+                                         sorted(record["id"] for record in expected))
+
+    def test_equivalence(self):
+        rnd = random.Random(13)
+        records = [make_record(rnd, key) for key in range(ROWS)]
+        tables = self.make_tables(records)
+        self.assertSameResults(tables, records)
+        self.assertSameOrder(tables)
+
+    def test_after_changes(self):
+        rnd = random.Random(14)
+        records = [make_record(rnd, key) for key in range(ROWS)]
+        tables = self.make_tables(records)
+        next_key = ROWS
+        for round_number in range(4):
+            self.assertSameResults(tables, records)
+            new = [make_record(rnd, key) for key in range(next_key, next_key + 200)]
+            next_key += len(new)
+            value = rnd.randrange(10)
+            for table in tables.values():
+                table.insert_many(new)
+                table.update(f"a == {value}", {"a": None, "s": "moved"})
+                table.update("s like 'k2%' and d != null", {"a": 42, "d": START})
+                table.delete("a == 7 or id < 50 or s == 'k11'")
+                if round_number % 2:
+                    # Через раунд индексы проверяются на таблице с отметками удаленных записей
+                    table.compact()
+            records = records + new
+            for record in records:
+                if record["a"] == value:
+                    record.update(a=None, s="moved")
+                if record["s"] is not None and record["s"].startswith("k2") and record["d"] is not None:
+                    record.update(a=42, d=START)
+            records = [record for record in records
+                       if not (record["a"] == 7 or record["id"] < 50 or record["s"] == "k11")]
+        self.assertSameResults(tables, records)
+        self.assertSameOrder(tables)
+
+    def test_index_used(self):
+        # Избирательные условия на равенство выполняются через индекс, а не полным просмотром
+        rnd = random.Random(15)
+        tables = self.make_tables([make_record(rnd, key) for key in range(ROWS)])
+        for (layout, kind), table in tables.items():
+            if kind is None:
+                continue
+            for condition in ("s == 'k13'", "id == 77"):
+                with self.subTest(layout=LAYOUTS[layout], index=kind, condition=condition):
+                    # У секционированной таблицы — способы доступа всех просмотренных секций
+                    self.assertEqual(table.explain(condition)["access"], "index")
+
+    def test_cache(self):
+        rnd = random.Random(16)
+        tables = self.make_tables([make_record(rnd, key) for key in range(ROWS)])
+        table = tables[(0, "sorted")]
+        first = table.select("a == 3", order_by="id")
+        self.assertEqual(table.select("a == 3", order_by="id"), first)
+        self.assertEqual(table.cache_stats()["hits"], 1)
+        table.update(f"id == {first[0]['id']}", {"a": 4})
+        self.assertEqual(table.select("a == 3", order_by="id"), first[1:])
+        self.assertEqual(table.cache_stats()["hits"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+"""
+Ленивое открытие каталога сегментов (Database.load_from_file(..., lazy=True)): структура
+базы доступна без чтения записей, запросы читают пакеты сегмента без загрузки таблицы
+в память и дают тот же результат, что и обычная загрузка, в том числе после изменений
+и восстановления из журнала.
+Запуск из каталога DBManagementSystem: python -m unittest discover tests
+"""
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from SimpleDB import Database, PartitionedTable  # noqa: E402
+from storage import BATCH_SIZE, SegmentData  # noqa: E402
+
+ROWS = BATCH_SIZE + 500  # Два пакета в сегменте
+SCHEMA = {"id": "int", "v": "int", "s": "str?", "d": "date?"}
+LAYOUTS = [
+    ("rows", None),
+    ("columnar", None),
+    ("rows", ("hash", "id", 3)),
+    ("columnar", ("range", "id", [ROWS // 2])),
+]
+CONDITIONS = [None, "id == 10123", "v == 3", "v between 2 and 4 and s like 'a%'", "d >= date '2024-03-01'",
+              "s == null or id < 10"]
+
+
+def make_record(i):
+    return {"id": i, "v": i % 7, "s": None if i % 11 == 0 else f"{'ab'[i % 2]}{i}",
+            "d": None if i % 13 == 0 else datetime.date(2024, 1, 1) + datetime.timedelta(days=i % 200)}
+
+
+def is_lazy(table):
+    """Записи таблицы (всех ее секций) еще не загружены в память."""
+    partitions = table.partitions if isinstance(table, PartitionedTable) else [table]
+    return all(isinstance(partition.data, SegmentData) for partition in partitions)
+
+
+class LazyOpenTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        db = Database("lazy")
+        for number, (storage, partition_by) in enumerate(LAYOUTS):
+            db.create_table(f"t{number}", SCHEMA, storage=storage, primary_key="id", partition_by=partition_by)
+            table = db.get_table(f"t{number}")
+            table.insert_many([make_record(i) for i in range(ROWS)])
+            table.create_index("v", "sorted")
+            table.create_index("s")
+        db.save_to_file(cls.directory)
+        cls.eager = Database.load_from_file(cls.directory)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def copy(self):
+        """Копия сохраненного каталога для тестов, которые меняют базу."""
+        directory = os.path.join(tempfile.mkdtemp(), "db")
+        self.addCleanup(shutil.rmtree, os.path.dirname(directory))
+        shutil.copytree(self.directory, directory)
+        return directory
+
+    def assertSameTable(self, table, expected):
+        for condition in CONDITIONS:
+            with self.subTest(table=table.name, condition=condition):
+                self.assertEqual(table.select(condition, order_by="id"), expected.select(condition, order_by="id"))
+        self.assertEqual(table.select("v >= 5", order_by="d", ascending=False, limit=30, offset=7),
+                         expected.select("v >= 5", order_by="d", ascending=False, limit=30, offset=7))
+        self.assertEqual(table.count(), expected.count())
+
+    def test_structure_without_reading_rows(self):
+        db = Database.load_from_file(self.directory, lazy=True)
+        self.assertEqual(db.show_structure(), self.eager.show_structure())
+        for name in db.tables:
+            table = db.get_table(name)
+            self.assertEqual(table.count(), ROWS)
+            self.assertTrue(is_lazy(table))
+
+    def test_reads(self):
+        db = Database.load_from_file(self.directory, lazy=True)
+        aggregates = {"n": ("count", "*"), "total": ("sum", "v"), "last": ("max", "d")}
+        for name in db.tables:
+            table, expected = db.get_table(name), self.eager.get_table(name)
+            self.assertSameTable(table, expected)
+            self.assertEqual(table.get(ROWS - 1), expected.get(ROWS - 1))
+            self.assertEqual(list(table.fetch_all()), list(expected.fetch_all()))
+            self.assertEqual(table.aggregate(aggregates, group_by="v"), expected.aggregate(aggregates, group_by="v"))
+            # Чтения не загружают таблицу в память
+            self.assertTrue(is_lazy(table))
+
+    def test_changes(self):
+        db = Database.load_from_file(self.directory, lazy=True)
+        expected_db = Database.load_from_file(self.directory)
+        for name in db.tables:
+            for current in (db, expected_db):
+                table = current.get_table(name)
+                table.insert(make_record(ROWS))
+                table.update("v == 3 and id > 100", {"s": "changed"})
+                table.delete("id < 50 or d == null")
+                table.update_by_pk(ROWS - 1, {"v": 100})
+            self.assertFalse(is_lazy(db.get_table(name)))
+            self.assertSameTable(db.get_table(name), expected_db.get_table(name))
+
+    def test_recovery(self):
+        # Изменения из журнала применяются к лениво открытой базе, журнал продолжается
+        directory = self.copy()
+        db = Database.load_from_file(directory, wal=True, lazy=True)
+        self.addCleanup(db.disable_wal)
+        for name in db.tables:
+            table = db.get_table(name)
+            table.delete("v == 1")
+            table.compact()
+            table.update(f"id > {ROWS - 100}", {"v": 100})
+        db.commit()
+        for lazy in (True, False):
+            recovered = Database.load_from_file(directory, lazy=lazy)
+            for name in db.tables:
+                self.assertSameTable(recovered.get_table(name), db.get_table(name))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+"""
+Условия на столбцах, допускающих пустые значения: результат не должен зависеть от способа доступа
+(полный просмотр, колоночная фильтрация, хеш- или упорядоченный индекс).
+Запуск из каталога DBManagementSystem: python -m unittest discover tests
+"""
+import datetime
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from query import Col, parse_condition  # noqa: E402
+from SimpleDB import Table  # noqa: E402
+
+SCHEMA = {"id": "int", "p": "int?", "s": "str?", "d": "date?"}
+RECORDS = [
+    {"id": 0, "p": 1, "s": "abc", "d": datetime.date(2024, 1, 1)},
+    {"id": 1, "p": None, "s": None, "d": None},
+    {"id": 2, "p": 3, "s": "bcd", "d": datetime.date(2024, 3, 1)},
+    {"id": 3, "p": 7, "s": "axe", "d": None},
+    {"id": 4, "p": None, "s": "aaa", "d": datetime.date(2024, 5, 1)},
+]
+# Условие и id записей, которые ему удовлетворяют
+QUERIES = [
+    ("p > 1", [2, 3]),
+    ("p <= 3", [0, 2]),
+    ("p between 1 and 5", [0, 2]),
+    ("s like 'a%'", [0, 3, 4]),
+    ("p > 1 and s like 'a%'", [3]),
+    ("p > 1 or s like 'b%'", [2, 3]),
+    ("p == null", [1, 4]),
+    ("p < null", []),
+    (("d", ">=", datetime.date(2024, 2, 1)), [2, 4]),
+]
+
+
+class NullableConditionTest(unittest.TestCase):
+
+    def check_table(self, storage, index):
+        table = Table("t", SCHEMA, storage=storage)
+        table.insert_many(RECORDS)
+        if index is not None:
+            for column in ("p", "s", "d"):
+                table.create_index(column, index)
+        for condition, expected in QUERIES:
+            with self.subTest(storage=storage, index=index, condition=condition):
+                self.assertEqual(sorted(record["id"] for record in table.select(condition)), expected)
+                self.assertEqual(sorted(record["id"] for _, record in table.select_rows(condition)), expected)
+
+    def test_scan(self):
+        for storage in ("rows", "columnar"):
+            self.check_table(storage, None)
+
+    def test_indexes(self):
+        for storage in ("rows", "columnar"):
+            for index in ("hash", "sorted"):
+                self.check_table(storage, index)
+
+    def test_compiled_predicates(self):
+        record = {"p": None, "q": 2, "s": None}
+        self.assertFalse(parse_condition("p > 1")(record))
+        self.assertFalse(parse_condition("p between 1 and 5")(record))
+        self.assertFalse(parse_condition("s like 'a%'")(record))
+        self.assertFalse((Col("q") > Col("p"))(record))
+        self.assertTrue(parse_condition("p != 1")(record))
+
+
+if __name__ == "__main__":
+    unittest.main()
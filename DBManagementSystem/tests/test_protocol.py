@@ -0,0 +1,102 @@
+"""
+Двоичный протокол сервера (модуль protocol): значения всех поддерживаемых типов переживают
+кодирование и декодирование, а поврежденные сообщения вызывают ProtocolError.
+Запуск из каталога DBManagementSystem: python -m unittest discover tests
+"""
+import datetime
+import math
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocol import MAX_FRAME, PROTOCOL_VERSION, ProtocolError, decode, encode, frame, frame_size  # noqa: E402
+from server import DatabaseServer  # noqa: E402
+from SimpleDB import Database  # noqa: E402
+
+VALUES = [
+    None, True, False,
+    0, -1, 127, -128, 128, -129, (1 << 63) - 1, -(1 << 63), 1 << 63, -(1 << 63) - 1, 10 ** 40, -10 ** 40,
+    0.0, -0.0, 1.5, -2.25e300, 5e-324, math.inf, -math.inf,
+    "", "abc", "строка", "x" * 255, "x" * 256, "я" * 127, "я" * 128, "\x00\n\r",
+    datetime.date(2024, 2, 29), datetime.date.min, datetime.date.max,
+    [], {}, [1, "a", None, [2.5, []]], {"a": 1, 2: [True, {"b": None}], None: datetime.date(2000, 1, 1)},
+]
+
+
+class ProtocolTest(unittest.TestCase):
+
+    def assertSameValue(self, actual, expected):
+        # 0.0 == -0.0: знак нуля проверяется отдельно
+        self.assertEqual(actual, expected)
+        self.assertEqual(type(actual), type(expected))
+        if isinstance(expected, float):
+            self.assertEqual(math.copysign(1, actual), math.copysign(1, expected))
+
+    def test_round_trip(self):
+        for value in VALUES:
+            with self.subTest(value=value):
+                self.assertSameValue(decode(encode(value)), value)
+        self.assertEqual(decode(encode(VALUES)), VALUES)
+        self.assertTrue(math.isnan(decode(encode(math.nan))))
+
+    def test_tuple_decoded_as_list(self):
+        self.assertEqual(decode(encode((1, ("a", None)))), [1, ["a", None]])
+
+    def test_server_messages(self):
+        # Запрос клиента и ответ сервера проходят через кодирование без изменений
+        db = Database("protocol")
+        db.create_table("t", {"id": "int", "d": "date?"}, primary_key="id")
+        db.get_table("t").insert_many([{"id": i, "d": datetime.date(2024, 1, 1 + i) if i % 3 else None}
+                                       for i in range(20)])
+        server = DatabaseServer(db)
+        requests = [
+            ({"op": "hello", "version": PROTOCOL_VERSION}, {"version": PROTOCOL_VERSION, "name": "protocol"}),
+            ({"op": "select", "table": "t", "condition": "id >= 18", "order_by": "id"},
+             [[18, None], [19, datetime.date(2024, 1, 20)]]),
+            ({"op": "insert", "table": "t", "values": [20, datetime.date.max]}, None),
+            ({"op": "get", "table": "t", "key": 20}, [20, datetime.date.max]),
+        ]
+        for request, result in requests:
+            with self.subTest(request=request):
+                response = server.handle(encode(request))
+                self.assertEqual(frame_size(response[:4]), len(response) - 4)
+                self.assertEqual(decode(response[4:]), {"ok": True, "result": result})
+        self.assertEqual(db.get_table("t").select("id == 20"), [{"id": 20, "d": datetime.date.max}])
+        error = decode(server.handle(encode({"op": "select", "table": "missing"}))[4:])
+        self.assertEqual((error["ok"], error["type"]), (False, "ValueError"))
+        error = decode(server.handle(b"?")[4:])
+        self.assertEqual((error["ok"], error["type"]), (False, "ProtocolError"))
+
+    def test_frame(self):
+        value = {"op": "tables"}
+        data = frame(value)
+        self.assertEqual(frame_size(data[:4]), len(data) - 4)
+        self.assertEqual(decode(data[4:]), value)
+        with self.assertRaises(ProtocolError):
+            frame_size((MAX_FRAME + 1).to_bytes(4, "big"))
+
+    def test_truncated(self):
+        for value in VALUES + [VALUES]:
+            data = encode(value)
+            for size in range(len(data)):
+                with self.subTest(value=value, size=size):
+                    with self.assertRaises(ProtocolError):
+                        decode(data[:size])
+
+    def test_corrupted(self):
+        for data in [encode(1) + b"N", b"?", b"D\x00\x00\x00\x00", b"s\x02\xff\xfe", b"I\x00\x00\x00\x01x"]:
+            with self.subTest(data=data):
+                with self.assertRaises(ProtocolError):
+                    decode(data)
+
+    def test_unsupported_type(self):
+        for value in [{1, 2}, b"bytes", datetime.datetime(2024, 1, 1), [1, object()]]:
+            with self.subTest(value=value):
+                with self.assertRaises(ProtocolError):
+                    encode(value)
+
+
+if __name__ == "__main__":
+    unittest.main()
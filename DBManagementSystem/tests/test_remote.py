@@ -0,0 +1,109 @@
+"""
+Удаленные таблицы (client.RemoteTable): условия, переданные на сервер, дают тот же результат,
+что и локальный запрос, в том числе условия на датах, построенные через query.Col.
+Запуск из каталога DBManagementSystem: python -m unittest discover tests
+"""
+import asyncio
+import datetime
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from client import ConnectionPool, connect  # noqa: E402
+from query import Col, parse_condition  # noqa: E402
+from server import DatabaseServer  # noqa: E402
+from SimpleDB import Database  # noqa: E402
+
+START = datetime.date(2024, 1, 1)
+
+
+class RemoteConditionTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.db = Database("remote")
+        cls.db.create_table("t", {"id": "int", "d": "date?", "date": "str"}, primary_key="id")
+        cls.db.get_table("t").insert_many(
+            [{"id": i, "d": None if i % 5 == 0 else START + datetime.timedelta(days=i), "date": str(i)}
+             for i in range(40)])
+        cls.loop = asyncio.new_event_loop()
+        cls.server = cls.loop.run_until_complete(DatabaseServer(cls.db, port=0).start())
+        cls.thread = threading.Thread(target=cls.loop.run_forever, daemon=True)
+        cls.thread.start()
+        cls.remote = connect(cls.server.address)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.remote.close()
+        asyncio.run_coroutine_threadsafe(cls.server.close(), cls.loop).result()
+        cls.loop.call_soon_threadsafe(cls.loop.stop)
+        cls.thread.join()
+        cls.loop.close()
+
+    def test_date_conditions(self):
+        day = START + datetime.timedelta(days=20)
+        conditions = [
+            Col("d") >= day,
+            (Col("d") < START + datetime.timedelta(days=3)) | (Col("d") == day),
+            Col("d").between(START, day),
+            ("d", "<", day),
+            "d > date '2024-01-30' and date != '35'",
+        ]
+        local, remote = self.db.get_table("t"), self.remote.get_table("t")
+        for condition in conditions:
+            with self.subTest(condition=condition):
+                expected = sorted(record["id"] for record in local.select(condition))
+                self.assertTrue(expected)
+                self.assertEqual(sorted(record["id"] for record in remote.select(condition)), expected)
+
+    def test_date_literal_round_trip(self):
+        expr = (Col("d") == START) | Col("d").isin([START, None])
+        self.assertEqual(parse_condition(expr.to_string()).to_string(), expr.to_string())
+        self.assertEqual(parse_condition("date == 'x'").to_string(), "date == 'x'")
+        with self.assertRaises(ValueError):
+            parse_condition("d > date '2024-13-01'")
+
+    def call_in_thread(self, pool):
+        """Запускает pool.call в отдельном потоке: (поток, список результата или ошибки)."""
+        outcome = []
+
+        def call():
+            try:
+                outcome.append(pool.call("tables"))
+            except Exception as e:
+                outcome.append(e)
+
+        thread = threading.Thread(target=call, daemon=True)
+        thread.start()
+        thread.join(0.2)
+        self.assertTrue(thread.is_alive())  # Пул занят: поток ждет соединение
+        return thread, outcome
+
+    def test_pool_waiter_after_discard(self):
+        # Соединение, закрытое после прерванного запроса, освобождает место для ожидающего потока
+        pool = ConnectionPool(self.server.address, size=1)
+        self.addCleanup(pool.close)
+        with pool.connection() as connection:
+            thread, outcome = self.call_in_thread(pool)
+            connection.idle = False
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(list(outcome[0]), ["t"])
+        self.assertEqual(pool.opened, 1)
+
+    def test_pool_close_wakes_waiters(self):
+        pool = ConnectionPool(self.server.address, size=1)
+        with pool.connection():
+            thread, outcome = self.call_in_thread(pool)
+            pool.close()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertIsInstance(outcome[0], ConnectionError)
+        self.assertEqual(pool.opened, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+Row id записей (select_rows, row_ids, fetch_rows, update_row, delete_row): row id указывает
+на одну и ту же запись до ее удаления, в том числе после уплотнения таблицы.
+Запуск из каталога DBManagementSystem: python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import SimpleDB  # noqa: E402
+from SimpleDB import Database  # noqa: E402
+
+ROWS = SimpleDB.COMPACT_MIN_ROWS * 4
+LAYOUTS = [
+    ("rows", None),
+    ("columnar", None),
+    ("rows", ("hash", "id", 3)),
+    ("columnar", ("range", "id", [ROWS // 2])),
+]
+
+
+class RowIdTest(unittest.TestCase):
+
+    def make_table(self, storage, partition_by):
+        db = Database("ids")
+        db.create_table("t", {"id": "int", "v": "int"}, storage=storage, partition_by=partition_by)
+        table = db.get_table("t")
+        table.insert_many([{"id": i, "v": 0} for i in range(ROWS)])
+        return table
+
+    def row_id(self, table, key):
+        (row_id,) = table.row_ids(f"id == {key}")
+        return row_id
+
+    def test_stable_after_compaction(self):
+        for storage, partition_by in LAYOUTS:
+            with self.subTest(storage=storage, partition_by=partition_by):
+                table = self.make_table(storage, partition_by)
+                keys = [ROWS // 2 + 1, ROWS // 2 + 2, ROWS - 1]
+                ids = {key: self.row_id(table, key) for key in keys}
+                # Удаление четверти записей превышает порог и уплотняет таблицу
+                table.delete(f"id < {ROWS // 4}")
+                table.compact()
+                self.assertEqual([record["id"] for _, record in table.fetch_rows(ids.values())], keys)
+                table.update_row(ids[keys[0]], {"v": 1})
+                table.delete_row(ids[keys[1]])
+                self.assertEqual([record["id"] for record in table.select("v == 1")], [keys[0]])
+                self.assertEqual(table.select(f"id == {keys[1]}"), [])
+                self.assertEqual(table.count(), ROWS - ROWS // 4 - 1)
+
+    def test_deleted_row_id(self):
+        for storage, partition_by in LAYOUTS:
+            with self.subTest(storage=storage, partition_by=partition_by):
+                table = self.make_table(storage, partition_by)
+                row_id = self.row_id(table, 10)
+                table.delete("id < 100")
+                table.compact()
+                self.assertEqual(table.fetch_rows([row_id]), [])
+                with self.assertRaises(ValueError):
+                    table.delete_row(row_id)
+                with self.assertRaises(ValueError):
+                    table.update_row(row_id, {"v": 1})
+                self.assertEqual(table.count(), ROWS - 100)
+
+    def test_new_rows_after_compaction(self):
+        for storage, partition_by in LAYOUTS:
+            with self.subTest(storage=storage, partition_by=partition_by):
+                table = self.make_table(storage, partition_by)
+                table.delete(f"id >= {ROWS - 100}")
+                table.compact()
+                table.insert({"id": ROWS, "v": 2})
+                rows = table.select_rows(order_by="id")
+                row_ids = [row_id for row_id, _ in rows]
+                self.assertEqual(len(set(row_ids)), len(row_ids))
+                self.assertEqual(table.fetch_rows(row_ids), rows)
+                self.assertEqual(table.fetch_rows([self.row_id(table, ROWS)])[0][1]["v"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
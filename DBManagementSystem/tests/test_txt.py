@@ -0,0 +1,41 @@
+"""
+Формат TXT (save_database_to_txt / load_database_from_txt): значения с разделителями,
+двоеточиями и переводами строк переживают выгрузку и загрузку без изменений.
+Запуск из каталога DBManagementSystem: python -m unittest discover tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from export import parse_txt_line  # noqa: E402
+from SimpleDB import Database  # noqa: E402
+
+VALUES = ["Moscow, Russia", "a: b", "x\\, y", "back\\slash", "line\nbreak\r", "", ",", ":", ", : ", "trail\\"]
+
+
+class TxtFormatTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        db = Database("txt")
+        db.create_table("t", {"city": "str", "n": "int"})
+        db.get_table("t").insert_many([{"city": value, "n": i} for i, value in enumerate(VALUES)])
+        with tempfile.TemporaryDirectory() as directory:
+            db.save_database_to_txt(directory)
+            loaded = Database("loaded")
+            loaded.load_database_from_txt(directory)
+        table = loaded.get_table("t")
+        self.assertEqual(list(table.schema), ["city", "n"])
+        self.assertEqual([(record["city"], record["n"]) for record in table.select()],
+                         [(value, str(i)) for i, value in enumerate(VALUES)])
+
+    def test_unescaped_lines(self):
+        # Строки без экранирования читаются так же, как до его появления
+        self.assertEqual(parse_txt_line("a: 1, b: 12: 30, c"), {"a": "1", "b": "12: 30", "c": ""})
+        self.assertEqual(parse_txt_line("a: x:y, b: 2"), {"a": "x:y", "b": "2"})
+
+
+if __name__ == "__main__":
+    unittest.main()
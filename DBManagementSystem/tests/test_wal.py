@@ -0,0 +1,183 @@
+"""
+Восстановление из журнала упреждающей записи: после перезагрузки каталога таблица
+должна совпадать с таблицей в памяти, в том числе после уплотнения, контрольной точки
+и продолжения журнала в восстановленной базе.
+Запуск из каталога DBManagementSystem: python -m unittest discover tests
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import SimpleDB  # noqa: E402
+from SimpleDB import Database  # noqa: E402
+
+SCHEMA = {"id": "int", "v": "int"}
+LAYOUTS = [
+    ("rows", None),
+    ("columnar", None),
+    ("rows", ("hash", "id", 3)),
+    ("columnar", ("range", "id", [30])),
+]
+
+
+
+def records(rows):
+    """Записи, упорядоченные по id, для сравнения таблиц."""
+    return sorted((record["id"], record["v"]) for record in rows)
+
+
+class WalRecoveryTest(unittest.TestCase):
+
+    def open_table(self, storage, partition_by, rows=100, primary_key=None):
+        """Таблица с журналом в новом временном каталоге."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        db = Database("wal")
+        db.create_table("t", SCHEMA, storage=storage, primary_key=primary_key, partition_by=partition_by)
+        db.enable_wal(directory)
+        self.addCleanup(db.disable_wal)
+        table = db.get_table("t")
+        table.insert_many([{"id": i, "v": i % 7} for i in range(rows)])
+        return db, table
+
+    def assertRecovered(self, db, table, wal=False):
+        """
+        Загружает базу из каталога и сравнивает восстановленную таблицу с таблицей в памяти.
+        :param wal: Продолжить журнал в загруженной базе.
+        :return: Загруженная база.
+        """
+        db.commit()
+        recovered_db = Database.load_from_file(db.path, wal=wal)
+        recovered = recovered_db.get_table("t")
+        self.assertEqual(records(recovered.select()), records(table.select()))
+        self.assertEqual(records(recovered.select("v == 100")), records(table.select("v == 100")))
+        self.assertEqual(recovered.count(), table.count())
+        return recovered_db
+
+    def change(self, table, rnd, count):
+        """Случайные изменения таблицы с первичным ключом id всеми способами, которые пишут журнал."""
+        for _ in range(count):
+            keys = [record["id"] for record in table.select()]
+            key = rnd.choice(keys)
+            op = rnd.randrange(11)
+            if op == 0:
+                table.insert({"id": max(keys) + 1, "v": rnd.randrange(7)})
+            elif op == 1:
+                table.insert_many([{"id": max(keys) + n, "v": n % 7} for n in range(1, 20)])
+            elif op == 2:
+                table.update(f"v == {rnd.randrange(7)} and id > {key}", {"v": 100})
+            elif op == 3:
+                table.update_by_pk(key, {"v": rnd.randrange(7)})
+            elif op == 4:
+                # Новое значение ключа может перенести запись в другую секцию
+                table.update_by_pk(key, {"id": -key - 1})
+            elif op == 5:
+                table.delete(f"v == {rnd.randrange(7)} and id < {key}")
+            elif op == 6:
+                table.delete_by_pk(key)
+            elif op == 7:
+                (row_id,) = table.row_ids(f"id == {key}")
+                table.update_row(row_id, {"v": 100})
+            elif op == 8:
+                (row_id,) = table.row_ids(f"id == {key}")
+                table.delete_row(row_id)
+            else:
+                table.compact()
+
+    def test_changes(self):
+        for storage, partition_by in LAYOUTS:
+            with self.subTest(storage=storage, partition_by=partition_by):
+                db, table = self.open_table(storage, partition_by, rows=300, primary_key="id")
+                table.create_index("v", "sorted")
+                rnd = random.Random(storage + str(partition_by))
+                for _ in range(4):
+                    self.change(table, rnd, 15)
+                    self.assertRecovered(db, table)
+
+    def test_checkpoint(self):
+        for storage, partition_by in LAYOUTS:
+            with self.subTest(storage=storage, partition_by=partition_by):
+                db, table = self.open_table(storage, partition_by, rows=300, primary_key="id")
+                rnd = random.Random(1)
+                self.change(table, rnd, 15)
+                db.checkpoint()
+                self.change(table, rnd, 15)
+                self.assertRecovered(db, table)
+
+    def test_interrupted_checkpoint(self):
+        # Контрольная точка прервана после закрытия журнала: закрытый журнал применяется перед текущим
+        for storage, partition_by in LAYOUTS:
+            with self.subTest(storage=storage, partition_by=partition_by):
+                db, table = self.open_table(storage, partition_by, rows=300, primary_key="id")
+                rnd = random.Random(2)
+                self.change(table, rnd, 15)
+                db.wal.rotate()
+                self.change(table, rnd, 15)
+                self.assertRecovered(db, table)
+
+    def test_continue_after_recovery(self):
+        # Позиции в журнале восстановленной базы совпадают с позициями в исходной таблице
+        for storage, partition_by in LAYOUTS:
+            with self.subTest(storage=storage, partition_by=partition_by):
+                db, table = self.open_table(storage, partition_by, rows=300, primary_key="id")
+                rnd = random.Random(3)
+                self.change(table, rnd, 20)
+                db.disable_wal()
+                db = self.assertRecovered(db, table, wal=True)
+                self.addCleanup(db.disable_wal)
+                table = db.get_table("t")
+                self.change(table, rnd, 20)
+                self.assertRecovered(db, table)
+
+    def test_compact(self):
+        for storage, partition_by in LAYOUTS:
+            with self.subTest(storage=storage, partition_by=partition_by):
+                db, table = self.open_table(storage, partition_by)
+                table.delete("id < 10")
+                table.compact()
+                table.delete("id == 50")
+                table.update("id >= 90", {"v": 100})
+                self.assertRecovered(db, table)
+
+    def test_save_to_other_directory(self):
+        # Сохранение в другой каталог уплотняет таблицу, журнал остается в прежнем
+        with tempfile.TemporaryDirectory() as other:
+            for storage, partition_by in LAYOUTS:
+                with self.subTest(storage=storage, partition_by=partition_by):
+                    db, table = self.open_table(storage, partition_by)
+                    table.delete("id == 0")
+                    db.save_to_file(other)
+                    table.delete("id == 1")
+                    table.update("id == 2", {"v": 100})
+                    self.assertRecovered(db, table)
+
+    def test_compact_on_delete_threshold(self):
+        for storage, partition_by in LAYOUTS:
+            with self.subTest(storage=storage, partition_by=partition_by):
+                db, table = self.open_table(storage, partition_by, rows=SimpleDB.COMPACT_MIN_ROWS * 2)
+                table.delete(f"id < {SimpleDB.COMPACT_MIN_ROWS}")
+                table.delete("id == 1500")
+                table.update("id > 1990", {"v": 100})
+                self.assertRecovered(db, table)
+
+    def test_parallel_aggregate(self):
+        # Параллельная агрегация пропускает удаленные записи, не уплотняя таблицу
+        aggregates = {"n": ("count", "*"), "total": ("sum", "v"), "top": ("max", "id")}
+        for storage, partition_by in LAYOUTS:
+            with self.subTest(storage=storage, partition_by=partition_by):
+                db, table = self.open_table(storage, partition_by)
+                table.delete("id < 10 or v == 3")
+                self.assertEqual(table.aggregate(aggregates, group_by="v", parallel=True, workers=2),
+                                 table.aggregate(aggregates, group_by="v"))
+                table.delete("id == 50")
+                table.update("id >= 90", {"v": 100})
+                self.assertRecovered(db, table)
+
+
+if __name__ == "__main__":
+    unittest.main()
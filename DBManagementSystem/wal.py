@@ -0,0 +1,137 @@
+"""
+Журнал упреждающей записи (WAL).
+
+Каждая запись журнала — кадр: u32 длина | u32 CRC32 | JSON-массив
+[lsn, операция, таблица, аргументы...]. Кадр с неверной длиной или CRC
+считается оборванным хвостом (сбой во время записи) и отбрасывается при восстановлении.
+"""
+import json
+import os
+import shutil
+import struct
+import threading
+import time
+import zlib
+
+from schema import json_default
+
+WAL_FILE = "wal.log"
+SEALED_SUFFIX = ".old"  # Журнал, закрытый на время контрольной точки
+
+_FRAME_HEADER = struct.Struct("<II")
+
+
+class WriteAheadLog:
+    """
+    Журнал изменений с групповой фиксацией: fsync выполняется не на каждую запись,
+    а когда накопилось group_commit_size записей или прошло group_commit_interval секунд.
+    """
+
+    def __init__(self, path, group_commit_size=64, group_commit_interval=0.01):
+        """
+        :param path: Путь к файлу журнала.
+        :param group_commit_size: Число записей, после которого журнал сбрасывается на диск.
+        :param group_commit_interval: Максимальная задержка fsync в секундах (0 — fsync на каждую запись).
+        """
+        self.path = path
+        self.group_commit_size = group_commit_size
+        self.group_commit_interval = group_commit_interval
+        self.file = open(path, "ab")
+        self.pending = 0  # Записи, еще не сброшенные на диск
+        self.last_sync = time.monotonic()
+        self.lock = threading.Lock()
+        self.closed = threading.Event()
+        self.flusher = None
+        if group_commit_interval > 0:
+            # Фоновый поток ограничивает задержку фиксации, когда записей мало
+            self.flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+            self.flusher.start()
+
+    def append(self, entry):
+        """Добавляет запись в журнал."""
+        payload = json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=json_default).encode("utf-8")
+        frame = _FRAME_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        with self.lock:
+            self.file.write(frame)
+            self.pending += 1
+            if (self.pending >= self.group_commit_size
+                    or time.monotonic() - self.last_sync >= self.group_commit_interval):
+                self._sync()
+
+    def commit(self):
+        """Принудительно сбрасывает накопленные записи на диск."""
+        with self.lock:
+            if self.pending:
+                self._sync()
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.pending = 0
+        self.last_sync = time.monotonic()
+
+    def _flush_periodically(self):
+        while not self.closed.wait(self.group_commit_interval):
+            self.commit()
+
+    def size(self):
+        """Текущий размер журнала в байтах."""
+        with self.lock:
+            return self.file.tell()
+
+    def rotate(self):
+        """
+        Закрывает текущий журнал (переименовывает в *.old) и начинает новый.
+        Новые записи идут в новый файл, пока контрольная точка сохраняет сегменты.
+        Если *.old остался от прерванной контрольной точки, текущий журнал дописывается в него.
+        :return: Путь к закрытому журналу.
+        """
+        sealed = self.path + SEALED_SUFFIX
+        with self.lock:
+            self._sync()
+            self.file.close()
+            if os.path.exists(sealed):
+                with open(sealed, "ab") as target, open(self.path, "rb") as source:
+                    shutil.copyfileobj(source, target)
+                    target.flush()
+                    os.fsync(target.fileno())
+                os.remove(self.path)
+            else:
+                os.replace(self.path, sealed)
+            self.file = open(self.path, "ab")
+        return sealed
+
+    def close(self):
+        """Фиксирует записи и закрывает журнал."""
+        self.closed.set()
+        if self.flusher is not None:
+            self.flusher.join()
+        with self.lock:
+            if not self.file.closed:
+                self._sync()
+                self.file.close()
+
+
+def read_log(path):
+    """
+    Читает записи журнала до первого поврежденного кадра.
+    Оборванный хвост обрезается, чтобы новые записи не оказались после мусора.
+    :return: Список записей.
+    """
+    if not os.path.exists(path):
+        return []
+    entries = []
+    with open(path, "r+b") as file:
+        data = file.read()
+        offset = 0
+        while offset + _FRAME_HEADER.size <= len(data):
+            length, checksum = _FRAME_HEADER.unpack_from(data, offset)
+            start = offset + _FRAME_HEADER.size
+            payload = data[start:start + length]
+            if len(payload) != length or zlib.crc32(payload) != checksum:
+                break
+            entries.append(json.loads(payload.decode("utf-8")))
+            offset = start + length
+        if offset != len(data):
+            file.truncate(offset)
+    return entries